@@ -0,0 +1,151 @@
+"""
+scheduler/ (schedule_manager) 벤치마크. 메모리 stand-in DB 와 빈 job(benchmarks.noop:run) 으로
+  1) /schedule/register 핸들러 처리량
+  2) extend_window(스캔) → 워커에서 job 시작까지의 지연, exec_time 대비 start skew
+  3) 최대 RSS, 스레드/프로세스 수, job 당 DB 왕복 수
+를 재서 JSON 으로 남긴다.
+    python -m benchmarks.bench_scheduler --n 1000 --mode same --json out.json
+"""
+import os
+import sys
+import time
+import math
+import yaml
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "scheduler")
+
+
+def prepare_env(tmp, workers):
+    """임시 디렉토리에 conf.yml 을 만들고 그곳을 cwd 로 삼는다 (schedule_manager 는 cwd 의 conf.yml 을 읽는다)."""
+    with open(os.path.join(APP_DIR, "conf.yml"), encoding="utf-8") as f:
+        conf = yaml.safe_load(f)
+    os.makedirs(os.path.join(tmp, "logs"), exist_ok=True)
+    conf['worker']['size'] = workers
+    conf['worker']['registry_file'] = os.path.join(tmp, "logs", "proc_registry.json")
+    with open(os.path.join(tmp, "conf.yml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(conf, f, allow_unicode=True)
+    os.chdir(tmp)
+    sys.path[:0] = [APP_DIR, ROOT]
+    # spawn 된 워커가 benchmarks.noop 과 common.* 를 import 할 수 있도록
+    os.environ["PYTHONPATH"] = os.pathsep.join([APP_DIR, ROOT, os.environ.get("PYTHONPATH", "")])
+    os.environ["BENCH_OUT"] = os.path.join(tmp, "starts.tsv")
+    return conf
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=1000)
+    parser.add_argument("--mode", choices=["same", "staggered"], default="same")
+    parser.add_argument("--spread", type=int, default=10, help="staggered 일 때 exec_time 을 나눌 초 수")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--owners", type=int, default=10, help="created_by 종류 수")
+    parser.add_argument("--lead", type=float, default=5.0, help="스캔 시점부터 exec_time 까지 초")
+    parser.add_argument("--concurrency", type=int, default=32, help="동시 register 호출 수")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--json")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_scheduler_")
+    prepare_env(tmp, args.workers)
+
+    import oracledb
+    from benchmarks import standin_db
+    from benchmarks.common import ResourceSampler, percentiles, exec_times, write_result
+    db = standin_db.StandInDb()
+    oracledb.create_pool = lambda **kw: standin_db.StandInPool(db, **kw)
+    oracledb.create_pool_async = lambda **kw: standin_db.StandInAsyncPool(db, **kw)
+
+    sampler = ResourceSampler().start()
+    from apps import schedule_manager as sm
+    from common.worker_pool import WorkerPool
+
+    # 1) 등록 처리량: 1년 안에 한 번 뜨는 cron 으로 register 핸들러를 그대로 호출
+    async def register_all():
+        sem = asyncio.Semaphore(args.concurrency)
+        errors = 0
+
+        async def one(i):
+            nonlocal errors
+            async with sem:
+                res = await sm.register_schedule(sm.ScheduleInput(
+                    scheduler_name=f"bench_{i}", created_by=f"user{i % args.owners}", cron_expr="0 0 1 1 *",
+                    query="SELECT 1 FROM DUAL", output_format="csv"))
+                if not res or not res.get("scheduler_ids"):
+                    errors += 1
+        await asyncio.gather(*(one(i) for i in range(args.n)))
+        return errors
+
+    t0 = time.perf_counter()
+    reg_errors = asyncio.run(register_all())
+    reg_elapsed = time.perf_counter() - t0
+    reg_round_trips = db.round_trips
+
+    # 2) dispatch: A 를 비우고 exec_time 을 초 단위로 맞춘 행을 넣은 뒤 extend_window 한 번으로 올린다
+    with db.lock:
+        db.a.clear()
+        db.first_selected.clear()
+    sm.worker_pool = WorkerPool("benchmarks.noop:run", args.workers, registry=sm.registry, log=sm.mgr_logger,
+                                owner_cap=sm.fair_conf.get('owner_cap', 0), weights=sm.fair_conf.get('weights'))
+    if args.workers:
+        sm.worker_pool.start()
+    base = math.ceil(time.time() + args.lead)
+    for i, ts in enumerate(exec_times(args.n, base, args.mode, args.spread)):
+        db.add_row(scheduler_name=f"bench_{i}", created_by=f"user{i % args.owners}",
+                   exec_time=datetime.fromtimestamp(ts), query="SELECT 1 FROM DUAL", status="REGISTERED",
+                   output_format="csv", priority=0)
+    trips_before = db.round_trips
+    with sm.db.get_pool().acquire() as conn:
+        cur = conn.cursor()
+        with sm.window_lock:
+            sm.extend_window(cur, datetime.now())
+    scan_trips = db.round_trips - trips_before
+
+    deadline = time.time() + args.timeout
+    starts = []
+    while time.time() < deadline:
+        if os.path.exists(os.environ["BENCH_OUT"]):
+            with open(os.environ["BENCH_OUT"], encoding="utf-8") as f:
+                starts = [line.rstrip("\n").split("\t") for line in f if line.strip()]
+            if len(starts) >= args.n:
+                break
+        time.sleep(0.2)
+    resources = sampler.stop()
+
+    skews, latencies = [], []
+    for sid, exec_time, started in starts:
+        exec_ts = datetime.strptime(exec_time, "%Y-%m-%d %H:%M:%S").timestamp()
+        started = float(started)
+        skews.append(started - exec_ts)
+        scan_ts = db.first_selected.get(int(sid), exec_ts)
+        latencies.append(started - max(exec_ts, scan_ts))
+
+    result = {
+        "app": "scheduler",
+        "n": args.n,
+        "mode": args.mode,
+        "workers": args.workers,
+        "registration": {"elapsed_sec": round(reg_elapsed, 3), "per_sec": round(args.n / reg_elapsed, 1),
+                         "errors": reg_errors, "round_trips_per_job": round(reg_round_trips / args.n, 2)},
+        "dispatch": {"started": len(starts), "missing": args.n - len(starts),
+                     "scan_round_trips": scan_trips, "round_trips_per_job": round(scan_trips / args.n, 3),
+                     "latency": percentiles(latencies), "start_skew": percentiles(skews)},
+        "resources": resources,
+        "statements": db.statements,
+    }
+    if args.workers:
+        sm.worker_pool.shutdown()
+    sm.dispatcher.shutdown()
+    if args.json:
+        write_result(args.json, result)
+    else:
+        print(result)
+    os._exit(0)  # BackgroundScheduler 등 데몬이 아닌 스레드를 기다리지 않는다
+
+
+if __name__ == "__main__":
+    main()
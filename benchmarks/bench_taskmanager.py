@@ -0,0 +1,256 @@
+"""
+test1/ (threadapp.main TaskManager) 벤치마크. 메모리 stand-in DB 위에서 실제 DbHandlerPool, TaskManager,
+TaskRunner 를 돌린다 (job 쿼리는 SELECT 1 FROM DUAL, 결과는 csv 한 줄).
+  1) POST /schedule 핸들러(create) 처리량
+  2) claim(스캔) → job 시작까지의 지연, exec_time 대비 start skew (B 의 SUCCESS 로그 start_offset_ms)
+  3) 최대 RSS, 스레드 수, job 당 DB 왕복 수
+를 재서 JSON 으로 남긴다.
+--backend sqlite 면 stand-in 대신 실제 SqliteDbHandler(임시 파일, WAL)로 돌린다.
+이때 DB 왕복 수와 스캔 시각은 알 수 없어 round_trips_per_job, latency 는 null 이다.
+    python -m benchmarks.bench_taskmanager --n 1000 --mode same --json out.json
+    python -m benchmarks.bench_taskmanager --n 1000 --backend sqlite
+"""
+import os
+import re
+import sys
+import time
+import math
+import yaml
+import argparse
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "test1")
+OFFSET = re.compile(r"start_offset_ms=(-?[\d.]+)")
+
+
+def prepare_env(tmp, args):
+    """임시 디렉토리에 config/bench.yml 을 만들고 그곳을 cwd 로 삼는다 (main.py 는 config/{ENV}.yml 을 읽는다)."""
+    os.makedirs(os.path.join(tmp, "config"), exist_ok=True)
+    cfg = {
+        "oracle": {},
+        "log": {"log_dir": os.path.join(tmp, "logs"), "log_format": "%(asctime)s|%(message)s"},
+        "output": {"file_path": os.path.join(tmp, "out"), "arraysize": 100, "threaded": False},
+        "scan": {"node_id": "bench", "interval_sec": 1, "lookahead_sec": args.lead + 10, "lease_sec": 600,
+                 "claim_limit": args.n},
+        "executor": {"workers": args.workers, "queue_size": args.n + 100},
+        "fair_share": {"owner_cap": args.owner_cap},
+        "prestage": {"lead_sec": args.prestage, "max_reserved": args.workers},
+        "single_flight": {"enabled": False},
+    }
+    if args.backend == "sqlite":
+        cfg["storage"] = {"backend": "sqlite", "path": os.path.join(tmp, "bench.db"),
+                          "pool_max": max(32, args.workers // 2)}
+    with open(os.path.join(tmp, "config", "bench.yml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(cfg, f)
+    os.chdir(tmp)
+    os.environ["ENV"] = "bench"
+    sys.path[:0] = [APP_DIR, ROOT]
+
+
+def per_job(trips, n):
+    return None if trips is None else round(trips / n, 2)
+
+
+class StandInStore:
+    """stand-in DB 를 직접 들여다본다 (왕복 수, 스캔 시각까지 안다)."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def round_trips(self):
+        return self.db.round_trips
+
+    def statements(self):
+        return self.db.statements
+
+    def first_selected(self):
+        return self.db.first_selected
+
+    def clear(self):
+        with self.db.lock:
+            self.db.a.clear()
+            self.db.b.clear()
+            self.db.first_selected.clear()
+
+    def add(self, rows):
+        return [self.db.add_row(**row) for row in rows]
+
+    def finished(self, sids):
+        with self.db.lock:
+            return sum(1 for sid in sids if self.db.a[sid].get("status") in ("DONE", "ERROR"))
+
+    def results(self, sids):
+        """([(sid, SUCCESS 메시지)], ERROR 수, {sid: exec_time})"""
+        with self.db.lock:
+            success = [(int(r["scheduler_id"]), r.get("message")) for r in self.db.b if r.get("status") == "SUCCESS"]
+            errors = sum(1 for sid in sids if self.db.a[sid].get("status") == "ERROR")
+            exec_map = {sid: self.db.a[sid]["exec_time"] for sid in sids}
+        return success, errors, exec_map
+
+
+class SqliteStore:
+    """SqliteDbHandler 의 풀로 같은 DB 파일을 SQL 로 들여다본다."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def round_trips(self):
+        return None
+
+    def statements(self):
+        return None
+
+    def first_selected(self):
+        return None
+
+    def _query(self, sql, params=()):
+        with self.pool.acquire() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def clear(self):
+        with self.pool.write_lock, self.pool.acquire() as conn:
+            conn.execute("DELETE FROM A")
+            conn.execute("DELETE FROM B")
+
+    def add(self, rows):
+        sids = []
+        with self.pool.write_lock, self.pool.acquire() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for row in rows:
+                cols = list(row)
+                cur = conn.execute(f"INSERT INTO A({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                                   [row[c] for c in cols])
+                sids.append(cur.lastrowid)
+            conn.commit()
+        return sids
+
+    def finished(self, sids):
+        return self._query("SELECT COUNT(*) FROM A WHERE STATUS IN ('DONE', 'ERROR')")[0][0]
+
+    def results(self, sids):
+        success = self._query("SELECT SCHEDULER_ID, MESSAGE FROM B WHERE STATUS = 'SUCCESS'")
+        errors = self._query("SELECT COUNT(*) FROM A WHERE STATUS = 'ERROR'")[0][0]
+        exec_map = dict(self._query("SELECT SCHEDULER_ID, EXEC_TIME FROM A"))
+        return success, errors, exec_map
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=1000)
+    parser.add_argument("--mode", choices=["same", "staggered"], default="same")
+    parser.add_argument("--spread", type=int, default=10, help="staggered 일 때 exec_time 을 나눌 초 수")
+    parser.add_argument("--workers", type=int, default=150)
+    parser.add_argument("--owners", type=int, default=10, help="created_by 종류 수")
+    parser.add_argument("--owner-cap", type=int, default=0)
+    parser.add_argument("--prestage", type=float, default=3, help="prestage.lead_sec (0 이면 끔)")
+    parser.add_argument("--lead", type=float, default=5.0, help="행을 넣은 시점부터 exec_time 까지 초")
+    parser.add_argument("--concurrency", type=int, default=32, help="동시 create 호출 스레드 수")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--backend", choices=["standin", "sqlite"], default="standin")
+    parser.add_argument("--json")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_taskmanager_")
+    prepare_env(tmp, args)
+
+    from benchmarks.common import ResourceSampler, percentiles, exec_times, write_result
+    if args.backend == "standin":
+        import oracledb
+        from benchmarks import standin_db
+        db = standin_db.StandInDb()
+        oracledb.create_pool = lambda **kw: standin_db.StandInPool(db, **kw)
+
+    sampler = ResourceSampler().start()
+    from threadapp import main as tm
+    store = StandInStore(db) if args.backend == "standin" else SqliteStore(tm.db.pool)
+
+    # 1) 등록 처리량: 스캔에 걸리지 않도록 먼 미래 exec_time 으로 create 핸들러를 그대로 호출
+    far = datetime.now() + timedelta(days=365)
+    counter = iter(range(args.n))
+    lock = threading.Lock()
+    errors = [0]
+
+    def register():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            res = tm.create(tm.ScheduleIn(scheduler_name=f"bench_{i}", created_by=f"user{i % args.owners}",
+                                          exec_time=far, query="SELECT 1 FROM DUAL", output_format="csv"))
+            if not res.get("scheduler_id"):
+                with lock:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=register) for _ in range(args.concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    reg_elapsed = time.perf_counter() - t0
+    reg_round_trips = store.round_trips()
+
+    # 2) dispatch: A 를 비우고 가까운 exec_time 의 행을 넣으면 스캐너가 claim 해 간다
+    tm.db.flush()
+    store.clear()
+    base = math.ceil(time.time() + args.lead)
+    sids = store.add([dict(scheduler_name=f"bench_{i}", created_by=f"user{i % args.owners}",
+                           exec_time=datetime.fromtimestamp(ts), query="SELECT 1 FROM DUAL",
+                           status="REGISTERED", output_format="csv", priority=0)
+                      for i, ts in enumerate(exec_times(args.n, base, args.mode, args.spread))])
+    trips_before = store.round_trips()
+
+    deadline = time.time() + args.timeout
+    while time.time() < deadline:
+        if store.finished(sids) >= args.n:
+            break
+        time.sleep(0.2)
+    tm.db.flush()
+    dispatch_trips = store.round_trips()
+    if dispatch_trips is not None:
+        dispatch_trips -= trips_before
+    resources = sampler.stop()
+
+    skews, latencies = [], []
+    success, errors_run, exec_map = store.results(sids)
+    first_selected = store.first_selected()
+    for sid, message in success:
+        m = OFFSET.search(message or "")
+        if not m or m.group(1) == "None":
+            continue
+        exec_ts = exec_map[sid].timestamp()
+        started = exec_ts + float(m.group(1)) / 1000
+        skews.append(started - exec_ts)
+        if first_selected is not None:
+            latencies.append(started - max(exec_ts, first_selected.get(sid, exec_ts)))
+
+    result = {
+        "app": "taskmanager",
+        "n": args.n,
+        "mode": args.mode,
+        "workers": args.workers,
+        "backend": args.backend,
+        "prestage_lead_sec": args.prestage,
+        "registration": {"elapsed_sec": round(reg_elapsed, 3), "per_sec": round(args.n / reg_elapsed, 1),
+                         "errors": errors[0], "round_trips_per_job": per_job(reg_round_trips, args.n)},
+        "dispatch": {"started": len(skews), "errors": errors_run, "missing": args.n - len(success) - errors_run,
+                     "round_trips_per_job": per_job(dispatch_trips, args.n),
+                     "latency": percentiles(latencies) if first_selected is not None else None,
+                     "start_skew": percentiles(skews)},
+        "resources": resources,
+        "pool_max_busy": getattr(tm.db.pool, "max_busy", None),
+        "statements": store.statements(),
+    }
+    if args.json:
+        write_result(args.json, result)
+    else:
+        print(result)
+    os._exit(0)  # 스캐너/모니터 등 무한 루프 스레드를 기다리지 않는다
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import json
+import math
+import time
+import threading
+import psutil
+
+
+def percentiles(values):
+    """초 단위 값 목록 → ms 단위 p50/p99/max."""
+    if not values:
+        return {"p50_ms": None, "p99_ms": None, "max_ms": None}
+    values = sorted(values)
+
+    def pct(p):
+        return round(values[min(len(values) - 1, int(math.ceil(len(values) * p / 100)) - 1)] * 1000, 1)
+
+    return {"p50_ms": pct(50), "p99_ms": pct(99), "max_ms": round(values[-1] * 1000, 1)}
+
+
+class ResourceSampler:
+    """interval 초마다 이 프로세스(+자식 프로세스)의 RSS, 스레드 수, 프로세스 수 최대값을 기록한다."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.proc = psutil.Process()
+        self.peak_rss = 0
+        self.peak_threads = 0
+        self.peak_processes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return {"peak_rss_mb": round(self.peak_rss / 1024 / 1024, 1), "peak_threads": self.peak_threads,
+                "peak_processes": self.peak_processes}
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                children = self.proc.children(recursive=True)
+                rss = self.proc.memory_info().rss
+                for c in children:
+                    try:
+                        rss += c.memory_info().rss
+                    except psutil.Error:
+                        pass
+                self.peak_rss = max(self.peak_rss, rss)
+                self.peak_threads = max(self.peak_threads, self.proc.num_threads())
+                self.peak_processes = max(self.peak_processes, 1 + len(children))
+            except psutil.Error:
+                pass
+            time.sleep(self.interval)
+
+
+def exec_times(n, base, mode, spread):
+    """same: 모두 base, staggered: base ~ base + spread 초에 고르게."""
+    if mode == "same":
+        return [base] * n
+    return [base + (i % spread) for i in range(n)]
+
+
+def write_result(path, result):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2, default=str)
@@ -0,0 +1,10 @@
+import os
+import time
+
+
+def run(scheduler_id, exec_time):
+    """벤치마크용 빈 job. 시작 시각만 BENCH_OUT 파일에 한 줄로 남긴다 (WorkerPool handler, apps.app.run 과 같은 반환 형식)."""
+    started = time.time()
+    with open(os.environ["BENCH_OUT"], "a", encoding="utf-8") as f:
+        f.write(f"{scheduler_id}\t{exec_time}\t{started}\n")
+    return {"result": "DONE", "rows": 0, "seconds": {}}
@@ -0,0 +1,74 @@
+"""
+두 스케줄러 벤치마크를 크기(N) x exec_time 분포(same/staggered) 조합으로 각각 새 프로세스에서 돌리고
+하나의 JSON 리포트로 모은다. 변경 전후 리포트를 비교해 회귀 여부를 본다.
+    python -m benchmarks.run --sizes 100 1000 10000 --out benchmarks/results/baseline.json
+"""
+import os
+import sys
+import json
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHES = {"scheduler": "benchmarks.bench_scheduler", "taskmanager": "benchmarks.bench_taskmanager"}
+
+
+def git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", nargs="+", choices=list(BENCHES), default=list(BENCHES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000])
+    parser.add_argument("--modes", nargs="+", choices=["same", "staggered"], default=["same", "staggered"])
+    parser.add_argument("--timeout", type=float, default=600, help="한 조합당 제한 시간(초)")
+    parser.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "results",
+                                                      f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"))
+    parser.add_argument("extra", nargs=argparse.REMAINDER, help="-- 뒤의 인자는 각 벤치마크에 그대로 전달")
+    args = parser.parse_args()
+    extra = [a for a in args.extra if a != "--"]
+
+    report = {
+        "meta": {"started_at": datetime.now().isoformat(timespec="seconds"), "git_rev": git_rev(),
+                 "host": socket.gethostname(), "python": platform.python_version(),
+                 "platform": platform.platform(), "cpu_count": os.cpu_count(), "extra_args": extra},
+        "results": [],
+    }
+    for app in args.apps:
+        for n in args.sizes:
+            for mode in args.modes:
+                fd, path = tempfile.mkstemp(suffix=".json")
+                os.close(fd)
+                cmd = [sys.executable, "-m", BENCHES[app], "--n", str(n), "--mode", mode, "--json", path,
+                       "--timeout", str(args.timeout)] + extra
+                print(f"[bench] {app} n={n} mode={mode}", flush=True)
+                try:
+                    subprocess.run(cmd, cwd=ROOT, check=True, timeout=args.timeout + 120,
+                                   stdout=subprocess.DEVNULL)
+                    with open(path, encoding="utf-8") as f:
+                        result = json.load(f)
+                except (subprocess.CalledProcessError, subprocess.TimeoutExpired, ValueError) as e:
+                    result = {"app": app, "n": n, "mode": mode, "error": str(e)}
+                finally:
+                    os.remove(path)
+                report["results"].append(result)
+                d = result.get("dispatch", {})
+                print(f"[bench]   reg/s={result.get('registration', {}).get('per_sec')} "
+                      f"skew={d.get('start_skew')} rt/job={d.get('round_trips_per_job')}", flush=True)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[bench] report: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+벤치마크용 메모리 DB (oracledb pool/connection/cursor 흉내).
+scheduler/, test1/ 가 실제로 보내는 A, B 테이블 SQL(INSERT/SELECT/UPDATE)만 이해한다.
+execute / executemany / commit 호출을 DB 왕복(round trip) 으로 센다.
+oracledb.create_pool / create_pool_async 를 이 모듈의 StandInPool / StandInAsyncPool 로 바꿔 끼워 쓴다.
+"""
+import re
+import time
+import threading
+from datetime import datetime
+
+_SPACE = re.compile(r"\s+")
+_INSERT = re.compile(r"^INSERT INTO (\w+) ?\((.*?)\) VALUES ?\((.*)\)(?: RETURNING \w+ INTO :\w+)?$")
+_SELECT = re.compile(r"^SELECT (.*?) FROM (\w+)(?: WHERE (.*?))?(?: ORDER BY .*?)?(?: FOR UPDATE SKIP LOCKED)?"
+                     r"(?: FETCH FIRST .*)?$")
+_UPDATE = re.compile(r"^UPDATE (\w+) SET (.*?) WHERE (.*)$")
+_COND = re.compile(r"^(\w+) ?(<=|>=|=|<|>| IN) ?(.*)$")
+
+
+def _norm(sql):
+    return _SPACE.sub(" ", sql).strip().upper()
+
+
+def _split(text):
+    # 괄호 밖의 콤마로 나눈다
+    parts, depth, cur = [], 0, ""
+    for ch in text:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        if ch == "," and depth == 0:
+            parts.append(cur.strip())
+            cur = ""
+        else:
+            cur += ch
+    if cur.strip():
+        parts.append(cur.strip())
+    return parts
+
+
+class StandInVar:
+    def __init__(self, arraysize=1):
+        self.values = [None] * arraysize
+
+    def setvalue(self, i, value):
+        if i >= len(self.values):
+            self.values.extend([None] * (i + 1 - len(self.values)))
+        self.values[i] = value
+
+    def getvalue(self, i=0):
+        return self.values[i]
+
+
+class StandInDb:
+    """A, B 테이블과 왕복 카운터. 모든 pool/connection 이 하나를 공유한다."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.a = {}  # scheduler_id -> {column(lower): value}
+        self.b = []  # {column: value}
+        self.next_id = 1
+        self.round_trips = 0
+        self.statements = {}  # 문장 종류 -> 횟수
+        self.first_selected = {}  # scheduler_id -> 처음 SELECT 로 읽힌 시각 (스캔 시각)
+
+    def count(self, kind, n=1):
+        with self.lock:
+            self.round_trips += n
+            self.statements[kind] = self.statements.get(kind, 0) + n
+
+    def add_row(self, **row):
+        """벤치마크가 직접 A 에 행을 넣는다 (왕복에 세지 않는다)."""
+        with self.lock:
+            sid = self.next_id
+            self.next_id += 1
+            self.a[sid] = dict(scheduler_id=sid, **{k.lower(): v for k, v in row.items()})
+        return sid
+
+    # -- 문장 실행 --
+    def run(self, sql, params):
+        """(description, rows) 를 돌려준다. SELECT 가 아니면 description 은 None."""
+        text = _norm(sql)
+        if text.startswith("INSERT"):
+            return None, self._insert(text, params)
+        if text.startswith("SELECT"):
+            return self._select(text, params)
+        if text.startswith("UPDATE"):
+            return None, self._update(text, params)
+        raise NotImplementedError(f"stand-in db does not understand: {text[:80]}")
+
+    def _bind(self, token, params, row=None):
+        token = token.strip()
+        if token.startswith(":"):
+            name = token[1:]
+            if isinstance(params, dict):
+                for k, v in params.items():
+                    if k.upper() == name:
+                        return v
+                raise KeyError(name)
+            return params[int(name) - 1]
+        if token.startswith("'"):
+            return token.strip("'")
+        if token in ("SYSDATE", "SYSTIMESTAMP"):
+            return datetime.now()
+        if token.startswith("COALESCE("):
+            for arg in _split(token[len("COALESCE("):-1]):
+                v = self._bind(arg, params, row)
+                if v is not None:
+                    return v
+            return None
+        if token.startswith("(SELECT"):
+            _, rows = self._select(token[1:-1], params, record=False)
+            return rows[0][0] if rows else None
+        try:
+            return int(token)
+        except ValueError:
+            return row.get(token.lower()) if row else token
+
+    def _insert(self, text, params):
+        m = _INSERT.match(text)
+        if not m:
+            raise NotImplementedError(text[:80])
+        table, columns, values = m.group(1), _split(m.group(2)), _split(m.group(3))
+        row = {c.lower(): self._bind(v, params) for c, v in zip(columns, values)}
+        with self.lock:
+            if table == "B":
+                self.b.append(row)
+                return None
+            sid = self.next_id
+            self.next_id += 1
+            row["scheduler_id"] = sid
+            self.a[sid] = row
+            return sid
+
+    def _match(self, where, params):
+        if not where:
+            return lambda r: True
+        checks = []
+        for cond in where.split(" AND "):
+            m = _COND.match(cond.strip())
+            if not m:
+                raise NotImplementedError(cond)
+            col, op, value = m.group(1).lower(), m.group(2).strip(), m.group(3)
+            if op == "IN":
+                target = {self._bind(v, params) for v in _split(value.strip()[1:-1])}
+            else:
+                target = self._bind(value, params)
+            checks.append((col, op, target))
+
+        def ok(r):
+            for col, op, target in checks:
+                v = r.get(col)
+                if op == "IN":
+                    if v not in target:
+                        return False
+                    continue
+                if isinstance(target, str) and not isinstance(v, str) and v is not None:
+                    target_cmp = type(v)(target)
+                else:
+                    target_cmp = target
+                if v is None:
+                    return False
+                if not {"=": v == target_cmp, "<": v < target_cmp, "<=": v <= target_cmp,
+                        ">": v > target_cmp, ">=": v >= target_cmp}[op]:
+                    return False
+            return True
+        return ok
+
+    def _select(self, text, params, record=True):
+        m = _SELECT.match(text)
+        if not m:
+            raise NotImplementedError(text[:80])
+        columns, table, where = [c.strip() for c in _split(m.group(1))], m.group(2), m.group(3)
+        if table == "DUAL":
+            return [(c, None) for c in columns], [tuple(self._bind(c, params) for c in columns)]
+        ok = self._match(where, params)
+        with self.lock:
+            rows = sorted((r for r in self.a.values() if ok(r)),
+                          key=lambda r: (r.get("exec_time") or datetime.min, r["scheduler_id"]))
+            if record:
+                now = time.time()
+                for r in rows:
+                    self.first_selected.setdefault(r["scheduler_id"], now)
+            names = list(rows[0].keys()) if (rows and columns == ["*"]) else [c.lower() for c in columns]
+            out = [tuple(r.get(c) for c in names) for r in rows]
+        return [(c.upper(), None) for c in names], out
+
+    def _update(self, text, params):
+        m = _UPDATE.match(text)
+        if not m:
+            raise NotImplementedError(text[:80])
+        sets = []
+        for assign in _split(m.group(2)):
+            col, value = assign.split("=", 1)
+            sets.append((col.strip().lower(), self._bind(value, params)))
+        ok = self._match(m.group(3), params)
+        with self.lock:
+            n = 0
+            for r in self.a.values():
+                if ok(r):
+                    r.update(sets)
+                    n += 1
+        return None
+
+
+class StandInCursor:
+    def __init__(self, db):
+        self.db = db
+        self.arraysize = 100
+        self.prefetchrows = 2
+        self.description = None
+        self.rows = []
+        self.pos = 0
+        self.inputsizes = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        while self.pos < len(self.rows):
+            self.pos += 1
+            yield self.rows[self.pos - 1]
+
+    def var(self, typ=None, arraysize=1):
+        return StandInVar(arraysize)
+
+    def setinputsizes(self, *args):
+        self.inputsizes = args
+
+    def _returning(self, params):
+        if isinstance(params, dict):
+            return next((v for v in params.values() if isinstance(v, StandInVar)), None), \
+                {k: v for k, v in params.items() if not isinstance(v, StandInVar)}
+        params = list(params or [])
+        if params and isinstance(params[-1], StandInVar):
+            return params[-1], params[:-1]
+        return None, params
+
+    def execute(self, sql, params=None, fetch_lobs=True, **kwargs):
+        self.db.count(_norm(sql).split(" ", 1)[0])
+        if kwargs:
+            params = dict(kwargs) if params is None else params
+        var, params = self._returning(params if params is not None else [])
+        if var is None:
+            var = next((v for v in kwargs.values() if isinstance(v, StandInVar)), None)
+        self.description, res = self.db.run(sql, params)
+        self.rows, self.pos = (res or []) if self.description else [], 0
+        if var is not None:
+            var.setvalue(0, [res])
+
+    def executemany(self, sql, rows):
+        self.db.count(_norm(sql).split(" ", 1)[0] + "_MANY")
+        var = self.inputsizes[-1] if self.inputsizes and isinstance(self.inputsizes[-1], StandInVar) else None
+        for i, params in enumerate(rows):
+            _, res = self.db.run(sql, list(params))
+            if var is not None:
+                var.setvalue(i, [res])
+        self.description, self.rows, self.pos = None, [], 0
+
+    def fetchone(self):
+        if self.pos >= len(self.rows):
+            return None
+        self.pos += 1
+        return self.rows[self.pos - 1]
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        out = self.rows[self.pos:self.pos + size]
+        self.pos += len(out)
+        return out
+
+    def fetchall(self):
+        out = self.rows[self.pos:]
+        self.pos = len(self.rows)
+        return out
+
+    def close(self):
+        pass
+
+
+class StandInConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.pool.release(self)
+
+    def cursor(self):
+        return StandInCursor(self.pool.db)
+
+    def commit(self):
+        self.pool.db.count("COMMIT")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.pool.release(self)
+
+
+class StandInPool:
+    """oracledb.ConnectionPool 흉내. max 개까지만 동시에 빌려 준다."""
+
+    def __init__(self, db, max=20, **kwargs):
+        self.db = db
+        self.sem = threading.BoundedSemaphore(max)
+        self.busy = 0
+        self.max_busy = 0
+        self.opened = max  # 연결을 미리 다 열어 둔 것으로 본다 (/metrics 의 idle)
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        self.sem.acquire()
+        with self.lock:
+            self.busy += 1
+            self.max_busy = max(self.max_busy, self.busy)
+        return StandInConnection(self)
+
+    def release(self, conn):
+        with self.lock:
+            self.busy -= 1
+        self.sem.release()
+
+    def close(self):
+        pass
+
+
+class _AsyncCursor:
+    def __init__(self, cur):
+        self.cur = cur
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cur.close()
+
+    def var(self, *args, **kwargs):
+        return self.cur.var(*args, **kwargs)
+
+    def setinputsizes(self, *args):
+        self.cur.setinputsizes(*args)
+
+    @property
+    def description(self):
+        return self.cur.description
+
+    async def execute(self, *args, **kwargs):
+        self.cur.execute(*args, **kwargs)
+
+    async def executemany(self, *args, **kwargs):
+        self.cur.executemany(*args, **kwargs)
+
+    async def fetchone(self):
+        return self.cur.fetchone()
+
+    async def fetchmany(self, size=None):
+        return self.cur.fetchmany(size)
+
+    async def fetchall(self):
+        return self.cur.fetchall()
+
+
+class _AsyncConnection:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self):
+        return _AsyncCursor(self.conn.cursor())
+
+    async def commit(self):
+        self.conn.commit()
+
+
+class _AsyncAcquire:
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = None
+
+    async def __aenter__(self):
+        self.conn = self.pool.sync.acquire()
+        return _AsyncConnection(self.conn)
+
+    async def __aexit__(self, *exc):
+        self.pool.sync.release(self.conn)
+
+
+class StandInAsyncPool:
+    """oracledb.AsyncConnectionPool 흉내 (acquire() 는 async context manager)."""
+
+    def __init__(self, db, **kwargs):
+        self.sync = StandInPool(db, **kwargs)
+
+    @property
+    def busy(self):
+        return self.sync.busy
+
+    @property
+    def opened(self):
+        return self.sync.opened
+
+    def acquire(self):
+        return _AsyncAcquire(self)
+
+    async def close(self):
+        pass
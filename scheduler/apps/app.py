@@ -1,53 +1,132 @@
-import os, sys
-import openpyxl
-import requests
+import os, sys, time
+import logging
 from common.logger import app_logger
+from shared.sink import open_sink, stream_to_sink
+from shared.profiling import JobProfiler, ProfileConfig
+from shared.guard import QueryGuard
+from common.delivery import create_delivery, deliver
 from common import db
 
-WEBHOOK_URL = "https://mattermost.example.com/hooks/your_webhook_id"
+output_conf = db.config.get('output', {})
+ARRAYSIZE = output_conf.get('arraysize', 5000)
+THREADED_SINK = output_conf.get('threaded', True)
+PROFILE_CFG = ProfileConfig(db.config.get('profile'))
+GUARD = QueryGuard(db.config.get('guard'))
 
-if __name__ == "__main__":
-    scheduler_id, exec_time = sys.argv[1], sys.argv[2]
-    app_logger.info(f"Running {scheduler_id} at {exec_time}")
+def run(scheduler_id, exec_time, conn):
+    """job 하나를 실행하고 단계별 측정값 {"result", "rows", "seconds": {fetch, write}, "delivery"} 을 돌려준다.
+    워커(common.worker_pool)가 부모 프로세스로 보내 /metrics 에 반영한다.
+    결과 파일 전송(Mattermost)은 job 에서 하지 않는다. delivery({file_path, text}) 를 받은 부모의 전송 큐가 보내므로
+    전송이 느리거나 실패해도 워커와 풀 연결을 잡고 있지 않는다."""
+    log = logging.LoggerAdapter(app_logger, {"sid": scheduler_id})  # 로그 레코드에 sid 필드
+    log.info(f"Running {scheduler_id} at {exec_time}")
+    stages = {"result": "ERROR", "rows": None, "seconds": {}}
+    timings = stages["seconds"]
+    prof = JobProfiler(scheduler_id, PROFILE_CFG)  # 단계별 wall/CPU, 느린 job 프로파일링 (shared.profiling)
+    guard = GUARD
+    partial = None  # 가드에 걸리면 지울 결과 파일
 
-    conn = db.get_connection()
     cur = conn.cursor()
     try:
-        cur.execute("UPDATE A SET status = 'START' WHERE scheduler_id = :1 AND TO_CHAR(exec_time, 'YYYY-MM-DD HH24:MI:SS') = :2",
-                    [scheduler_id, exec_time])
-        conn.commit()
+        with prof.stage("status"):
+            # REGISTERED 일 때만 시작한다. 휠에서 빼기 전에 취소/삭제된 job 이나 이미 시작한 job 은 건너뛴다
+            cur.execute("UPDATE A SET status = 'START' WHERE scheduler_id = :1 AND TO_CHAR(exec_time, 'YYYY-MM-DD HH24:MI:SS') = :2"
+                        " AND status = 'REGISTERED'", [scheduler_id, exec_time])
+            claimed = cur.rowcount
+            conn.commit()
+        if not claimed:
+            log.info(f"{scheduler_id} is not REGISTERED, skipped")
+            stages["result"] = "SKIPPED"
+            return stages
 
-        cur.execute("SELECT query FROM A WHERE scheduler_id = :1 AND TO_CHAR(exec_time, 'YYYY-MM-DD HH24:MI:SS') = :2",
-                    [scheduler_id, exec_time])
-        row = cur.fetchone()
+        with prof.stage("record"):
+            cur.execute("SELECT query, output_format, scheduler_name FROM A WHERE scheduler_id = :1 AND TO_CHAR(exec_time, 'YYYY-MM-DD HH24:MI:SS') = :2",
+                        [scheduler_id, exec_time], fetch_lobs=False)
+            row = cur.fetchone()
         if not row:
             raise Exception("No query found")
 
-        query = row[0]
-        cur.execute(query)
-        data = cur.fetchall()
-
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        for d in data:
-            ws.append(d)
-        file_path = f"logs/{scheduler_id}_{exec_time.replace(':', '').replace('-', '').replace(' ', '_')}.xlsx"
-        wb.save(file_path)
-
-        # Mattermost 전송
-        with open(file_path, 'rb') as f:
-            files = {'files': (os.path.basename(file_path), f, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
-            payload = {'text': f"Schedule [{scheduler_id}] executed at {exec_time}"}
-            requests.post(WEBHOOK_URL, data=payload, files=files)
-
-        cur.execute("UPDATE A SET status = 'DONE' WHERE scheduler_id = :1 AND TO_CHAR(exec_time, 'YYYY-MM-DD HH24:MI:SS') = :2",
-                    [scheduler_id, exec_time])
-        cur.execute("INSERT INTO B (log_time, scheduler_id, scheduler_name, status, message) VALUES (SYSDATE, :1, (SELECT scheduler_name FROM A WHERE scheduler_id=:1), 'DONE', 'Success')", [scheduler_id])
-        conn.commit()
+        query, output_format, scheduler_name = row
+        prof.start(scheduler_name)  # 다음 실행 arm 은 스케줄 이름 단위
+        guard = GUARD.for_schedule(scheduler_name)
+        base_path = f"logs/{scheduler_id}_{exec_time.replace(':', '').replace('-', '').replace(' ', '_')}"
+        sink = open_sink(output_format, base_path, THREADED_SINK)
+        partial = sink.file_path
+        conn.call_timeout = guard.call_timeout_ms  # 풀 연결이라 끝나면 0 으로 되돌린다
+        try:
+            count = stream_to_sink(cur, query, sink, ARRAYSIZE, timings, guard.budget())
+        finally:
+            started = time.perf_counter()
+            sink.close()
+            timings['write'] = timings.get('write', 0.0) + time.perf_counter() - started
+        stages["rows"] = count
+        prof.add("fetch", timings.get('fetch', 0.0))
+        prof.add("write", timings.get('write', 0.0))
+        file_path = sink.file_path
+        log.info(f"{scheduler_id} saved {count} rows to {file_path}")
+
+        with prof.stage("finish"):
+            cur.execute("UPDATE A SET status = 'DONE' WHERE scheduler_id = :1 AND TO_CHAR(exec_time, 'YYYY-MM-DD HH24:MI:SS') = :2",
+                        [scheduler_id, exec_time])
+            cur.execute("INSERT INTO B (log_time, scheduler_id, scheduler_name, status, message) VALUES (SYSDATE, :1, (SELECT scheduler_name FROM A WHERE scheduler_id=:1), 'DONE', 'Success')", [scheduler_id])
+            conn.commit()
+        stages["result"] = "DONE"
+        stages["delivery"] = {"file_path": file_path, "text": f"Schedule [{scheduler_id}] executed at {exec_time}"}
     except Exception as e:
-        app_logger.error(str(e))
+        tripped = guard.tripped(e)
+        if tripped:
+            # 가드에 걸린 job 은 A 는 ERROR, B 에는 ERROR 와 구분해 GUARD 로 남긴다 (test1 과 같다).
+            # call timeout 뒤에는 연결이 끊겼을 수 있다
+            log.error(f"guard {tripped}")
+            stages["result"] = "GUARD"
+            if partial and os.path.exists(partial):
+                os.remove(partial)
+            try:
+                cur.execute("UPDATE A SET status = 'ERROR' WHERE scheduler_id = :1 AND TO_CHAR(exec_time, 'YYYY-MM-DD HH24:MI:SS') = :2",
+                            [scheduler_id, exec_time])
+                cur.execute("INSERT INTO B (log_time, scheduler_id, scheduler_name, status, message) VALUES (SYSDATE, :sid, (SELECT scheduler_name FROM A WHERE scheduler_id = :sid), 'GUARD', :msg)",
+                            {"sid": scheduler_id, "msg": str(tripped)})
+                conn.commit()
+            except Exception as e2:
+                log.error(f"guard log error: {e2}")
+            return stages
+        log.error(str(e))
         cur.execute("INSERT INTO B (log_time, scheduler_id, scheduler_name, status, message) VALUES (SYSDATE, :1, (SELECT scheduler_name FROM A WHERE scheduler_id = :1), 'ERROR', :2)", [scheduler_id, str(e)])
         conn.commit()
     finally:
+        if guard.call_timeout:
+            try:
+                conn.call_timeout = 0
+            except Exception:
+                pass
+        summary = prof.finish(stages["result"])
+        if summary:
+            # 느렸거나 프로파일링한 실행은 B 에 요약을 남긴다 (자세한 내용은 아티팩트 파일)
+            log.info(f"{scheduler_id} profile {summary}")
+            try:
+                cur.execute("INSERT INTO B (log_time, scheduler_id, scheduler_name, status, message) VALUES (SYSDATE, :1, (SELECT scheduler_name FROM A WHERE scheduler_id = :1), 'PROFILE', :2)", [scheduler_id, summary])
+                conn.commit()
+            except Exception as e:
+                log.error(f"profile log error: {e}")
         cur.close()
-        conn.close()
\ No newline at end of file
+    return stages
+
+
+def run_pooled(scheduler_id, exec_time):
+    """warm worker(common.worker_pool) 에서 호출. 프로세스 단위 커넥션 풀을 재사용한다."""
+    with db.get_pool().acquire() as conn:
+        return run(scheduler_id, exec_time, conn)
+
+
+if __name__ == "__main__":
+    scheduler_id, exec_time = sys.argv[1], sys.argv[2]
+    conn = db.get_connection()
+    try:
+        stages = run(scheduler_id, exec_time, conn)
+    finally:
+        conn.close()
+    # job 마다 프로세스(worker.size: 0)면 받아 줄 부모가 없으므로 연결을 닫은 뒤 여기서 보내고 끝낸다
+    queue = create_delivery(app_logger, workers=1)
+    if queue is not None:
+        deliver(queue, scheduler_id, stages, app_logger)
+        queue.shutdown(timeout=db.config.get('delivery', {}).get('shutdown_sec', 300))
@@ -1,276 +1,663 @@
 import subprocess
 import os
+import time
+import threading
 import uuid
+import json
+import base64
 import oracledb
-import psutil
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime, timedelta
 from contextlib import asynccontextmanager
-from apscheduler.jobstores.base import JobLookupError
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.date import DateTrigger
 from croniter import croniter
 from common.logger import mgr_logger
+from shared.timing_wheel import TimingWheel
+from common.worker_pool import WorkerPool, JOB_STAGE
+from common.delivery import create_delivery, deliver
+from common.proc_registry import ProcessRegistry
+from shared.sink import SINKS
+from shared.guard import QueryGuard
 from common import db
+from shared.metrics import REGISTRY, CONTENT_TYPE
 
 app = FastAPI(title="Oracle Scheduler API")
+# 주기 작업(materialize_rules) 전용. 실행 시각별 job 은 dispatcher(타이밍 휠)가 담당한다
 scheduler = BackgroundScheduler()
 scheduler.start()
+dispatcher = TimingWheel(log=mgr_logger)
+dispatcher.start()
+worker_conf = db.config.get('worker', {})
+registry = ProcessRegistry(worker_conf.get('registry_file'), log=mgr_logger)
+fair_conf = db.config.get('fair_share', {})
+# 결과 파일 전송은 이 프로세스의 업로더 스레드가 한다 (워커는 파일을 만들고 바로 다음 job 을 받는다)
+delivery = create_delivery(mgr_logger, upload_observer=JOB_STAGE.labels("upload"))
+worker_pool = WorkerPool("apps.app:run_pooled", worker_conf.get('size', 0), worker_conf.get('max_jobs', 200),
+                         worker_conf.get('max_rss_mb', 512), registry=registry, log=mgr_logger,
+                         owner_cap=fair_conf.get('owner_cap', 0), weights=fair_conf.get('weights'),
+                         on_result=lambda sid, stages: deliver(delivery, sid, stages, mgr_logger))
+
+# /metrics. job 단계별 히스토그램은 common.worker_pool 이 워커가 보낸 측정값으로 채운다
+SCAN = REGISTRY.histogram("sched_scan_seconds", "스캔 시간 (window: extend_window, materialize: 규칙 펼치기 전체)",
+                          ("scan",))
+POOL_CONNECTIONS = REGISTRY.gauge("sched_db_pool_connections", "DB 커넥션 풀 연결 수", ("pool", "state"))
+EXECUTOR_WORKERS = REGISTRY.gauge("sched_executor_workers", "job 실행 슬롯 (busy: 실행 중, idle: 빈 슬롯)", ("state",))
+REGISTRY.gauge("sched_executor_queued", "빈 워커를 기다리는 job 수").set_function(lambda: worker_pool.pending.qsize())
+REGISTRY.gauge("sched_dispatcher_jobs", "실행 시각을 기다리는 job 수 (타이밍 휠)").set_function(lambda: len(dispatcher))
+EXECUTOR_WORKERS.labels("busy").set_function(lambda: worker_pool.pending.running)
+EXECUTOR_WORKERS.labels("idle").set_function(lambda: worker_pool.size - worker_pool.pending.running)
+
+
+def _pool_connections(pool_name, state):
+    busy, opened = db.pool_usage().get(pool_name, (0, 0))
+    return busy if state == "busy" else opened - busy
+
+
+for _pool_name in ("sync", "async"):
+    for _state in ("busy", "idle"):
+        POOL_CONNECTIONS.labels(_pool_name, _state).set_function(
+            lambda pool_name=_pool_name, state=_state: _pool_connections(pool_name, state))
+
 
 class ScheduleInput(BaseModel):
     scheduler_name: str
     created_by: str
     cron_expr: str = Field(example="string 예) 분(*:모든or0~59) 시(*:모든or0~23) 일(*:모든or1~31) 월(*:모든or1~12) 요일(*:모든or0:일요일~6:토요일))")
     query: str
+    recurring: bool = False  # True 이면 cron 규칙만 저장하고 horizon 만큼씩 펼친다
+    output_format: str = "xlsx"  # 결과 파일 형식: xlsx, csv, csv.gz, jsonl
+    priority: int = 0  # 같은 등록자의 job 이 워커를 기다릴 때 큰 값부터 실행
+
+class TimeRange(BaseModel):
+    start_time: Optional[str] = None  # 'YYYY-MM-DD HH24:MI:SS'
+    end_time: Optional[str] = None
+
 
 class ScheduleDeleteRequest(BaseModel):
-    scheduler_ids: List[int]  # 하나 이상 받기
+    scheduler_ids: List[int] = []  # 수천 개도 array DML 한 번
     start_time: Optional[str] = None  # 'YYYY-MM-DD HH24:MI:SS'
     end_time: Optional[str] = None
+    ranges: List[TimeRange] = []  # exec_time 구간 여러 개 (start_time/end_time 과 OR)
+    user: Optional[str] = None  # cancel 시 B 에 남길 사용자
+
+
+schedule_conf = db.config.get('schedule', {})
+HORIZON = timedelta(minutes=schedule_conf.get('horizon_minutes', 60))
+MATERIALIZE_INTERVAL = schedule_conf.get('materialize_interval_sec', 60)
+
+# 스케줄러에는 exec_time <= loaded_until 인 job 만 올라가 있다.
+# 그 이후 구간은 materialize_rules 가 주기적으로 extend_window 하면서 올린다.
+window_lock = threading.Lock()
+loaded_until = None
 
 
 @app.on_event("startup")
 async def startup_event():
+    mgr_logger.info(f"Recovered {registry.recover()} running job process(es)")
+    registry.start()
+    if worker_pool.size:
+        worker_pool.start()
     mgr_logger.info("Loading existing scheduled tasks from DB...")
-    conn = db.get_connection()
-    cur = conn.cursor()
     try:
-        now = datetime.now()
-        cur.execute("SELECT DISTINCT scheduler_id, exec_time FROM A WHERE status = 'REGISTERED'"
-                    " AND exec_time >= TO_CHAR(SYSDATE, 'YYYY-MM-DD HH24:MI:SS')")
-        rows = cur.fetchall()
-        for scheduler_id, exec_time in rows:
-            time_str = exec_time.strftime("%Y-%m-%d %H:%M:%S")
-            def job(exec_time=exec_time, sid=scheduler_id):
-                subprocess.Popen(["python", "apps/app.py", sid, time_str], env=os.environ.copy())
-
-            job = scheduler.add_job(job, trigger=DateTrigger(run_date=exec_time), id=f"{scheduler_id}_{exec_time}")
-            mgr_logger.info(f"add_job job:{job}")
+        with db.get_pool().acquire() as conn:
+            cur = conn.cursor()
+            with window_lock:
+                extend_window(cur, datetime.now())
+            cur.close()
     except Exception as e:
-        mgr_logger.error(f"lifespan error: {str(e)}")
-    finally:
-        cur.close()
-        conn.close()
+        mgr_logger.error(f"startup error: {str(e)}")
+
+    scheduler.add_job(materialize_rules, 'interval', seconds=MATERIALIZE_INTERVAL,
+                      id="materialize_rules", max_instances=1, coalesce=True, next_run_time=datetime.now())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    dispatcher.shutdown()
+    if worker_pool.size:
+        worker_pool.shutdown()
+    if delivery:
+        delivery.shutdown()
+    registry.shutdown()
+    await db.close_pools()
+
+
+def run_app(scheduler_id, exec_time, owner=None, priority=0):
+    time_str = exec_time.strftime("%Y-%m-%d %H:%M:%S")
+    if worker_pool.size:
+        # 워커가 모자라면 등록자(owner)별로 공정하게 나눠 실행한다
+        worker_pool.submit(scheduler_id, time_str, owner, priority)
+    else:
+        popen = subprocess.Popen(["python", "-m", "apps.app", str(scheduler_id), time_str], env=os.environ.copy(),
+                                 start_new_session=(os.name != "nt"))
+        registry.register(popen.pid, scheduler_id, time_str, popen=popen,
+                          pgid=popen.pid if os.name != "nt" else None)
+
+
+def add_jobs(entries, now=None):
+    """(scheduler_id, exec_time, created_by, priority) 목록을 한 번에 스케줄러에 등록한다. 이미 지난 시각은 바로 실행."""
+    now = now or datetime.now()
+    due = []
+    for entry in entries:
+        scheduler_id, exec_time = entry[0], entry[1]
+        if exec_time <= now:
+            due.append(entry)
+        else:
+            dispatcher.add_job(run_app, run_date=exec_time, id=f"{scheduler_id}_{exec_time}", args=list(entry),
+                               key=scheduler_id)
+    for entry in due:
+        run_app(*entry)
+
+
+def add_loaded_jobs(entries, now=None):
+    """이미 로드된 구간(loaded_until 이하)의 job 만 올린다. 나머지는 extend_window 가 때가 되면 올린다.
+    commit 이후에 호출해야 한다. extend_window 가 SELECT 전에 loaded_until 을 올리므로 빠지는 job 이 없다."""
+    until = loaded_until
+    if until is None:
+        return
+    add_jobs([e for e in entries if e[1] <= until], now)
+
+
+def extend_window(cur, now):
+    """(loaded_until, now + HORIZON] 구간의 REGISTERED job 을 스케줄러에 올린다. window_lock 안에서 호출."""
+    global loaded_until
+    started = time.perf_counter()
+    start, until = loaded_until or now, now + HORIZON
+    loaded_until = until  # SELECT 보다 먼저 올려야 그 사이 commit 된 등록분을 add_loaded_jobs 가 올린다
+    cur.execute("SELECT scheduler_id, exec_time, created_by, priority FROM A WHERE status = 'REGISTERED'"
+                " AND exec_time > :1 AND exec_time <= :2", [start, until])
+    rows = cur.fetchall()
+    add_jobs(rows, now)
+    SCAN.labels("window").observe(time.perf_counter() - started)
+    mgr_logger.info(f"extend_window until:{until} jobs:{len(rows)} total:{len(dispatcher)}")
+
+
+CRON_LIMIT = 1000  # 규칙 하나를 한 번에 펼치는 최대 발생 수
+
+
+def expand_cron(cron_expr, start, until, limit=CRON_LIMIT):
+    """start 이후 until 까지의 cron 발생 시각 (최대 limit 개)."""
+    times = []
+    it = croniter(cron_expr, start)
+    for _ in range(limit):
+        next_time = it.get_next(datetime)
+        if next_time > until:
+            break
+        times.append(next_time)
+    return times
+
+
+INSERT_OCCURRENCES_SQL = """
+    INSERT INTO A (scheduler_name, created_by, exec_time, query, status, created_at, rule_id, output_format, priority)
+    VALUES (:1, :2, :3, :4, 'REGISTERED', SYSDATE, :5, :6, :7)
+    RETURNING scheduler_id INTO :8
+"""
+
+
+def bind_occurrences(cur, scheduler_name, created_by, query, exec_times, rule_id=None, output_format="xlsx",
+                     priority=0):
+    """INSERT_OCCURRENCES_SQL 용 array DML 바인드 (RETURNING 배열 변수, 행 목록). sync/async 커서 공용."""
+    id_var = cur.var(int, arraysize=len(exec_times))
+    cur.setinputsizes(None, None, None, None, None, None, None, id_var)
+    rows = [[scheduler_name, created_by, exec_time, query, rule_id, output_format, priority]
+            for exec_time in exec_times]
+    return id_var, rows
+
+
+def returned_ids(id_var, count):
+    # executemany + RETURNING 은 행마다 리스트로 돌려준다
+    return [id_var.getvalue(i)[0] for i in range(count)]
+
+
+def insert_occurrences(cur, scheduler_name, created_by, query, exec_times, rule_id=None, output_format="xlsx",
+                       priority=0):
+    """exec_time 목록을 array DML 한 번으로 INSERT 하고 생성된 scheduler_id 목록을 돌려준다."""
+    if not exec_times:
+        return []
+    id_var, rows = bind_occurrences(cur, scheduler_name, created_by, query, exec_times, rule_id, output_format,
+                                    priority)
+    cur.executemany(INSERT_OCCURRENCES_SQL, rows)
+    return returned_ids(id_var, len(rows))
+
+
+def materialize_rules():
+    """ACTIVE 규칙을 watermark 부터 now + HORIZON 까지 펼쳐 A 에 넣고 watermark 를 전진시킨다. STOPPED 규칙은 건너뛴다."""
+    started = time.perf_counter()
+    now = datetime.now()
+    until = now + HORIZON
+    try:
+        with db.get_pool().acquire() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT rule_id, scheduler_name, created_by, cron_expr, query, watermark, output_format, priority"
+                        " FROM A_RULE WHERE status = 'ACTIVE' AND watermark < :1 FOR UPDATE SKIP LOCKED",
+                        [until], fetch_lobs=False)
+            rules = cur.fetchall()
+
+            with window_lock:
+                entries = []
+                for rule_id, scheduler_name, created_by, cron_expr, query, watermark, output_format, priority in rules:
+                    # 서비스가 내려가 있던 동안의 지난 발생분은 건너뛴다
+                    exec_times = expand_cron(cron_expr, max(watermark, now), until, CRON_LIMIT)
+                    scheduler_ids = insert_occurrences(cur, scheduler_name, created_by, query, exec_times, rule_id,
+                                                       output_format, priority)
+                    # limit 에서 잘렸으면 마지막으로 펼친 시각까지만 올린다 (나머지는 다음 주기에 이어서)
+                    rule_watermark = exec_times[-1] if len(exec_times) >= CRON_LIMIT else until
+                    if rule_watermark != until:
+                        mgr_logger.warning(f"materialize_rules rule:{rule_id} capped at {CRON_LIMIT} until:{rule_watermark}")
+                    cur.execute("UPDATE A_RULE SET watermark = :1 WHERE rule_id = :2", [rule_watermark, rule_id])
+                    entries.extend((sid, t, created_by, priority) for sid, t in zip(scheduler_ids, exec_times))
+                conn.commit()
+
+                add_loaded_jobs(entries, now)
+                extend_window(cur, now)
+            cur.close()
+        if rules:
+            mgr_logger.info(f"materialize_rules rules:{len(rules)} occurrences:{len(entries)} until:{until}")
+    except Exception as e:
+        mgr_logger.error(f"materialize_rules error: {str(e)}")
+    SCAN.labels("materialize").observe(time.perf_counter() - started)
+
 
-    yield
+GUARD = QueryGuard(db.config.get('guard'))
+
+
+async def plan_cost(query):
+    """EXPLAIN PLAN 의 최상위(id=0) cost. 실패하면 None (검사 없이 등록한다)."""
+    stmt_id = uuid.uuid4().hex[:30]  # STATEMENT_ID 는 bind 가 안 되고 30자까지
+    try:
+        async with db.get_async_pool().acquire() as conn:
+            with conn.cursor() as cur:
+                await cur.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{stmt_id}' FOR {query.strip().rstrip(';')}")
+                await cur.execute("SELECT cost FROM PLAN_TABLE WHERE statement_id = :1 AND id = 0", [stmt_id])
+                row = await cur.fetchone()
+            await conn.rollback()  # PLAN_TABLE 에 행을 남기지 않는다
+        return row[0] if row else None
+    except Exception as e:
+        mgr_logger.error(f"plan_cost error: {str(e)}")
+        return None
 
 
 @app.post("/schedule/register")
-def register_schedule(req: ScheduleInput):
+async def register_schedule(req: ScheduleInput):
+    if req.output_format not in SINKS:
+        raise HTTPException(400, detail=f"output_format must be one of {list(SINKS)}")
     now = datetime.now()
-    future_times = []
     try:
-        iter = croniter(req.cron_expr, now)
-        for _ in range(1000):
-            next_time = iter.get_next(datetime)
-            if (next_time - now).days > 365:
-                break
-            future_times.append(next_time)
+        if req.recurring:
+            croniter(req.cron_expr, now)
+            future_times = []
+        else:
+            future_times = expand_cron(req.cron_expr, now, now + timedelta(days=365))
     except Exception as e:
         mgr_logger.error(f"register_schedule error: {str(e)}")
         raise HTTPException(400, detail=f"Invalid cron expression: {str(e)}")
 
-    conn = db.get_connection()
-    cur = conn.cursor()
-    try:
-        for exec_time in future_times:
-            cur.execute("""
-                INSERT INTO A (scheduler_name, created_by, exec_time, query, status, created_at)
-                VALUES (:1, :2, :3, :4, 'REGISTERED', SYSDATE)
-            """, [req.scheduler_name, req.created_by, exec_time, req.query])
-            conn.commit()
-            cur.execute("SELECT scheduler_id FROM A WHERE scheduler_name = :1 "
-                        "AND created_by = :2 AND exec_time = :3 ORDER BY CREATED_AT DESC",
-                        [req.scheduler_name, req.created_by, exec_time])
-            row = cur.fetchone()
-            scheduler_id = row[0]
-
-            def job(exec_time=exec_time, sid=scheduler_id):
-                subprocess.Popen(["python", "-m", "apps.app", sid, exec_time.strftime("%Y-%m-%d %H:%M:%S")], env=os.environ.copy())
-
-            if exec_time <= now:
-                job()
-            else:
-                scheduler.add_job(job, trigger=DateTrigger(run_date=exec_time), id=f"{scheduler_id}_{exec_time}")
-
+    # 실행 계획 cost 가 guard.max_cost 를 넘으면 거부(reject)하거나 B 에 GUARD 로 표시(flag)해 둔다
+    verdict = None
+    guard = GUARD.for_schedule(req.scheduler_name)
+    if guard.max_cost:
+        verdict = guard.check_cost(await plan_cost(req.query))
+        if verdict and verdict[0] == 'reject':
+            mgr_logger.info(f"register_schedule rejected {req.scheduler_name}: {verdict[1]}")
+            raise HTTPException(400, detail=verdict[1])
+        if verdict:
+            mgr_logger.warning(f"register_schedule flagged {req.scheduler_name}: {verdict[1]}")
 
-        return {"scheduler_id": scheduler_id, "count": len(future_times)}
+    try:
+        async with db.get_async_pool().acquire() as conn:
+            with conn.cursor() as cur:
+                if req.recurring:
+                    rule_var = cur.var(int)
+                    await cur.execute("""
+                        INSERT INTO A_RULE (scheduler_name, created_by, cron_expr, query, watermark, status,
+                                            created_at, output_format, priority)
+                        VALUES (:1, :2, :3, :4, :5, 'ACTIVE', SYSDATE, :6, :7)
+                        RETURNING rule_id INTO :8
+                    """, [req.scheduler_name, req.created_by, req.cron_expr, req.query, now, req.output_format,
+                          req.priority, rule_var])
+                else:
+                    scheduler_ids = []
+                    if future_times:
+                        id_var, rows = bind_occurrences(cur, req.scheduler_name, req.created_by, req.query,
+                                                        future_times, output_format=req.output_format,
+                                                        priority=req.priority)
+                        await cur.executemany(INSERT_OCCURRENCES_SQL, rows)
+                        scheduler_ids = returned_ids(id_var, len(rows))
+                    if verdict and scheduler_ids:
+                        # 실행마다가 아니라 등록 단위로 한 줄 (첫 scheduler_id)
+                        await cur.execute("""
+                            INSERT INTO B (log_time, scheduler_id, scheduler_name, status, message)
+                            VALUES (SYSDATE, :1, :2, 'GUARD', :3)
+                        """, [scheduler_ids[0], req.scheduler_name, f"flag {verdict[1]} ({len(scheduler_ids)} runs)"])
+                await conn.commit()
+
+        if req.recurring:
+            # 첫 구간은 async 연결을 풀에 돌려준 뒤에 펼친다. materialize_rules 는 동기 풀에서 연결을 하나 더 잡고
+            # window_lock 도 기다리므로, 연결을 쥔 채 기다리면 등록 요청이 몰릴 때 async 풀이 바닥난다
+            await run_in_threadpool(materialize_rules)
+            return {"rule_id": rule_var.getvalue()[0], "horizon_minutes": HORIZON.total_seconds() / 60,
+                    "guard": verdict[1] if verdict else None}
+
+        add_loaded_jobs([(sid, t, req.created_by, req.priority) for sid, t in zip(scheduler_ids, future_times)], now)
+        return {"scheduler_id": scheduler_ids[0] if scheduler_ids else None,
+                "scheduler_ids": scheduler_ids,
+                "count": len(future_times),
+                "guard": verdict[1] if verdict else None}
     except Exception as e:
         mgr_logger.error(f"register_schedule error: {str(e)}")
-    finally:
-        cur.close()
-        conn.close()
+
+SEARCH_COLUMNS = ["scheduler_id", "scheduler_name", "created_by", "exec_time", "query", "status", "created_at",
+                  "rule_id", "output_format", "priority"]
+SEARCH_DEFAULT_FIELDS = [c for c in SEARCH_COLUMNS if c != "query"]  # CLOB 은 요청할 때만
+SEARCH_MAX_LIMIT = 1000
+SEARCH_BATCH = 500
+
+
+def encode_cursor(exec_time, scheduler_id):
+    raw = json.dumps([exec_time.isoformat(), scheduler_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(token):
+    try:
+        exec_time, scheduler_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        return datetime.fromisoformat(exec_time), int(scheduler_id)
+    except Exception:
+        raise HTTPException(400, detail="Invalid cursor")
+
+
+def search_fields(fields):
+    """fields(콤마 구분) → SELECT 컬럼 목록. keyset 용 exec_time, scheduler_id 는 항상 포함한다."""
+    if not fields:
+        return SEARCH_DEFAULT_FIELDS
+    names = [f.strip().lower() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in SEARCH_COLUMNS]
+    if unknown:
+        raise HTTPException(400, detail=f"Unknown fields {unknown}, allowed: {SEARCH_COLUMNS}")
+    return [c for c in SEARCH_COLUMNS if c in names or c in ("scheduler_id", "exec_time")]
+
 
 @app.get("/schedule/search")
-def search_schedule(
+async def search_schedule(
     created_by: Optional[str] = Query(None),
     start_time: Optional[datetime] = Query(None),
     end_time: Optional[datetime] = Query(None),
-    status: Optional[str] = Query(None)
+    status: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="콤마 구분 컬럼 목록. 기본은 query(CLOB) 를 뺀 전체"),
+    limit: int = Query(100, ge=1, le=SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="이전 응답의 next_cursor"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson 이면 조건에 맞는 전체를 스트리밍")
 ):
-    conn = db.get_connection()
-    cur = conn.cursor()
-    try:
-        conditions = []
-        params = {}
-        if created_by:
-            conditions.append("created_by = :created_by")
-            params['created_by'] = created_by
-        if start_time:
-            conditions.append("exec_time >= :start_time")
-            params['start_time'] = start_time
-        if end_time:
-            conditions.append("exec_time <= :end_time")
-            params['end_time'] = end_time
-        if status:
-            conditions.append("status = :status")
-            params['status'] = status
-
-        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
-        sql = f"SELECT * FROM A{where_clause} ORDER BY exec_time"
-        cur.execute(sql, params)
-
-        # 컬럼 이름 가져오기
-        columns = [col[0].lower() for col in cur.description]
-
-        # 결과를 딕셔너리로 구성하고 LOB 처리
-        results = []
-        for row in cur.fetchall():
-            row_dict = {}
-            for col, val in zip(columns, row):
-                if isinstance(val, oracledb.LOB):
-                    row_dict[col] = val.read()  # CLOB을 문자열로 읽기
-                else:
-                    row_dict[col] = val
-            results.append(row_dict)
+    """
+    (exec_time, scheduler_id) keyset 페이지네이션 검색.
+    json: {"items": [...], "next_cursor": ...} 로 limit 개씩, ndjson: cursor 이후 전체를 한 줄에 한 행씩 스트리밍.
+    """
+    columns = search_fields(fields)
+    conditions = []
+    params = {}
+    if created_by:
+        conditions.append("created_by = :created_by")
+        params['created_by'] = created_by
+    if start_time:
+        conditions.append("exec_time >= :start_time")
+        params['start_time'] = start_time
+    if end_time:
+        conditions.append("exec_time <= :end_time")
+        params['end_time'] = end_time
+    if status:
+        conditions.append("status = :status")
+        params['status'] = status
+    if cursor:
+        params['c_time'], params['c_id'] = decode_cursor(cursor)
+        conditions.append("(exec_time > :c_time OR (exec_time = :c_time AND scheduler_id > :c_id))")
+
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    sql = f"SELECT {', '.join(columns)} FROM A{where_clause} ORDER BY exec_time, scheduler_id"
+
+    if format == "ndjson":
+        return StreamingResponse(stream_search(sql, params, columns), media_type="application/x-ndjson")
 
-        return results
+    try:
+        params['limit'] = limit + 1  # 한 행 더 읽어 다음 페이지 여부 판단
+        async with db.get_async_pool().acquire() as conn:
+            with conn.cursor() as cur:
+                cur.arraysize = min(limit + 1, SEARCH_BATCH)
+                # CLOB 은 LOB 로케이터 대신 문자열로 바로 받는다 (행마다 read() 왕복 없음)
+                await cur.execute(f"{sql} FETCH FIRST :limit ROWS ONLY", params, fetch_lobs=False)
+                rows = await cur.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = dict(zip(columns, rows[-1]))
+            next_cursor = encode_cursor(last["exec_time"], last["scheduler_id"])
+        return {"items": [dict(zip(columns, row)) for row in rows], "next_cursor": next_cursor}
     except Exception as e:
         mgr_logger.error(f"search_schedule error: {str(e)}")
-    finally:
-        cur.close()
-        conn.close()
 
 
+async def stream_search(sql, params, columns):
+    try:
+        async with db.get_async_pool().acquire() as conn:
+            with conn.cursor() as cur:
+                cur.arraysize = SEARCH_BATCH
+                await cur.execute(sql, params, fetch_lobs=False)
+                while True:
+                    rows = await cur.fetchmany(SEARCH_BATCH)
+                    if not rows:
+                        break
+                    yield "".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + "\n"
+                                  for row in rows)
+    except Exception as e:
+        mgr_logger.error(f"search_schedule stream error: {str(e)}")
+
 
 @app.post("/schedule/kill/{scheduler_id}")
-def kill_schedule(scheduler_id: str, user: str):
-    conn = db.get_connection()
-    cur = conn.cursor()
+async def kill_schedule(scheduler_id: str, user: str):
     try:
-        # 권한 확인
-        cur.execute("SELECT created_by FROM A WHERE scheduler_id = :1", [scheduler_id])
-        row = cur.fetchone()
-        if not row:
-            raise HTTPException(404, detail="Scheduler not found")
-        if row[0] != user:
-            raise HTTPException(403, detail="Not authorized")
-
-        # 실행 중인 app.py 프로세스 종료
-        killed_processes = 0
-        for proc in psutil.process_iter(['pid', 'cmdline']):
-            try:
-                cmd = proc.info['cmdline']
-                if cmd and 'app.py' in cmd and scheduler_id in cmd:
-                    proc.kill()
-                    killed_processes += 1
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-
-        # A 테이블 업데이트
-        cur.execute("UPDATE A SET status = 'KILLED' WHERE scheduler_id = :1", [scheduler_id])
-
-        # B 테이블 로그 기록
-        cur.execute("""
-            INSERT INTO B (log_time, scheduler_id, scheduler_name, status, message)
-            VALUES (
-                SYSDATE,
-                :1,
-                (SELECT scheduler_name FROM A WHERE scheduler_id = :1),
-                'KILLED',
-                :2
-            )
-        """, [scheduler_id, f'Killed by user {user}, {killed_processes} process(es) terminated'])
-
-        conn.commit()
+        async with db.get_async_pool().acquire() as conn:
+            with conn.cursor() as cur:
+                # 권한 확인
+                await cur.execute("SELECT created_by FROM A WHERE scheduler_id = :1", [scheduler_id])
+                row = await cur.fetchone()
+                if not row:
+                    raise HTTPException(404, detail="Scheduler not found")
+                if row[0] != user:
+                    raise HTTPException(403, detail="Not authorized")
+
+                # 실행 중인 app.py 프로세스 종료 (registry 에서 scheduler_id 로 조회, 프로세스 그룹 단위)
+                killed_processes = registry.kill(scheduler_id)
+
+                # A 테이블 업데이트
+                await cur.execute("UPDATE A SET status = 'KILLED' WHERE scheduler_id = :1", [scheduler_id])
+
+                # B 테이블 로그 기록
+                await cur.execute("""
+                    INSERT INTO B (log_time, scheduler_id, scheduler_name, status, message)
+                    VALUES (
+                        SYSDATE,
+                        :sid,
+                        (SELECT scheduler_name FROM A WHERE scheduler_id = :sid),
+                        'KILLED',
+                        :msg
+                    )
+                """, {"sid": scheduler_id, "msg": f'Killed by user {user}, {killed_processes} process(es) terminated'})
+
+                await conn.commit()
 
         return {
             "message": f"Scheduler {scheduler_id} killed.",
             "terminated_processes": killed_processes
         }
+    except HTTPException:
+        raise
     except Exception as e:
         mgr_logger.error(f"kill_schedule error: {str(e)}")
-    finally:
-        cur.close()
-        conn.close()
 
 
-@app.post("/schedule/delete")
-def delete_schedules(req: ScheduleDeleteRequest):
-    conn = db.get_connection()
-    cur = conn.cursor()
-    try:
-        # 기본 조건: status = 'REGISTERED' AND scheduler_id IN (...)
-        conditions = ["status = 'REGISTERED'"]
-        params = {}
-
-        if req.scheduler_ids:
-            conditions.append("scheduler_id IN :scheduler_ids")
-            params["scheduler_ids"] = tuple(req.scheduler_ids)
-
-        # 날짜 필터 추가
-        if req.start_time:
-            try:
-                start_dt = datetime.strptime(req.start_time, "%Y-%m-%d %H:%M:%S")
-                conditions.append("exec_time >= :start_time")
-                params["start_time"] = start_dt
-            except ValueError:
-                raise HTTPException(400, detail="start_time must be in 'YYYY-MM-DD HH24:MI:SS' format")
-
-        if req.end_time:
-            try:
-                end_dt = datetime.strptime(req.end_time, "%Y-%m-%d %H:%M:%S")
-                conditions.append("exec_time <= :end_time")
-                params["end_time"] = end_dt
-            except ValueError:
-                raise HTTPException(400, detail="end_time must be in 'YYYY-MM-DD HH24:MI:SS' format")
-
-        where_clause = " AND ".join(conditions)
-        sql = f"SELECT scheduler_id, exec_time FROM A WHERE {where_clause}"
-        cur.execute(sql, params)
-        rows = cur.fetchall()
-
-        if not rows:
-            raise HTTPException(404, detail="No REGISTERED schedules found for the given conditions")
+def remove_from_dispatcher(ids):
+    """scheduler_id 로 올린 job 을 dispatcher 에서 뺀다 (scheduler_id 인덱스, id 형식을 몰라도 O(k)).
+    materialize_rules 는 commit 후 window_lock 안에서 휠에 올리므로, 같은 잠금 안에서 빼야 놓치지 않는다."""
+    with window_lock:
+        return dispatcher.remove_by_key(ids)
 
-        # 삭제 대상 exec_time, job_id 리스트
-        job_ids = []
-        for scheduler_id, exec_time in rows:
-            job_id = f"{scheduler_id}_{exec_time.strftime('%Y-%m-%d %H:%M:%S')}"
-            job_ids.append(job_id)
 
-        # DB 삭제
-        delete_sql = f"DELETE FROM A WHERE {where_clause}"
-        cur.execute(delete_sql, params)
-        conn.commit()
+@app.post("/schedule/rule/stop/{rule_id}")
+async def stop_rule(rule_id: int, user: str):
+    """recurring 규칙을 STOPPED 로 바꿔 더 펼치지 않고, 이미 펼쳐 둔 REGISTERED job 은 CANCELED 로 바꾼다."""
+    try:
+        async with db.get_async_pool().acquire() as conn:
+            with conn.cursor() as cur:
+                # 권한 확인. materialize_rules 가 이 규칙을 펼치는 중이면 commit 할 때까지 기다린다
+                await cur.execute("SELECT created_by, status FROM A_RULE WHERE rule_id = :1 FOR UPDATE", [rule_id])
+                row = await cur.fetchone()
+                if not row:
+                    raise HTTPException(404, detail="Rule not found")
+                if row[0] != user:
+                    raise HTTPException(403, detail="Not authorized")
+
+                await cur.execute("UPDATE A_RULE SET status = 'STOPPED' WHERE rule_id = :1", [rule_id])
+                id_var = cur.var(int)
+                await cur.execute("UPDATE A SET status = 'CANCELED' WHERE rule_id = :1 AND status = 'REGISTERED'"
+                                  " RETURNING scheduler_id INTO :2", [rule_id, id_var])
+                ids = id_var.getvalue() or []
+                if ids:
+                    await cur.executemany("""
+                        INSERT INTO B (log_time, scheduler_id, scheduler_name, status, message)
+                        VALUES (SYSDATE, :sid, (SELECT scheduler_name FROM A WHERE scheduler_id = :sid), 'CANCELED', :msg)
+                    """, [{"sid": sid, "msg": f"Rule {rule_id} stopped by user {user}"} for sid in ids])
+                await conn.commit()
+
+        removed = await run_in_threadpool(remove_from_dispatcher, ids)
+        mgr_logger.info(f"stop_rule rule:{rule_id} was:{row[1]} canceled:{len(ids)} dispatcher_jobs:{len(removed)}")
+        return {
+            "rule_id": rule_id,
+            "status": "STOPPED",
+            "canceled_count": len(ids),
+            "canceled_scheduler_ids": ids,
+            "dispatcher_removed": len(removed)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        mgr_logger.error(f"stop_rule error: {str(e)}")
+
+
+# REGISTERED job 을 지우거나(DELETE) 취소(CANCELED)하면서 RETURNING 으로 대상 id 를 한 문장에 받는다.
+# id 목록은 행마다 바인드하는 array DML(executemany) 로, 구간만 주면 구간마다 한 행으로 실행한다
+BULK_TARGETS = {
+    "delete": "DELETE FROM A",
+    "cancel": "UPDATE A SET status = 'CANCELED'",
+}
+BULK_BY_ID_SQL = """
+    {target}
+    WHERE scheduler_id = :1 AND status = 'REGISTERED'
+      AND exec_time >= NVL(:2, exec_time) AND exec_time <= NVL(:3, exec_time)
+    RETURNING scheduler_id INTO :4
+"""
+BULK_BY_RANGE_SQL = """
+    {target}
+    WHERE status = 'REGISTERED'
+      AND exec_time >= NVL(:1, exec_time) AND exec_time <= NVL(:2, exec_time)
+    RETURNING scheduler_id INTO :3
+"""
+
+
+def parse_ranges(req):
+    """start_time/end_time 과 ranges 를 [(start, end)] 로. 형식이 틀리면 400."""
+    ranges = []
+    for r in [TimeRange(start_time=req.start_time, end_time=req.end_time)] + list(req.ranges):
+        if r.start_time is None and r.end_time is None:
+            continue
+        try:
+            ranges.append(tuple(datetime.strptime(t, "%Y-%m-%d %H:%M:%S") if t else None
+                                for t in (r.start_time, r.end_time)))
+        except ValueError:
+            raise HTTPException(400, detail="start_time/end_time must be in 'YYYY-MM-DD HH24:MI:SS' format")
+    return ranges
+
+
+async def bulk_remove(req, action):
+    """조건(scheduler_ids AND 구간 중 하나)에 맞는 REGISTERED job 을 지우거나 취소하고 dispatcher 에서도 뺀다."""
+    ranges = parse_ranges(req)
+    if not req.scheduler_ids and not ranges:
+        raise HTTPException(400, detail="scheduler_ids or a time range is required")
+    target = BULK_TARGETS[action]
+    async with db.get_async_pool().acquire() as conn:
+        with conn.cursor() as cur:
+            if req.scheduler_ids:
+                sql = BULK_BY_ID_SQL.format(target=target)
+                rows = [[sid, start, end] for sid in dict.fromkeys(req.scheduler_ids)
+                        for start, end in (ranges or [(None, None)])]
+                setsizes = (int, datetime, datetime)
+            else:
+                sql = BULK_BY_RANGE_SQL.format(target=target)
+                rows = [list(r) for r in ranges]
+                setsizes = (datetime, datetime)
+            id_var = cur.var(int, arraysize=len(rows))
+            cur.setinputsizes(*setsizes, id_var)
+            await cur.executemany(sql, rows)
+            # executemany + RETURNING 은 행마다 리스트로 돌려준다 (구간은 여러 개, id 는 0~1 개)
+            ids = list(dict.fromkeys(sid for i in range(len(rows)) for sid in id_var.getvalue(i)))
+            if ids and action == "cancel":
+                await cur.executemany("""
+                    INSERT INTO B (log_time, scheduler_id, scheduler_name, status, message)
+                    VALUES (SYSDATE, :sid, (SELECT scheduler_name FROM A WHERE scheduler_id = :sid), 'CANCELED', :msg)
+                """, [{"sid": sid, "msg": f"Canceled by user {req.user}"} for sid in ids])
+            await conn.commit()
+
+    removed = await run_in_threadpool(remove_from_dispatcher, ids)
+    mgr_logger.info(f"bulk {action} ids:{len(ids)} dispatcher_jobs:{len(removed)}")
+    return ids, removed
 
-        # APScheduler 작업 제거
-        for job_id in job_ids:
-            try:
-                scheduler.remove_job(job_id)
-            except JobLookupError:
-                pass  # 이미 제거되었거나 존재하지 않는 job
 
+@app.post("/schedule/delete")
+async def delete_schedules(req: ScheduleDeleteRequest):
+    try:
+        ids, removed = await bulk_remove(req, "delete")
+        if not ids:
+            raise HTTPException(404, detail="No REGISTERED schedules found for the given conditions")
         return {
-            "deleted_count": len(rows),
-            "deleted_scheduler_ids": list(set([r[0] for r in rows]))
+            "deleted_count": len(ids),
+            "deleted_scheduler_ids": ids,
+            "dispatcher_removed": len(removed)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         mgr_logger.error(f"delete_schedules error: {str(e)}")
-    finally:
-        cur.close()
-        conn.close()
 
 
+@app.post("/schedule/cancel")
+async def cancel_schedules(req: ScheduleDeleteRequest):
+    """delete 와 같은 조건으로 REGISTERED job 을 CANCELED 로 바꾼다 (행과 이력은 남긴다)."""
+    try:
+        ids, removed = await bulk_remove(req, "cancel")
+        return {
+            "canceled_count": len(ids),
+            "canceled_scheduler_ids": ids,
+            "dispatcher_removed": len(removed)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        mgr_logger.error(f"cancel_schedules error: {str(e)}")
+
+
+@app.get("/dispatcher/stats")
+def dispatcher_stats():
+    return dispatcher.stats()
+
+
+@app.get("/fair_share/stats")
+def fair_share_stats():
+    return worker_pool.stats()
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
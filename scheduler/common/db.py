@@ -4,6 +4,58 @@ import yaml
 with open("conf.yml") as f:
     config = yaml.safe_load(f)
 
+_pool = None
+_async_pool = None
+
 def get_connection():
     db_conf = config['db']
-    return oracledb.connect(user=db_conf['user'], password=db_conf['password'], dsn=db_conf['dsn'])
\ No newline at end of file
+    return oracledb.connect(user=db_conf['user'], password=db_conf['password'], dsn=db_conf['dsn'])
+
+def _pool_params():
+    db_conf = config['db']
+    return dict(user=db_conf['user'], password=db_conf['password'], dsn=db_conf['dsn'],
+                min=db_conf.get('pool_min', 1), max=db_conf.get('pool_max', 4), increment=1,
+                ping_interval=db_conf.get('ping_interval', 60), stmtcachesize=db_conf.get('stmtcachesize', 50))
+
+def get_pool():
+    # 프로세스 단위 커넥션 풀. fork/spawn 된 워커는 각자 자기 풀을 만든다.
+    global _pool
+    if _pool is None:
+        _pool = oracledb.create_pool(**_pool_params())
+    return _pool
+
+def get_async_pool():
+    # FastAPI async 핸들러용 풀. 이벤트 루프 안에서 처음 호출될 때 만든다.
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = oracledb.create_pool_async(**_pool_params())
+    return _async_pool
+
+def pool_usage():
+    # 만들어진 풀만 {이름: (busy, opened)} 로 (/metrics 용)
+    return {name: (pool.busy, pool.opened) for name, pool in (("sync", _pool), ("async", _async_pool))
+            if pool is not None}
+
+INSERT_LOG_SQL = """
+    INSERT INTO B (log_time, scheduler_id, scheduler_name, status, message)
+    VALUES (SYSDATE, :sid, (SELECT scheduler_name FROM A WHERE scheduler_id = :sid), :status, :msg)
+"""
+
+def insert_logs(rows):
+    # [(scheduler_id, status, message)] 를 B 에 한 번에 기록 (DeliveryQueue 의 전송 결과). B.MESSAGE 는 4000 바이트
+    with get_pool().acquire() as conn:
+        cur = conn.cursor()
+        cur.executemany(INSERT_LOG_SQL, [{"sid": sid, "status": status,
+                                          "msg": str(message).encode('utf-8')[:4000].decode('utf-8', 'ignore')}
+                                         for sid, status, message in rows])
+        conn.commit()
+        cur.close()
+
+async def close_pools():
+    global _pool, _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+    if _pool is not None:
+        _pool.close()
+        _pool = None
@@ -0,0 +1,34 @@
+from shared.delivery import DeliveryQueue
+from common import db
+
+
+def create_delivery(log=None, upload_observer=None, workers=None):
+    """conf.yml 의 mattermost, delivery 섹션으로 결과 파일 전송 큐를 만든다 (webhook_url 이 없으면 None)."""
+    mm_conf = db.config.get('mattermost', {})
+    if not mm_conf.get('webhook_url'):
+        return None
+    conf = db.config.get('delivery', {})
+    return DeliveryQueue(
+        {"mm": {"url": mm_conf['webhook_url'], "field": "files"}},
+        db,
+        workers=workers or conf.get('workers', 4),
+        per_target=conf.get('per_target', 4),
+        max_retries=conf.get('max_retries', 5),
+        backoff=conf.get('backoff_sec', 1.0),
+        timeout=mm_conf.get('timeout_sec', 30),
+        queue_size=conf.get('queue_size', 10000),
+        log=log,
+        upload_observer=upload_observer
+    )
+
+
+def deliver(queue, scheduler_id, stages, log=None):
+    """apps.app.run 이 돌려준 stages 의 결과 파일을 전송 큐에 넣는다. 큐가 차서 못 넣으면 B 에 DELIVERY_FAIL 로 남긴다."""
+    item = (stages or {}).get("delivery")
+    if not item or queue is None:
+        return
+    if queue.submit(scheduler_id, item["file_path"], {"text": item["text"]}):
+        msg = f"delivery queue full, not sent: {item['file_path']}"
+        if log:
+            log.error(f"[{scheduler_id}] {msg}")
+        db.insert_logs([(scheduler_id, "DELIVERY_FAIL", msg)])
@@ -1,16 +1,34 @@
 import logging
 import yaml
-import datetime
+from shared.async_log import AsyncLogPipeline, DailyFileHandler, with_sid
+from shared.metrics import REGISTRY
 
 with open("conf.yml") as f:
     config = yaml.safe_load(f)
 
-mgr_log_path = config['log']['mgr_log_path'] + datetime.datetime.now().strftime("%Y%m%d") + ".log"
-app_log_path = config['log']['app_log_path'] + datetime.datetime.now().strftime("%Y%m%d") + ".log"
-log_format = config['log']['format']
+log_conf = config['log']
+LOG_DROPPED = REGISTRY.counter("sched_log_dropped_total", "로그 큐가 넘쳐 버린 로그 수")
+
+
+def _not_app(record):
+    return record.name != "app" and not record.name.startswith("app.")
 
-logging.basicConfig(filename=mgr_log_path, level=logging.INFO, format=log_format)
-mgr_logger = logging.getLogger("scheduler")
 
-logging.basicConfig(filename=app_log_path, level=logging.INFO, format=log_format)
+# mgr 파일: 스케줄러와 라이브러리(apscheduler, uvicorn 등 root 로 오는 것) 로그, app 파일: job 실행 로그.
+# 예전처럼 basicConfig 를 두 번 부르면 두 번째는 무시되어 app 로그도 mgr 파일로 간다
+formatter = logging.Formatter(with_sid(log_conf['format']))
+mgr_handler = DailyFileHandler(log_conf['mgr_log_path'])
+mgr_handler.addFilter(_not_app)
+app_handler = DailyFileHandler(log_conf['app_log_path'])
+app_handler.addFilter(logging.Filter("app"))
+for h in (mgr_handler, app_handler):
+    h.setFormatter(formatter)
+
+pipeline = AsyncLogPipeline([mgr_handler, app_handler],
+                            queue_size=log_conf.get('queue_size', 10000),
+                            max_chars=log_conf.get('max_message_chars', 4000),
+                            on_drop=LOG_DROPPED.inc)
+pipeline.attach(logging.getLogger())
+
+mgr_logger = logging.getLogger("scheduler")
 app_logger = logging.getLogger("app")
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import signal
+import threading
+import traceback
+import psutil
+
+
+class ProcEntry:
+    __slots__ = ('pid', 'pgid', 'scheduler_id', 'exec_time', 'started_at', 'create_time', 'popen')
+
+    def __init__(self, pid, pgid, scheduler_id, exec_time, started_at, create_time, popen=None):
+        self.pid = pid
+        self.pgid = pgid
+        self.scheduler_id = str(scheduler_id)
+        self.exec_time = exec_time
+        self.started_at = started_at
+        self.create_time = create_time  # pid 재사용 확인용 (psutil create_time)
+        self.popen = popen
+
+    def to_dict(self):
+        return {"pid": self.pid, "pgid": self.pgid, "scheduler_id": self.scheduler_id, "exec_time": self.exec_time,
+                "started_at": self.started_at, "create_time": self.create_time}
+
+
+def _create_time(pid):
+    try:
+        return psutil.Process(pid).create_time()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return None
+
+
+class ProcessRegistry:
+    """
+    실행 중인 job 프로세스 레지스트리 (pid -> scheduler_id/exec_time, scheduler_id -> pid 집합).
+    kill 은 scheduler_id 로 O(1) 조회 후 프로세스 그룹 단위로 종료한다.
+    sidecar 파일에 주기적으로 기록해 두고 재기동 시 recover() 로 살아있는 프로세스만 다시 읽는다.
+    reaper 스레드가 종료된 프로세스를 정리(popen 은 wait 까지)하므로 엔트리가 남지 않는다.
+    """
+
+    def __init__(self, path=None, reap_interval=1.0, log=None):
+        self.path = path
+        self.reap_interval = reap_interval
+        self.log = log
+        self.entries = {}  # pid -> ProcEntry
+        self.by_sid = {}  # scheduler_id -> {pid}
+        self.lock = threading.Lock()
+        self.dirty = False
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._reap, name="ProcessRegistry-reaper", daemon=True).start()
+
+    def shutdown(self):
+        self._stop.set()
+        self._save()
+
+    def register(self, pid, scheduler_id, exec_time, popen=None, pgid=None):
+        entry = ProcEntry(pid, pgid, scheduler_id, exec_time, time.time(), _create_time(pid), popen)
+        with self.lock:
+            self.entries[pid] = entry
+            self.by_sid.setdefault(entry.scheduler_id, set()).add(pid)
+            self.dirty = True
+        return entry
+
+    def unregister(self, pid):
+        with self.lock:
+            entry = self.entries.pop(pid, None)
+            if entry is None:
+                return None
+            pids = self.by_sid.get(entry.scheduler_id)
+            if pids is not None:
+                pids.discard(pid)
+                if not pids:
+                    del self.by_sid[entry.scheduler_id]
+            self.dirty = True
+        return entry
+
+    def lookup(self, scheduler_id):
+        with self.lock:
+            return [self.entries[pid] for pid in self.by_sid.get(str(scheduler_id), ())]
+
+    def kill(self, scheduler_id):
+        killed = 0
+        for entry in self.lookup(scheduler_id):
+            if entry.create_time is not None and _create_time(entry.pid) != entry.create_time:
+                self.unregister(entry.pid)  # 이미 끝났고 pid 가 재사용됨
+                continue
+            try:
+                if entry.pgid and hasattr(os, "killpg"):
+                    os.killpg(entry.pgid, signal.SIGKILL)
+                else:
+                    psutil.Process(entry.pid).kill()
+                killed += 1
+            except (ProcessLookupError, psutil.NoSuchProcess):
+                self.unregister(entry.pid)
+            except (PermissionError, psutil.AccessDenied):
+                if self.log:
+                    self.log.error(f"kill {entry.pid} denied")
+        return killed
+
+    def recover(self):
+        """sidecar 파일에서 아직 살아있는 프로세스 엔트리를 읽어 온다."""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        recovered = 0
+        for d in saved:
+            if d.get("create_time") is None or _create_time(d["pid"]) != d["create_time"]:
+                continue
+            entry = ProcEntry(d["pid"], d["pgid"], d["scheduler_id"], d["exec_time"], d["started_at"], d["create_time"])
+            with self.lock:
+                self.entries[entry.pid] = entry
+                self.by_sid.setdefault(entry.scheduler_id, set()).add(entry.pid)
+            recovered += 1
+        self.dirty = True
+        return recovered
+
+    def _alive(self, entry):
+        if entry.popen is not None:
+            return entry.popen.poll() is None  # 자식 프로세스는 여기서 wait 되어 좀비가 남지 않는다
+        return entry.create_time is not None and _create_time(entry.pid) == entry.create_time
+
+    def _reap(self):
+        while not self._stop.wait(self.reap_interval):
+            try:
+                with self.lock:
+                    entries = list(self.entries.values())
+                for entry in entries:
+                    if not self._alive(entry):
+                        self.unregister(entry.pid)
+                self._save()
+            except Exception:
+                if self.log:
+                    self.log.error(f"ProcessRegistry reaper error:\n{traceback.format_exc()}")
+
+    def _save(self):
+        if not self.path or not self.dirty:
+            return
+        with self.lock:
+            data = [e.to_dict() for e in self.entries.values()]
+            self.dirty = False
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
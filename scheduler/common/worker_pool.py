@@ -0,0 +1,234 @@
+import os
+import time
+import queue
+import importlib
+import threading
+import traceback
+import multiprocessing as mp
+from multiprocessing.connection import wait
+import psutil
+from datetime import datetime
+from shared.fair_share import FairShareQueue
+from shared.metrics import REGISTRY, ROW_BUCKETS
+
+QUEUE_WAIT = REGISTRY.histogram("sched_queue_wait_seconds", "빈 워커를 기다린 시간 (submit → dispatch)")
+START_LAG = REGISTRY.histogram("sched_start_lag_seconds", "exec_time 대비 실제 시작 지연")
+JOB_STAGE = REGISTRY.histogram("sched_job_stage_seconds", "job 단계별 시간 (fetch: DB 조회, write: 파일 쓰기, upload: 전송)",
+                               ("stage",))
+JOB_ROWS = REGISTRY.histogram("sched_job_rows", "job 당 조회 행 수", buckets=ROW_BUCKETS)
+JOBS = REGISTRY.counter("sched_jobs_total", "끝난 job 수 (result: DONE, ERROR, GUARD, SKIPPED, killed, unknown)", ("result",))
+
+
+def _observe(stages):
+    if not stages:
+        JOBS.labels("unknown").inc()
+        return
+    for stage, seconds in (stages.get("seconds") or {}).items():
+        JOB_STAGE.labels(stage).observe(seconds)
+    if stages.get("rows") is not None:
+        JOB_ROWS.observe(stages["rows"])
+    JOBS.labels(stages.get("result") or "unknown").inc()
+
+
+def _start_lag(exec_time):
+    if isinstance(exec_time, str):
+        exec_time = datetime.strptime(exec_time, "%Y-%m-%d %H:%M:%S")
+    return time.time() - exec_time.timestamp()
+
+
+def _worker_main(pipe, handler, max_jobs, max_rss_mb):
+    if hasattr(os, "setsid"):
+        os.setsid()  # 워커마다 자기 프로세스 그룹 → kill 시 그룹 단위로 정리
+    # 워커는 미리 handler 모듈(apps.app → oracledb, openpyxl, requests, yaml)을 import 해 둔다
+    module_name, func_name = handler.split(":")
+    func = getattr(importlib.import_module(module_name), func_name)
+    proc = psutil.Process()
+    done = 0
+    while True:
+        msg = pipe.recv()
+        if msg is None:
+            break
+        scheduler_id, exec_time = msg
+        stages = None
+        try:
+            stages = func(scheduler_id, exec_time)  # 단계별 측정값 dict 를 돌려주면 부모의 /metrics 에 반영된다
+        except Exception:
+            traceback.print_exc()
+            stages = {"result": "ERROR"}
+        done += 1
+        recycle = done >= max_jobs or proc.memory_info().rss > max_rss_mb * 1024 * 1024
+        pipe.send(("done", scheduler_id, exec_time, recycle, stages if isinstance(stages, dict) else None))
+        if recycle:
+            break
+
+
+class Worker:
+    def __init__(self, process, pipe):
+        self.process = process
+        self.pipe = pipe
+        self.job = None  # 실행 중인 (scheduler_id, exec_time)
+        self.owner = None  # 실행 중인 job 의 등록자 (FairShareQueue.done 용)
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+
+class WorkerPool:
+    """
+    apps.app 를 미리 import 해 둔 장기 실행 워커 프로세스 풀.
+    job 은 (scheduler_id, exec_time) 으로 각 워커의 pipe 에 전달되고, 워커는 한 번에 한 job 만 처리한다.
+    max_jobs 개를 처리했거나 RSS 가 max_rss_mb 를 넘은 워커, 죽은(kill 된) 워커는 새 프로세스로 교체한다.
+    job 실행 중인 워커는 registry 에 등록되므로 registry.kill(scheduler_id) 로 종료할 수 있다.
+    대기 job 은 FairShareQueue 에 쌓이고, 워커가 비는 순간 등록자(owner) 간 가중치 라운드로빈으로 고른다.
+    워커가 job 결과(stages)를 보내면 on_result(scheduler_id, stages) 를 부른다 (결과 파일 전송 등, 워커는 이미 다음 job 을 받는다).
+    """
+
+    def __init__(self, handler, size, max_jobs=200, max_rss_mb=512, registry=None, log=None, owner_cap=0,
+                 weights=None, on_result=None):
+        self.handler = handler
+        self.registry = registry  # common.proc_registry.ProcessRegistry, 실행 중인 job 의 pid 를 기록
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.log = log
+        self.on_result = on_result
+        self.ctx = mp.get_context("spawn")  # 스레드가 떠 있는 부모를 fork 하지 않도록 spawn
+        self.pending = FairShareQueue(owner_cap=owner_cap, weights=weights, wait_observer=QUEUE_WAIT)
+        self.idle = queue.Queue()
+        self.workers = {}  # pid -> Worker
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        for _ in range(self.size):
+            self.idle.put(self._spawn())
+        threading.Thread(target=self._dispatch, name="WorkerPool-dispatch", daemon=True).start()
+        threading.Thread(target=self._collect, name="WorkerPool-collect", daemon=True).start()
+
+    def shutdown(self):
+        self._stop.set()
+        self.pending.close()
+        with self.lock:
+            workers = list(self.workers.values())
+        for w in workers:
+            try:
+                w.pipe.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for w in workers:
+            w.process.join(timeout=5)
+
+    def submit(self, scheduler_id, exec_time, owner=None, priority=0):
+        self.pending.put((scheduler_id, exec_time), owner, priority)
+
+    def running(self):
+        with self.lock:
+            return {w.pid: w.job for w in self.workers.values() if w.job}
+
+    def stats(self):
+        return self.pending.stats()
+
+    def _spawn(self):
+        parent, child = self.ctx.Pipe()
+        process = self.ctx.Process(target=_worker_main, args=(child, self.handler, self.max_jobs, self.max_rss_mb),
+                                   daemon=True)
+        process.start()
+        child.close()
+        w = Worker(process, parent)
+        with self.lock:
+            self.workers[w.pid] = w
+        return w
+
+    def _dispatch(self):
+        # 빈 워커를 먼저 확보한 뒤 job 을 고른다. 그래야 고르는 시점의 owner 별 실행 수로 공정하게 나눈다
+        w = None
+        while not self._stop.is_set():
+            if w is None:
+                w = self.idle.get()
+                if w.pid not in self.workers:
+                    w = None
+                    continue  # idle 상태에서 교체된 워커
+            job, owner = self.pending.get()
+            if job is None:
+                break
+            with self.lock:
+                alive = w.pid in self.workers
+            if not alive:
+                # job 을 기다리는 사이 교체된 워커
+                self.pending.done(owner)
+                self.pending.put(job, owner)
+                w = None
+                continue
+            with self.lock:
+                w.job = job
+                w.owner = owner
+            if self.registry:
+                self.registry.register(w.pid, job[0], job[1], pgid=w.pid)
+            try:
+                w.pipe.send((job[0], job[1]))
+                START_LAG.observe(_start_lag(job[1]))
+                w = None
+            except (BrokenPipeError, OSError):
+                # 죽은 워커 → 같은 job 을 다음 워커로 (교체는 _collect 가 sentinel 로 처리)
+                with self.lock:
+                    w.job = None
+                    w.owner = None
+                if self.registry:
+                    self.registry.unregister(w.pid)
+                self.pending.done(owner)
+                self.pending.put(job, owner)
+                w = None
+
+    def _collect(self):
+        while not self._stop.is_set():
+            with self.lock:
+                workers = list(self.workers.values())
+            by_conn = {w.pipe: w for w in workers}
+            by_sentinel = {w.process.sentinel: w for w in workers}
+            for ready in wait(list(by_conn) + list(by_sentinel), timeout=0.5):
+                if ready in by_conn:
+                    w = by_conn[ready]
+                    try:
+                        _, scheduler_id, exec_time, recycle, stages = ready.recv()
+                    except (EOFError, OSError):
+                        self._replace(w)
+                        continue
+                    _observe(stages)
+                    with self.lock:
+                        w.job = None
+                        owner, w.owner = w.owner, None
+                    self.pending.done(owner)
+                    if self.registry:
+                        self.registry.unregister(w.pid)
+                    if recycle:
+                        w.process.join(timeout=5)
+                        self._replace(w)
+                    else:
+                        self.idle.put(w)
+                    if self.on_result and stages:
+                        try:
+                            self.on_result(scheduler_id, stages)
+                        except Exception:
+                            if self.log:
+                                self.log.error(f"on_result error {scheduler_id}:\n{traceback.format_exc()}")
+                else:
+                    self._replace(by_sentinel[ready])
+
+    def _replace(self, w):
+        with self.lock:
+            if self.workers.pop(w.pid, None) is None:
+                return  # pipe EOF 와 sentinel 로 두 번 들어오는 경우
+            job = w.job
+            owner, w.owner = w.owner, None
+        if job:
+            self.pending.done(owner)
+        if self.registry:
+            self.registry.unregister(w.pid)
+        if job:
+            JOBS.labels("killed").inc()
+        if job and self.log:
+            self.log.info(f"worker {w.pid} exited while running {job} (exitcode={w.process.exitcode})")
+        w.pipe.close()
+        if not self._stop.is_set():
+            self.idle.put(self._spawn())
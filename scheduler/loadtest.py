@@ -0,0 +1,73 @@
+"""
+schedule_manager 부하 테스트.
+    python loadtest.py --url http://localhost:8000 --threads 32 --requests 2000 --endpoint search
+endpoint: search (GET /schedule/search), register (POST /schedule/register, 1회성 cron)
+"""
+import time
+import argparse
+import threading
+import requests
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def make_call(session, args, n):
+    if args.endpoint == "register":
+        body = {"scheduler_name": f"loadtest_{n}", "created_by": "loadtest", "cron_expr": "0 0 1 1 *",
+                "query": "SELECT 1 FROM DUAL"}
+        return session.post(f"{args.url}/schedule/register", json=body, timeout=30)
+    return session.get(f"{args.url}/schedule/search", params={"created_by": "loadtest"}, timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--endpoint", choices=["search", "register"], default="search")
+    args = parser.parse_args()
+
+    counter = iter(range(args.requests))
+    counter_lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    result_lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with counter_lock:
+                n = next(counter, None)
+            if n is None:
+                break
+            t0 = time.perf_counter()
+            try:
+                ok = make_call(session, args, n).status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            with result_lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - start
+
+    print(f"endpoint={args.endpoint} threads={args.threads} requests={len(latencies)} errors={errors[0]}")
+    print(f"throughput={len(latencies) / total:.1f} req/s")
+    print(f"p50={percentile(latencies, 50) * 1000:.1f}ms p99={percentile(latencies, 99) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
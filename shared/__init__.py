@@ -0,0 +1 @@
+# scheduler/ 와 test1/ 이 같이 쓰는 모듈. 저장소 루트에서 pip install -e . 로 설치한다.
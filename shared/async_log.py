@@ -0,0 +1,153 @@
+import os
+import queue
+import atexit
+import logging
+import threading
+import multiprocessing.util
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener
+
+
+def with_sid(fmt):
+    """format 에 %(sid)s 가 없으면 메시지 앞에 [sid] 를 넣는다 (기존 conf 의 format 을 그대로 쓸 수 있게)."""
+    if '%(sid)' in fmt:
+        return fmt
+    if '%(message)s' in fmt:
+        return fmt.replace('%(message)s', '[%(sid)s] %(message)s', 1)
+    return fmt + ' [%(sid)s]'
+
+
+class DailyFileHandler(logging.FileHandler):
+    """
+    prefix + YYYYMMDD + .log 에 쓰고 날짜가 바뀌면 다음 파일을 연다.
+    파일 이름을 바꾸는 rotation 이 없으므로 여러 프로세스(warm 워커)가 같은 파일에 append 해도 된다.
+    """
+
+    def __init__(self, prefix, encoding='utf-8'):
+        self.prefix = prefix
+        if os.path.dirname(prefix):
+            os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        self.rollover_at = 0
+        super().__init__(self._path(datetime.now()), encoding=encoding, delay=True)
+        self._set_rollover(datetime.now())
+
+    def _path(self, now):
+        return f"{self.prefix}{now:%Y%m%d}.log"
+
+    def _set_rollover(self, now):
+        self.rollover_at = datetime.combine(now.date() + timedelta(days=1), datetime.min.time()).timestamp()
+
+    def emit(self, record):
+        if record.created >= self.rollover_at:
+            now = datetime.fromtimestamp(record.created)
+            if self.stream:
+                self.stream.close()
+                self.stream = None  # 다음 emit 이 새 파일을 연다
+            self.baseFilename = os.path.abspath(self._path(now))
+            self._set_rollover(now)
+        super().emit(record)
+
+
+class _QueueHandler(QueueHandler):
+    """호출 스레드에서는 메시지 문자열만 만들고(긴 메시지는 자른다) 큐에 넣는다. 큐가 차면 버리고 센다."""
+
+    def __init__(self, pipeline):
+        super().__init__(pipeline.queue)
+        self.pipeline = pipeline
+
+    def prepare(self, record):
+        record = super().prepare(record)  # message + 예외 text 를 문자열로 (args, exc_info 참조를 끊는다)
+        limit = self.pipeline.max_chars
+        if limit and len(record.msg) > limit:
+            record.msg = record.message = f"{record.msg[:limit]}...(+{len(record.msg) - limit} chars)"
+        return record
+
+    def enqueue(self, record):
+        try:
+            if record.levelno >= logging.ERROR and self.pipeline.block_sec:
+                self.queue.put(record, timeout=self.pipeline.block_sec)  # 오류는 잠깐 기다려서라도 남긴다
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.pipeline._drop()
+            return
+        if self.pipeline.unreported:
+            self.pipeline._report()
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # 큐가 차 있어도 남은 로그를 다 쓴 뒤 멈추도록 기다린다
+
+
+class AsyncLogPipeline:
+    """
+    QueueHandler / QueueListener 비동기 로그.
+    job 스레드는 메시지를 큐에 넣기만 하고, 파일 쓰기는 listener 스레드 하나가 공유 handler(sink) 로 한다.
+      - 레코드에는 sid 필드가 있다 (logger.info(msg, extra={'sid': ...}), 없으면 '-')
+      - max_chars 보다 긴 메시지는 잘라서 넣는다
+      - 큐(queue_size)가 차면 INFO 이하는 버리고 dropped 로 센다. ERROR 이상은 block_sec 까지 기다린다
+      - 버린 개수는 다음에 넣는 로그 뒤에 WARNING 한 줄로 남기고, on_drop(n) 으로도 알린다 (/metrics)
+    프로세스 종료(atexit, multiprocessing 워커 종료) 시 큐에 남은 로그를 모두 쓰고 멈춘다.
+    """
+
+    def __init__(self, handlers, queue_size=10000, max_chars=4000, block_sec=1.0, on_drop=None):
+        self.queue = queue.Queue(queue_size)
+        self.max_chars = max_chars
+        self.block_sec = block_sec
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.unreported = 0
+        self.lock = threading.Lock()
+        self.handler = _QueueHandler(self)
+        self.handler.addFilter(self._default_sid)
+        self.listener = _Listener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        self.stopped = False
+        atexit.register(self.stop)
+        multiprocessing.util.Finalize(self, self.stop, exitpriority=100)  # 워커 프로세스는 atexit 을 거치지 않는다
+
+    @staticmethod
+    def _default_sid(record):
+        if not hasattr(record, 'sid'):
+            record.sid = '-'
+        return True
+
+    def attach(self, logger, level=logging.INFO):
+        """logger 의 레코드를 이 파이프라인으로 보낸다 (상위 logger 로는 전파하지 않는다)."""
+        logger.setLevel(level)
+        logger.addHandler(self.handler)
+        logger.propagate = False
+        return logger
+
+    def _drop(self):
+        with self.lock:
+            self.dropped += 1
+            self.unreported += 1
+        if self.on_drop:
+            self.on_drop(1)
+
+    def _report(self):
+        with self.lock:
+            n, self.unreported = self.unreported, 0
+        if not n:
+            return
+        record = logging.makeLogRecord({'name': 'async_log', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                                        'msg': f"log queue full, dropped {n} records", 'sid': '-'})
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.lock:
+                self.unreported += n
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "dropped": self.dropped}
+
+    def stop(self):
+        with self.lock:
+            if self.stopped:
+                return
+            self.stopped = True
+        self.listener.stop()
+        for h in self.listener.handlers:
+            h.flush()
@@ -0,0 +1,190 @@
+import os
+import time
+import uuid
+import queue
+import random
+import threading
+import traceback
+import mimetypes
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class MultipartFile:
+    """
+    multipart/form-data 본문을 파일을 통째로 읽지 않고 조금씩 흘려 보내는 스트림.
+    길이를 미리 계산해 두므로 requests 가 chunked 가 아닌 Content-Length 로 전송한다.
+    """
+
+    def __init__(self, fields, file_field, file_path, blocksize=64 * 1024):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.blocksize = blocksize
+        name = os.path.basename(file_path)
+        ctype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        head = b''.join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode('utf-8')
+            for k, v in (fields or {}).items())
+        head += (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{name}"\r\n'
+                 f'Content-Type: {ctype}\r\n\r\n').encode('utf-8')
+        self.parts = [head, None, f'\r\n--{self.boundary}--\r\n'.encode('utf-8')]
+        self.file_path = file_path
+        self.length = len(head) + os.path.getsize(file_path) + len(self.parts[2])
+        self._gen = self._chunks()
+        self._buf = b''
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return self._chunks()
+
+    def _chunks(self):
+        yield self.parts[0]
+        with open(self.file_path, 'rb') as f:
+            while True:
+                chunk = f.read(self.blocksize)
+                if not chunk:
+                    break
+                yield chunk
+        yield self.parts[2]
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buf) < size:
+            chunk = next(self._gen, None)
+            if chunk is None:
+                break
+            self._buf += chunk
+        if size < 0:
+            out, self._buf = self._buf, b''
+        else:
+            out, self._buf = self._buf[:size], self._buf[size:]
+        return out
+
+
+class DeliveryTask:
+    __slots__ = ('sid', 'file_path', 'fields', 'target', 'attempt')
+
+    def __init__(self, sid, file_path, fields, target):
+        self.sid = sid
+        self.file_path = file_path
+        self.fields = fields
+        self.target = target
+        self.attempt = 0
+
+
+class DeliveryQueue:
+    """
+    결과 파일 전송(Mattermost, 파일서버) 큐.
+    job 은 submit 으로 (파일, 대상) 만 넣고 바로 끝나고, 전송은 workers 개 업로더 스레드가 keep-alive 세션으로 처리한다.
+    대상별 동시 전송 수는 per_target 으로 제한하고, 실패하면 지수 backoff(+jitter) 후 다시 큐에 넣는다.
+    전송 결과(DELIVERED / DELIVERY_FAIL)는 모아서 B 테이블에 한 번에 기록한다.
+    """
+
+    def __init__(self, targets, db, workers=8, per_target=4, max_retries=5, backoff=1.0, timeout=60,
+                 queue_size=10000, flush_size=100, flush_interval=2.0, log=None, upload_observer=None):
+        self.targets = {name: t for name, t in targets.items() if t.get('url')}  # name -> {url, field}
+        self.db = db
+        self.log = log
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.upload_observer = upload_observer  # 성공한 전송 시간(초)을 observe (metrics.Histogram 등)
+        self.queue = queue.Queue(queue_size)
+        self.limits = {name: threading.BoundedSemaphore(per_target) for name in self.targets}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(len(self.targets), 1), pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.results = []  # (sid, status, message)
+        self.results_lock = threading.Lock()
+        self.pending = 0  # 큐 + 재시도 대기 + 전송 중
+        self.pending_cv = threading.Condition()
+        self._stop = threading.Event()
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"Delivery-{i}", daemon=True).start()
+        threading.Thread(target=self._flush_loop, name="Delivery-flush", daemon=True).start()
+
+    def submit(self, sid, file_path, fields=None, targets=None):
+        """대상별 전송 작업을 큐에 넣는다. 큐가 가득 차서 넣지 못한 대상 이름 목록을 돌려준다 (다 넣었으면 빈 목록).
+        이미 넣은 대상은 그대로 전송한다."""
+        skipped = []
+        for name in (targets or self.targets):
+            if name not in self.targets:
+                continue
+            self._add_pending(1)
+            try:
+                self.queue.put_nowait(DeliveryTask(sid, str(file_path), fields, name))
+            except queue.Full:
+                self._add_pending(-1)
+                skipped.append(name)
+        return skipped
+
+    def shutdown(self, timeout=30):
+        """큐에 남은 전송을 timeout 초까지 기다린 뒤 결과를 기록한다."""
+        with self.pending_cv:
+            self.pending_cv.wait_for(lambda: self.pending == 0, timeout)
+        self._stop.set()
+        self.flush()
+
+    def stats(self):
+        return {"pending": self.pending, "queued": self.queue.qsize(), "unflushed": len(self.results)}
+
+    def _add_pending(self, n):
+        with self.pending_cv:
+            self.pending += n
+            if self.pending == 0:
+                self.pending_cv.notify_all()
+
+    def _work(self):
+        while True:
+            task = self.queue.get()
+            try:
+                with self.limits[task.target]:
+                    self._send(task)
+                self._done(task, "DELIVERED", f"{task.target} {task.file_path}")
+            except Exception as e:
+                task.attempt += 1
+                if task.attempt > self.max_retries:
+                    self._done(task, "DELIVERY_FAIL", f"{task.target} {task.file_path}: {e}")
+                else:
+                    delay = self.backoff * (2 ** (task.attempt - 1)) * (0.5 + random.random())
+                    if self.log:
+                        self.log.info(f"[{task.sid}] delivery to {task.target} failed ({e}), retry in {delay:.1f}s")
+                    timer = threading.Timer(delay, self.queue.put, args=(task,))
+                    timer.daemon = True
+                    timer.start()
+
+    def _send(self, task):
+        target = self.targets[task.target]
+        body = MultipartFile(task.fields, target.get('field', 'file'), task.file_path)
+        started = time.perf_counter()
+        res = self.session.post(target['url'], data=body, headers={'Content-Type': body.content_type},
+                                timeout=self.timeout)
+        res.raise_for_status()
+        if self.upload_observer is not None:
+            self.upload_observer.observe(time.perf_counter() - started)
+
+    def _done(self, task, status, message):
+        with self.results_lock:
+            self.results.append((task.sid, status, message))
+            full = len(self.results) >= self.flush_size
+        if full:
+            self.flush()
+        self._add_pending(-1)
+
+    def flush(self):
+        with self.results_lock:
+            rows, self.results = self.results, []
+        if rows:
+            try:
+                self.db.insert_logs(rows)
+            except Exception:
+                if self.log:
+                    self.log.error(f"delivery flush error:\n{traceback.format_exc()}")
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
@@ -0,0 +1,155 @@
+import time
+import heapq
+import queue
+import threading
+from itertools import count
+from collections import OrderedDict
+
+
+class _Owner:
+    __slots__ = ('heap', 'running', 'weight', 'current', 'wait_sum', 'wait_max', 'dispatched')
+
+    def __init__(self, weight):
+        self.heap = []  # (-priority, seq, queued_at, item)
+        self.running = 0
+        self.weight = weight
+        self.current = 0  # smooth weighted round-robin 누적값
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.dispatched = 0
+
+
+class FairShareQueue:
+    """
+    owner(created_by) 별로 나눠 담고 owner 사이에서는 가중치 라운드로빈으로 꺼내는 큐.
+      - owner_cap: owner 별 동시 실행 상한 (0 이면 제한 없음). 상한에 걸린 owner 는 건너뛴다
+      - global_cap: 전체 동시 실행 상한 (DB 동시성 세마포어, 0 이면 제한 없음)
+      - weights: {owner: 가중치}, 없으면 default_weight
+      - 같은 owner 안에서는 priority 가 큰 것부터, 같으면 먼저 들어온 순서
+      - wait_observer: 꺼낼 때마다 대기 시간(초)을 observe(waited) 로 넘길 객체 (metrics.Histogram 등)
+      - max_idle_owners, idle_ttl: 대기/실행 중인 job 이 없는 owner 도 통계와 라운드로빈 누적값을 유지하도록 남겨 두고,
+        max_idle_owners 개를 넘거나 idle_ttl 초 동안 안 쓰인 owner 부터 지운다 (0 이면 그 조건은 끈다)
+    get() 으로 꺼낸 항목은 실행이 끝나면 반드시 done(owner) 를 호출해야 한다.
+    한 owner 가 한꺼번에 수백 개를 넣어도 다른 owner 의 job 은 다음 차례에 바로 나간다.
+    """
+
+    def __init__(self, owner_cap=0, global_cap=0, weights=None, default_weight=1, maxsize=0, wait_observer=None,
+                 max_idle_owners=1000, idle_ttl=3600):
+        self.owner_cap = owner_cap
+        self.global_cap = global_cap
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self.maxsize = maxsize
+        self.wait_observer = wait_observer
+        self.max_idle_owners = max_idle_owners
+        self.idle_ttl = idle_ttl
+        self.owners = {}  # owner -> _Owner
+        self.idle = OrderedDict()  # 할 일이 없는 owner -> 그렇게 된 시각 (오래된 것부터)
+        self.size = 0
+        self.running = 0
+        self.closed = False
+        self.seq = count()
+        self.cv = threading.Condition()
+
+    def put(self, item, owner=None, priority=0):
+        """넣는다. maxsize 를 넘으면 queue.Full."""
+        owner = owner or ""
+        with self.cv:
+            if self.maxsize and self.size >= self.maxsize:
+                raise queue.Full
+            o = self.owners.get(owner)
+            if o is None:
+                o = self.owners[owner] = _Owner(self.weights.get(owner, self.default_weight))
+            self.idle.pop(owner, None)
+            heapq.heappush(o.heap, (-(priority or 0), next(self.seq), time.monotonic(), item))
+            self.size += 1
+            self.cv.notify()
+
+    def get(self, timeout=None):
+        """(item, owner) 를 돌려준다. close() 후나 timeout 이면 (None, None)."""
+        with self.cv:
+            while True:
+                if self.closed:
+                    return None, None
+                owner = self._pick()
+                if owner is not None:
+                    break
+                if not self.cv.wait(timeout):
+                    return None, None
+            o = self.owners[owner]
+            _, _, queued_at, item = heapq.heappop(o.heap)
+            waited = time.monotonic() - queued_at
+            o.running += 1
+            o.dispatched += 1
+            o.wait_sum += waited
+            o.wait_max = max(o.wait_max, waited)
+            self.size -= 1
+            self.running += 1
+        if self.wait_observer is not None:
+            self.wait_observer.observe(waited)
+        return item, owner
+
+    def done(self, owner):
+        owner = owner or ""
+        with self.cv:
+            o = self.owners.get(owner)
+            if o is not None and o.running > 0:
+                o.running -= 1
+                self.running -= 1
+                if not o.heap and not o.running:
+                    self.idle[owner] = time.monotonic()
+                    self._evict_idle()
+            self.cv.notify_all()
+
+    def close(self):
+        with self.cv:
+            self.closed = True
+            self.cv.notify_all()
+
+    def _evict_idle(self):
+        # cv 안에서 호출. 한 번 쓰고 사라지는 owner 가 끝없이 쌓이지 않도록 오래 쉰 owner 부터 지운다
+        now = time.monotonic()
+        while self.idle:
+            owner, since = next(iter(self.idle.items()))
+            over = self.max_idle_owners and len(self.idle) > self.max_idle_owners
+            if not over and not (self.idle_ttl and now - since > self.idle_ttl):
+                break
+            del self.idle[owner]
+            del self.owners[owner]
+
+    def qsize(self):
+        return self.size
+
+    def _pick(self):
+        # smooth weighted round-robin: 후보마다 current += weight, 가장 큰 owner 를 고르고 전체 가중치만큼 뺀다
+        if self.global_cap and self.running >= self.global_cap:
+            return None
+        eligible = [(name, o) for name, o in self.owners.items()
+                    if o.heap and not (self.owner_cap and o.running >= self.owner_cap)]
+        if not eligible:
+            return None
+        total = 0
+        best = None
+        for name, o in eligible:
+            o.current += o.weight
+            total += o.weight
+            if best is None or o.current > best[1].current:
+                best = (name, o)
+        best[1].current -= total
+        return best[0]
+
+    def stats(self):
+        with self.cv:
+            return {
+                "queued": self.size,
+                "running": self.running,
+                "owner_cap": self.owner_cap,
+                "global_cap": self.global_cap,
+                "owners": {
+                    name: {"queued": len(o.heap), "running": o.running, "weight": o.weight,
+                           "dispatched": o.dispatched,
+                           "wait_avg_ms": round(o.wait_sum / o.dispatched * 1000, 1) if o.dispatched else 0.0,
+                           "wait_max_ms": round(o.wait_max * 1000, 1)}
+                    for name, o in self.owners.items()
+                },
+            }
@@ -0,0 +1,104 @@
+import re
+import time
+
+# 가드 종류 (B 의 STATUS='GUARD' 메시지 앞에 붙는다)
+TIMEOUT = "timeout"
+ROWS = "rows"
+BYTES = "bytes"
+COST = "cost"
+
+# call_timeout 초과: python-oracledb thin(DPY-4024) / thick(ORA-03156), SQLite progress handler 중단
+_TIMEOUT_ERROR = re.compile(r"\b(DPY-4024|ORA-03156)\b|^interrupted$")
+
+
+class GuardTripped(Exception):
+    """쿼리가 가드 한도에 걸렸다. kind: TIMEOUT, ROWS, BYTES, COST"""
+
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+
+def estimate_bytes(rows, sample=8):
+    """batch 의 대략적인 크기. 몇 행만 str 길이로 재서 batch 전체로 늘린다 (행마다 재지 않는다)."""
+    if not rows:
+        return 0
+    step = max(1, len(rows) // sample)
+    picked = rows[::step][:sample]
+    size = sum(len(str(v)) for row in picked for v in row if v is not None)
+    return size * len(rows) // len(picked)
+
+
+class QueryGuard:
+    """
+    config 의 guard 섹션. 사용자 SQL 하나가 풀 연결과 워커를 오래 잡지 못하게 한다 (0 이면 끈다).
+      - call_timeout_sec: DB 호출(execute, fetch round-trip) 하나의 제한 시간 (connection.call_timeout)
+      - max_run_sec: 실행 + 결과 스트리밍 전체 시간
+      - max_rows, max_mb: 스트리밍하면서 센 행 수 / 대략적인 크기
+      - max_cost, cost_action: 등록 시 EXPLAIN PLAN cost 가 max_cost 를 넘으면 reject(등록 거부) 또는 flag(B 에 기록)
+      - schedules: {scheduler_name: {위 항목}} 스케줄별 한도 (전역 값을 덮어쓴다)
+    """
+
+    def __init__(self, conf=None):
+        conf = conf or {}
+        self.conf = conf
+        self.call_timeout = conf.get('call_timeout_sec', 0)
+        self.max_run = conf.get('max_run_sec', 0)
+        self.max_rows = conf.get('max_rows', 0)
+        self.max_bytes = int(conf.get('max_mb', 0) * 1024 * 1024)
+        self.max_cost = conf.get('max_cost', 0)
+        self.cost_action = conf.get('cost_action', 'flag')
+        self.schedules = conf.get('schedules') or {}
+
+    def for_schedule(self, name):
+        override = self.schedules.get(name)
+        if not override:
+            return self
+        conf = dict(self.conf)
+        conf.update(override)
+        conf.pop('schedules', None)
+        return QueryGuard(conf)
+
+    @property
+    def call_timeout_ms(self):
+        return int(self.call_timeout * 1000)
+
+    def budget(self):
+        """실행 하나의 사용량. drain_to_sink(budget=...) 에 넘긴다."""
+        return QueryBudget(self)
+
+    def tripped(self, exc):
+        """DB 오류가 call_timeout 초과면 GuardTripped 로 바꿔 돌려준다 (아니면 None)."""
+        if isinstance(exc, GuardTripped):
+            return exc
+        if self.call_timeout and _TIMEOUT_ERROR.search(str(exc)):
+            return GuardTripped(TIMEOUT, f"call timeout {self.call_timeout}s exceeded: {exc}")
+        return None
+
+    def check_cost(self, cost):
+        """plan cost 를 보고 (action, 메시지) 를 돌려준다. 한도 안이거나 cost 를 모르면 None."""
+        if not self.max_cost or cost is None or cost <= self.max_cost:
+            return None
+        return self.cost_action, f"{COST}: plan cost {cost} exceeds max_cost {self.max_cost}"
+
+
+class QueryBudget:
+    """실행 하나의 행/바이트/시간 사용량. drain_to_sink 가 batch 를 쓰기 전에 add() 하고, 넘으면 GuardTripped."""
+
+    def __init__(self, guard):
+        self.guard = guard
+        self.rows = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    def add(self, rows):
+        g = self.guard
+        self.rows += len(rows)
+        if g.max_rows and self.rows > g.max_rows:
+            raise GuardTripped(ROWS, f"{ROWS}: more than {g.max_rows} rows")
+        if g.max_bytes:
+            self.bytes += estimate_bytes(rows)
+            if self.bytes > g.max_bytes:
+                raise GuardTripped(BYTES, f"{BYTES}: result larger than {g.max_bytes // 1024 // 1024}MB")
+        if g.max_run and time.monotonic() - self.started > g.max_run:
+            raise GuardTripped(TIMEOUT, f"{TIMEOUT}: running longer than {g.max_run}s")
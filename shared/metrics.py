@@ -0,0 +1,242 @@
+import time
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# 초 단위 (DB 조회, 파일 쓰기, 업로드, 대기, 지연)
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(v):
+    if v != v:
+        return "NaN"
+    if v == float("inf"):
+        return "+Inf"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+
+class _CounterChild:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self.lock:
+            self.value += n
+
+
+class _GaugeChild:
+    __slots__ = ('value', 'fn', 'lock')
+
+    def __init__(self):
+        self.value = 0
+        self.fn = None
+        self.lock = threading.Lock()
+
+    def set(self, v):
+        self.value = v
+
+    def inc(self, n=1):
+        with self.lock:
+            self.value += n
+
+    def dec(self, n=1):
+        self.inc(-n)
+
+    def set_function(self, fn):
+        """/metrics 를 읽을 때 fn() 값을 쓴다 (풀 사용량처럼 이미 다른 곳에 있는 값)."""
+        self.fn = fn
+
+    def get(self):
+        if self.fn is None:
+            return self.value
+        try:
+            return self.fn()
+        except Exception:
+            return float("nan")
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', 'lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 마지막 칸은 +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, v):
+        i = bisect_left(self.bounds, v)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += v
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    """with metric.time(): ... 구간 시간을 observe 한다."""
+    __slots__ = ('child', 'started')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.children = {}  # label 값 tuple -> child
+        self.lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """label 값별 child. 만든 child 는 캐시되므로 hot path 에서는 한 번 받아 두고 써도 된다."""
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: labels {self.labelnames} expected, got {values}")
+            with self.lock:
+                child = self.children.setdefault(values, self._new_child())
+        return child
+
+    def _label_text(self, values, extra=None):
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self.children.items()):
+            lines.extend(self._samples(values, child))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, n=1):
+        self._default.inc(n)
+
+    def _samples(self, values, child):
+        return [f"{self.name}{self._label_text(values)} {_fmt(child.value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, v):
+        self._default.set(v)
+
+    def inc(self, n=1):
+        self._default.inc(n)
+
+    def dec(self, n=1):
+        self._default.dec(n)
+
+    def set_function(self, fn):
+        self._default.set_function(fn)
+
+    def _samples(self, values, child):
+        return [f"{self.name}{self._label_text(values)} {_fmt(child.get())}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=TIME_BUCKETS):
+        self.bounds = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, help, labels)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, v):
+        self._default.observe(v)
+
+    def time(self):
+        return self._default.time()
+
+    def _samples(self, values, child):
+        with child.lock:
+            counts, total = list(child.counts), child.sum
+        out, acc = [], 0
+        for bound, n in zip(self.bounds + (float("inf"),), counts):
+            acc += n
+            le = 'le="' + _fmt(bound) + '"'
+            out.append(f"{self.name}_bucket{self._label_text(values, le)} {acc}")
+        out.append(f"{self.name}_sum{self._label_text(values)} {_fmt(total)}")
+        out.append(f"{self.name}_count{self._label_text(values)} {acc}")
+        return out
+
+
+class Registry:
+    """
+    프로세스 안의 메트릭 모음. /metrics 에서 render() 를 Prometheus text format(0.0.4) 으로 내보낸다.
+    기록(inc/observe)은 child 하나의 lock 만 잡으므로 job 실행 경로에서 불러도 부담이 없다.
+    같은 이름으로 다시 만들면 기존 메트릭을 돌려준다 (모듈이 두 번 import 되는 경우).
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self.lock:
+            m = self.metrics.get(name)
+            if m is None:
+                m = self.metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(m, cls):
+                raise ValueError(f"metric {name} already registered as {m.kind}")
+            return m
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=TIME_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets)
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import pstats
+import hashlib
+import cProfile
+import threading
+import tracemalloc
+from datetime import datetime
+from collections import Counter
+
+
+class ProfileConfig:
+    """
+    config 의 profile 섹션.
+      - enabled: 끄면 단계 타이머만 남고 샘플링, 아티팩트, 다음 실행 프로파일링을 하지 않는다
+      - threshold_sec: 이 시간을 넘긴 job 은 느린 job 으로 보고 스택을 샘플링하고 아티팩트를 남긴다
+      - sample_interval_sec: 느린 job 의 스택 샘플링 주기
+      - dir: 아티팩트(<scheduler_id>_<시각>.json)와 다음 실행 표시(armed/) 를 둘 디렉토리
+      - top: 아티팩트에 남길 cProfile 함수 / tracemalloc 위치 / 스택 개수
+    """
+
+    def __init__(self, conf=None):
+        conf = conf or {}
+        self.enabled = conf.get('enabled', True)
+        self.threshold = conf.get('threshold_sec', 60)
+        self.interval = conf.get('sample_interval_sec', 0.5)
+        self.dir = conf.get('dir', 'logs/profiles')
+        self.top = conf.get('top', 30)
+        self.max_stacks = conf.get('max_stacks', 200)
+        self.stack_depth = conf.get('stack_depth', 40)
+
+
+class _Watch:
+    """실행 중인 job(스레드) 을 interval 마다 훑어 threshold 를 넘긴 job 의 스택만 샘플링한다."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.active = {}  # thread ident -> JobProfiler
+        self.lock = threading.Lock()
+        threading.Thread(target=self._loop, name="JobProfiler-watch", daemon=True).start()
+
+    def add(self, prof):
+        with self.lock:
+            self.active[prof.thread_id] = prof
+
+    def remove(self, prof):
+        with self.lock:
+            if self.active.get(prof.thread_id) is prof:
+                del self.active[prof.thread_id]
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            with self.lock:
+                slow = [p for p in self.active.values() if now - p.started >= p.cfg.threshold]
+            if not slow:
+                continue
+            frames = sys._current_frames()
+            for p in slow:
+                frame = frames.get(p.thread_id)
+                if frame is not None:
+                    p.sample(frame)
+
+
+_watch = None
+_watch_lock = threading.Lock()
+_cprofile_lock = threading.Lock()  # cProfile 은 프로세스에 하나만 (3.12 부터는 동시에 켤 수 없다)
+_tracemalloc_users = 0
+_tracemalloc_owned = False  # 우리가 켠 tracemalloc 만 끈다
+_tracemalloc_lock = threading.Lock()
+
+
+def _get_watch(interval):
+    global _watch
+    with _watch_lock:
+        if _watch is None:
+            _watch = _Watch(interval)
+        return _watch
+
+
+def _arm_path(cfg, key):
+    return os.path.join(cfg.dir, "armed", hashlib.md5(str(key).encode("utf-8")).hexdigest())
+
+
+def arm(cfg, key):
+    """key(스케줄 이름) 의 다음 실행에서 cProfile + tracemalloc 을 켜도록 표시한다 (파일이라 워커 프로세스 간에도 보인다)."""
+    path = _arm_path(cfg, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(str(key))
+    except OSError:
+        pass
+
+
+def _take_armed(cfg, key):
+    # 여러 job 이 동시에 봐도 remove 에 성공한 하나만 프로파일링한다
+    try:
+        os.remove(_arm_path(cfg, key))
+        return True
+    except OSError:
+        return False
+
+
+class _Stage:
+    __slots__ = ('prof', 'name', 'wall', 'cpu')
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof.add(self.name, time.perf_counter() - self.wall, time.thread_time() - self.cpu)
+
+
+class JobProfiler:
+    """
+    job 하나의 단계별 wall/CPU 시간. 타이머는 항상 켜 두고(perf_counter, thread_time 두 번씩),
+    실행이 threshold 를 넘기면 watch 스레드가 그 스레드의 스택을 샘플링하고 같은 key 의 다음 실행을 arm 한다.
+    arm 된 실행은 cProfile + tracemalloc 으로 돌린다. 느렸거나 프로파일링한 실행은 finish() 가 아티팩트를 남긴다.
+        prof = JobProfiler(sid, cfg)
+        with prof.stage("prepare"): ...
+        prof.start(key)
+        with prof.stage("export"): ...
+        prof.finish("DONE")  # 느렸으면 B 에 남길 요약 문자열, 아니면 None
+    """
+
+    def __init__(self, sid, cfg):
+        self.sid = sid
+        self.cfg = cfg
+        self.key = None
+        self.stages = {}  # 단계 -> [wall, cpu]
+        self.counts = Counter()
+        self.samples = Counter()  # 접은 스택 -> 샘플 수
+        self.slow = False
+        self.thread_id = None
+        self.started = None
+        self.cpu_started = None
+        self.profile = None
+        self.tracing = False
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def add(self, name, wall, cpu=0.0):
+        acc = self.stages.get(name)
+        if acc is None:
+            acc = self.stages[name] = [0.0, 0.0]
+        acc[0] += wall
+        acc[1] += cpu
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+
+    def start(self, key=None):
+        """실행 시작. 실행하는 스레드에서 호출한다."""
+        global _tracemalloc_users, _tracemalloc_owned
+        self.key = key or self.sid
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.cpu_started = time.thread_time()
+        if not self.cfg.enabled:
+            return
+        _get_watch(self.cfg.interval).add(self)
+        if _take_armed(self.cfg, self.key):
+            if _cprofile_lock.acquire(blocking=False):
+                self.profile = cProfile.Profile()
+                self.profile.enable()
+            else:
+                arm(self.cfg, self.key)  # 다른 job 이 프로파일링 중이면 다음 실행으로 미룬다
+                return
+            with _tracemalloc_lock:
+                if _tracemalloc_users == 0:
+                    _tracemalloc_owned = not tracemalloc.is_tracing()
+                    if _tracemalloc_owned:
+                        tracemalloc.start(10)
+                _tracemalloc_users += 1
+                self.tracing = True
+
+    def sample(self, frame):
+        """watch 스레드에서 호출. frame 부터 바깥으로 접은 스택 하나를 센다."""
+        if not self.slow:
+            self._mark_slow()
+        parts = []
+        while frame is not None and len(parts) < self.cfg.stack_depth:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        stack = ";".join(reversed(parts))
+        if stack not in self.samples and len(self.samples) >= self.cfg.max_stacks:
+            stack = "<other>"
+        self.samples[stack] += 1
+
+    def _mark_slow(self):
+        self.slow = True
+        if self.profile is None:
+            arm(self.cfg, self.key)  # 이번 실행을 이미 프로파일링했으면 다시 arm 하지 않는다
+
+    def finish(self, result):
+        """실행 끝. 느렸거나 프로파일링한 실행이면 아티팩트를 쓰고 B 에 남길 요약 한 줄을, 아니면 None 을 돌려준다."""
+        global _tracemalloc_users
+        if self.started is None:
+            return None
+        wall = time.perf_counter() - self.started
+        cpu = time.thread_time() - self.cpu_started
+        if not self.cfg.enabled:
+            return None
+        _get_watch(self.cfg.interval).remove(self)
+        if wall >= self.cfg.threshold and not self.slow:
+            self._mark_slow()  # 샘플링 주기 사이에 끝난 느린 job
+        artifact = {"scheduler_id": self.sid, "key": str(self.key), "result": result,
+                    "finished_at": datetime.now().isoformat(timespec="seconds"),
+                    "threshold_sec": self.cfg.threshold, "wall_sec": round(wall, 3), "cpu_sec": round(cpu, 3),
+                    "stages": {k: {"wall_sec": round(v[0], 3), "cpu_sec": round(v[1], 3)}
+                               for k, v in self.stages.items()},
+                    "counts": dict(self.counts)}
+        if self.profile is not None:
+            self.profile.disable()
+            _cprofile_lock.release()
+            artifact["cprofile"] = self._cprofile_top()
+        if self.tracing:
+            artifact["tracemalloc"] = self._tracemalloc_top()
+            with _tracemalloc_lock:
+                _tracemalloc_users -= 1
+                if _tracemalloc_users == 0 and _tracemalloc_owned:
+                    tracemalloc.stop()
+        if not self.slow and self.profile is None:
+            return None
+        if self.samples:
+            artifact["samples"] = dict(self.samples.most_common(self.cfg.top))
+        path = self._write(artifact)
+        parts = [f"wall={wall:.2f}s", f"cpu={cpu:.2f}s"]
+        parts += [f"{k}={v[0]:.2f}/{v[1]:.2f}s" for k, v in self.stages.items()]  # wall/cpu
+        parts += [f"{k}={v}" for k, v in self.counts.items()]
+        parts += [f"samples={sum(self.samples.values())}",
+                  f"cprofile={'yes' if self.profile is not None else 'no'}", f"artifact={path}"]
+        return " ".join(parts)[:4000]
+
+    def _cprofile_top(self):
+        stats = pstats.Stats(self.profile)
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+            rows.append({"func": f"{os.path.basename(filename)}:{line}({func})", "ncalls": nc,
+                         "tottime": round(tt, 4), "cumtime": round(ct, 4)})
+        rows.sort(key=lambda r: r["cumtime"], reverse=True)
+        return rows[:self.cfg.top]
+
+    def _tracemalloc_top(self):
+        # tracemalloc 은 프로세스 전체를 본다 (같은 시각에 돈 다른 job 의 할당도 섞인다)
+        _, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:self.cfg.top]
+        return {"peak_mb": round(peak / 1024 / 1024, 2),
+                "top": [{"where": f"{os.path.basename(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+                         "size_kb": round(s.size / 1024, 1), "count": s.count} for s in top]}
+
+    def _write(self, artifact):
+        path = os.path.join(self.cfg.dir, f"{self.sid}_{datetime.now():%Y%m%d%H%M%S}.json")
+        try:
+            os.makedirs(self.cfg.dir, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(artifact, f, ensure_ascii=False, separators=(",", ":"))
+        except OSError:
+            return None
+        return path
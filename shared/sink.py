@@ -0,0 +1,203 @@
+import csv
+import gzip
+import json
+import queue
+import time
+import threading
+from openpyxl import Workbook
+
+EXCEL_MAX_ROWS = 1048576  # 엑셀 시트 최대 행 수
+
+
+class ExcelSink:
+    """
+    openpyxl write-only 모드로 행을 바로 흘려 쓰는 엑셀 sink.
+    시트 행 한도를 넘으면 새 시트를 만들고 헤더를 다시 쓴다. 메모리는 결과 크기와 무관하게 일정하다.
+    """
+
+    content_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    def __init__(self, file_path, max_rows=EXCEL_MAX_ROWS):
+        self.file_path = file_path
+        self.max_rows = max_rows
+        self.wb = Workbook(write_only=True)
+        self.ws = None
+        self.header = None
+        self.sheets = 0
+        self.sheet_rows = 0
+
+    def write_header(self, columns):
+        self.header = list(columns)
+
+    def write_rows(self, rows):
+        for r in rows:
+            if self.ws is None or self.sheet_rows >= self.max_rows:
+                self._new_sheet()
+            self.ws.append(r)
+            self.sheet_rows += 1
+
+    def close(self):
+        if self.ws is None:
+            self._new_sheet()  # 결과가 없어도 헤더만 있는 시트 하나는 남긴다
+        self.wb.save(self.file_path)
+
+    def _new_sheet(self):
+        self.sheets += 1
+        self.ws = self.wb.create_sheet(f"Sheet{self.sheets}")
+        self.sheet_rows = 0
+        if self.header:
+            self.ws.append(self.header)
+            self.sheet_rows = 1
+
+
+class CsvSink:
+    """행을 바로 CSV 로 쓰는 sink. 엑셀에서 한글이 깨지지 않도록 utf-8-sig 로 쓴다."""
+    content_type = 'text/csv'
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.f = self._open(file_path)
+        self.writer = csv.writer(self.f)
+
+    def _open(self, file_path):
+        return open(file_path, 'w', newline='', encoding='utf-8-sig')
+
+    def write_header(self, columns):
+        self.writer.writerow(columns)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.f.close()
+
+
+class GzipCsvSink(CsvSink):
+    content_type = 'application/gzip'
+
+    def _open(self, file_path):
+        return gzip.open(file_path, 'wt', newline='', encoding='utf-8', compresslevel=6)
+
+
+class JsonlSink:
+    """한 행을 {컬럼: 값} JSON 한 줄로 쓰는 sink. 날짜/숫자 등은 str 로 변환한다."""
+    content_type = 'application/x-ndjson'
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.f = open(file_path, 'w', encoding='utf-8')
+        self.columns = None
+
+    def write_header(self, columns):
+        self.columns = list(columns)
+
+    def write_rows(self, rows):
+        self.f.writelines(json.dumps(dict(zip(self.columns, r)), ensure_ascii=False, default=str) + '\n'
+                          for r in rows)
+
+    def close(self):
+        self.f.close()
+
+
+class ThreadedSink:
+    """
+    감싼 sink 의 인코딩/압축을 별도 스레드에서 수행해 DB fetch 와 겹치게 한다.
+    큐 크기(maxsize 배치)로 메모리를 제한하고, 쓰기 스레드의 오류는 write_rows/close 에서 다시 던진다.
+    """
+
+    def __init__(self, sink, maxsize=4):
+        self.sink = sink
+        self.file_path = sink.file_path
+        self.content_type = sink.content_type
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write_header(self, columns):
+        self.queue.put((self.sink.write_header, columns))
+
+    def write_rows(self, rows):
+        if self.error:
+            raise self.error
+        self.queue.put((self.sink.write_rows, rows))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        try:
+            if self.error:
+                raise self.error
+        finally:
+            # 쓰기 스레드가 실패했어도 감싼 sink 의 파일 핸들은 닫는다 (그때는 close 오류보다 쓰기 오류를 던진다)
+            try:
+                self.sink.close()
+            except Exception:
+                if not self.error:
+                    raise
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error:
+                continue  # 오류 후에는 생산자가 막히지 않도록 비우기만 한다
+            func, arg = item
+            try:
+                func(arg)
+            except Exception as e:
+                self.error = e
+
+
+SINKS = {
+    'xlsx': ExcelSink,
+    'csv': CsvSink,
+    'csv.gz': GzipCsvSink,
+    'jsonl': JsonlSink,
+}
+
+
+def open_sink(output_format, base_path, threaded=False):
+    """output_format(xlsx, csv, csv.gz, jsonl) 에 맞는 sink 를 base_path.<format> 로 연다."""
+    output_format = output_format or 'xlsx'
+    if output_format not in SINKS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    sink = SINKS[output_format](f"{base_path}.{output_format}")
+    return ThreadedSink(sink) if threaded else sink
+
+
+def stream_to_sink(cur, sql, sink, arraysize=5000, timings=None, budget=None):
+    """sql 을 실행해 fetchmany(arraysize) 단위로 sink 에 흘려 쓰고 행 수를 돌려준다. sink 는 호출자가 close.
+    timings(dict) 를 주면 'fetch'(execute + fetchmany), 'write'(sink.write_rows) 초를 더해 둔다.
+    budget(guard.QueryBudget) 을 주면 batch 마다 행/크기/시간 한도를 확인한다."""
+    cur.arraysize = arraysize
+    cur.prefetchrows = arraysize + 1
+    started = time.perf_counter()
+    cur.execute(sql, fetch_lobs=False)
+    if timings is not None:
+        timings['fetch'] = timings.get('fetch', 0.0) + time.perf_counter() - started
+    return drain_to_sink(cur, sink, arraysize, timings, budget)
+
+
+def drain_to_sink(cur, sink, arraysize=5000, timings=None, budget=None):
+    """이미 실행한 cursor 의 결과를 fetchmany(arraysize) 단위로 sink 에 쓰고 행 수를 돌려준다 (DB-API cursor 면 된다)."""
+    sink.write_header([d[0] for d in cur.description])
+    count = 0
+    fetch = write = 0.0
+    while True:
+        t0 = time.perf_counter()
+        rows = cur.fetchmany(arraysize)
+        t1 = time.perf_counter()
+        fetch += t1 - t0
+        if not rows:
+            break
+        if budget is not None:
+            budget.add(rows)  # 한도를 넘은 batch 는 쓰지 않고 GuardTripped
+        sink.write_rows(rows)
+        write += time.perf_counter() - t1
+        count += len(rows)
+    if timings is not None:
+        timings['fetch'] = timings.get('fetch', 0.0) + fetch
+        timings['write'] = timings.get('write', 0.0) + write
+    return count
@@ -0,0 +1,172 @@
+import math
+import time
+import threading
+import traceback
+from collections import deque
+from apscheduler.jobstores.base import JobLookupError
+
+
+class WheelJob:
+    __slots__ = ('id', 'func', 'args', 'run_date', 'run_ts', 'slot', 'key')
+
+    def __init__(self, id, func, args, run_date, key=None):
+        self.id = id
+        self.func = func
+        self.args = args
+        self.run_date = run_date
+        self.key = key  # 보조 인덱스 키 (scheduler_id), remove_by_key 용
+        self.run_ts = math.ceil(run_date.timestamp())  # 초 단위 슬롯, 일찍 fire 되지 않도록 올림
+        self.slot = None  # 현재 들어가 있는 슬롯(dict), 취소 시 O(1) 삭제용
+
+    def __repr__(self):
+        return f"WheelJob(id={self.id}, run_date={self.run_date})"
+
+
+class TimingWheel:
+    """
+    초(60)/분(60)/시(24) 3단 계층 타이밍 휠 디스패처.
+    insert/cancel 은 O(1) 이고, 같은 초 슬롯에 걸린 job 은 한 번에 batch 로 fire 된다.
+    APScheduler 와 같은 add_job/remove_job/get_job/get_jobs 인터페이스를 제공한다.
+    add_job(key=scheduler_id) 로 넣은 job 은 remove_by_key 로 job id 형식을 몰라도 키 k 개에 O(k) 로 지운다.
+    job 함수는 tick 스레드에서 바로 호출되므로 오래 걸리는 일은 스레드/프로세스로 넘겨야 한다.
+    """
+
+    def __init__(self, log=None, skew_history=300):
+        self.seconds = [{} for _ in range(60)]
+        self.minutes = [{} for _ in range(60)]
+        self.hours = [{} for _ in range(24)]
+        self.overflow = {}  # 24시간 이후 job, 매 정시에 다시 배치
+        self.index = {}  # job_id -> WheelJob
+        self.keys = {}  # key -> {job_id: WheelJob}
+        self.lock = threading.Lock()
+        self.log = log
+        self.current = int(time.time())  # 처리가 끝난 마지막 tick (epoch sec)
+        self.fired = 0
+        self.skews = deque(maxlen=skew_history)  # 슬롯별 (slot_ts, job 수, fire skew 초)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="TimingWheel", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def add_job(self, func, run_date, id, args=None, key=None):
+        job = WheelJob(id, func, list(args or []), run_date, key)
+        with self.lock:
+            old = self.index.pop(id, None)
+            if old:
+                del old.slot[id]
+                self._unindex(old)
+            self.index[id] = job
+            if key is not None:
+                self.keys.setdefault(key, {})[id] = job
+            self._place(job)
+        return job
+
+    def remove_job(self, id):
+        with self.lock:
+            job = self.index.pop(id, None)
+            if job is None:
+                raise JobLookupError(id)
+            del job.slot[id]
+            self._unindex(job)
+
+    def remove_by_key(self, keys):
+        """key 로 넣은 job 을 모두 지우고 지운 job id 목록을 돌려준다 (없는 key 는 건너뛴다)."""
+        removed = []
+        with self.lock:
+            for key in keys:
+                for job in (self.keys.pop(key, None) or {}).values():
+                    del self.index[job.id]
+                    del job.slot[job.id]
+                    removed.append(job.id)
+        return removed
+
+    def _unindex(self, job):
+        if job.key is None:
+            return
+        jobs = self.keys.get(job.key)
+        if jobs is not None:
+            jobs.pop(job.id, None)
+            if not jobs:
+                del self.keys[job.key]
+
+    def get_job(self, id):
+        return self.index.get(id)
+
+    def get_jobs(self):
+        with self.lock:
+            return list(self.index.values())
+
+    def stats(self):
+        skews = list(self.skews)
+        return {
+            "jobs": len(self.index),
+            "fired": self.fired,
+            "max_skew_sec": max((s for _, _, s in skews), default=0.0),
+            "slots": [{"slot": ts, "jobs": n, "skew_sec": round(s, 6)} for ts, n, s in skews],
+        }
+
+    def _place(self, job):
+        # 기준 tick 은 다음에 처리할 tick. 이미 지난 job 은 다음 tick 에 fire
+        ref = self.current + 1
+        ts = max(job.run_ts, ref)
+        if ts // 60 == ref // 60:
+            slot = self.seconds[ts % 60]
+        elif ts // 3600 == ref // 3600:
+            slot = self.minutes[(ts // 60) % 60]
+        elif ts // 3600 - ref // 3600 < 24:
+            slot = self.hours[(ts // 3600) % 24]
+        else:
+            slot = self.overflow
+        slot[job.id] = job
+        job.slot = slot
+
+    def _cascade(self, slot):
+        jobs = list(slot.values())
+        slot.clear()
+        for job in jobs:
+            self._place(job)
+
+    def _tick(self, t):
+        with self.lock:
+            # 상위 휠 슬롯을 하위 휠로 내려보낸 뒤 초 슬롯을 fire
+            if t % 3600 == 0:
+                self._cascade(self.hours[(t // 3600) % 24])
+                self._cascade(self.overflow)
+            if t % 60 == 0:
+                self._cascade(self.minutes[(t // 60) % 60])
+            slot = self.seconds[t % 60]
+            batch = list(slot.values())
+            slot.clear()
+            for job in batch:
+                del self.index[job.id]
+                self._unindex(job)
+            self.current = t
+
+        if not batch:
+            return
+        self.skews.append((t, len(batch), time.time() - t))
+        for job in batch:
+            try:
+                job.func(*job.args)
+            except Exception:
+                if self.log:
+                    self.log.error(f"TimingWheel job {job.id} error:\n{traceback.format_exc()}")
+        self.fired += len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            target = int(time.time())
+            while self.current < target:
+                self._tick(self.current + 1)
+            # 다음 초 경계까지 대기
+            self._stop.wait(max(0.0, target + 1 - time.time()))
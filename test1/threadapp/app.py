@@ -1,28 +1,60 @@
+import os
 import re
 import time
+import shutil
+from collections import Counter
 
 import yaml
 import traceback
 import unicodedata
 from pathlib import Path
-from openpyxl import Workbook
-import oracledb
 from utils.log_handler import LogHandler
+from shared.sink import open_sink
+from shared.metrics import REGISTRY, ROW_BUCKETS
+from shared.profiling import JobProfiler, ProfileConfig
+from utils.retry_policy import RetryPolicy, RetryableError, MISSING, EMPTY, GUARD
+from shared.guard import QueryGuard, GuardTripped
+
+START_LAG = REGISTRY.histogram("sched_start_lag_seconds", "exec_time 대비 실제 시작 지연")
+JOB_STAGE = REGISTRY.histogram("sched_job_stage_seconds", "job 단계별 시간 (fetch: DB 조회, write: 파일 쓰기, upload: 전송)",
+                               ("stage",))
+JOB_ROWS = REGISTRY.histogram("sched_job_rows", "job 당 조회 행 수", buckets=ROW_BUCKETS)
+JOBS = REGISTRY.counter("sched_jobs_total", "끝난 job 수 (result: DONE, ERROR)", ("result",))
+RETRIES = REGISTRY.counter("sched_job_retries_total", "backoff 후 다시 넣은 job 수 (kind: 오류 종류)", ("kind",))
 
 class TaskRunner:
-    def __init__(self, sid, env, db):
-        with open(f"config/{env}.yml", encoding="utf-8") as f:
-            cfg = yaml.safe_load(f)
+    def __init__(self, sid, env, db, flight=None, delivery=None, cfg=None, attempts=None):
+        if cfg is None:
+            with open(f"config/{env}.yml", encoding="utf-8") as f:
+                cfg = yaml.safe_load(f)
 
         self.output_file_path = Path(cfg['output']['file_path'])
         self.output_file_path.mkdir(parents=True, exist_ok=True)
+        self.arraysize = cfg['output'].get('arraysize', 5000)
+        self.threaded_sink = cfg['output'].get('threaded', True)  # 인코딩/압축을 fetch 와 다른 스레드에서
 
         self.sid = sid
         self.db = db
-        self.log = LogHandler(cfg['log'], self.sid)
-        self.db.setlog(self.log)
+        self.flight = flight  # utils.single_flight.SingleFlight, 같은 SQL/실행 분의 쿼리를 한 번만 실행
+        self.exec_time = None
+        # prepare() 에서 채운다 (pre-staging 이면 exec_time 전에 미리)
+        self.prepared = False
+        self.sqltxt = None
+        self.output_format = None
+        self.owner = None
+        self.name = None
+        self.base_path = None
+        self.conn = None  # 미리 잡아 둔 DB 연결 (없으면 실행 시점에 pool 에서)
+        self.start_offset = None  # exec_time 대비 실제 시작 시각 차이(초)
+        self.delivery = delivery  # utils.delivery.DeliveryQueue, 결과 파일 전송은 큐에 넣고 job 은 바로 끝낸다
+        self.log = LogHandler(cfg['log'], self.sid)  # 공유 로그 파이프라인, 레코드에 sid 필드 (DbHandler 로그는 main 에서 setlog)
         self.mm_url = cfg.get('mm_url')
         self.fs_url = cfg.get('fs_url')
+        self.retry_policy = RetryPolicy(cfg.get('retry'))
+        self.guard = QueryGuard(cfg.get('guard'))  # prepare() 에서 스케줄별 한도로 바꾼다
+        self.attempts = attempts if attempts is not None else Counter()  # 오류 종류 -> 재시도 수 (TaskManager 가 실행 사이에 들고 있다)
+        self.retry_after = None  # run() 이 재시도로 끝났으면 다시 넣을 때까지 초
+        self.prof = JobProfiler(self.sid, ProfileConfig(cfg.get('profile')))  # 단계별 시간, 느린 job 프로파일링
 
     def safe_filename(self, name):
         name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
@@ -33,114 +65,170 @@ class TaskRunner:
         sqltxt = re.sub(r'--.*?$', '', sqltxt, flags=re.MULTILINE)
         return sqltxt
 
-    def _get_schedule_record(self, retry=3):
+    def flight_key(self, sqltxt, output_format):
+        # 공백만 다른 같은 SQL 은 같은 키, exec_time 은 분 단위로 묶는다
+        sql = re.sub(r'\s+', ' ', sqltxt).strip().rstrip(';')
+        bucket = self.exec_time.replace(second=0, microsecond=0) if self.exec_time else None
+        return sql, bucket, output_format or 'xlsx'
+
+    def _get_schedule_record(self):
         self.log.info(f"Fetching schedule record for SID: {self.sid}")
-        cnt =0
-        while True:
-            rec = self.db.get_schedule(self.sid)
-            if not rec:
-                time.sleep(1)
-                cnt = cnt + 1
-                rec = self.db.get_schedule(self.sid)
-                self.log.info(f"No schedule record found for SID {self.sid}. retry {cnt}")
-                if cnt > retry:
-                    self.log.error(f"No schedule record found for SID {self.sid}. retry {cnt}")
-                    break
-            else:
-                break
+        rec = self.db.get_schedule(self.sid)
+        if not rec:
+            # 여기서 sleep 하며 기다리지 않고 TaskManager 가 backoff 뒤에 다시 넣는다
+            raise RetryableError(MISSING, f"No schedule record for SID {self.sid}")
         return rec
 
     def _extract_sql(self, rec):
-        if isinstance(rec.get('query'), oracledb.LOB):
+        if hasattr(rec.get('query'), 'read'):  # Oracle CLOB (oracledb.LOB)
             return self.to_clean_sql(rec['query'].read())
         return self.to_clean_sql(rec['query'])
 
-    def _fetch_data(self, sqltxt, retry=3):
+    def prepare(self, reserve=False):
+        """레코드 조회, SQL 정리, 출력 경로 계산(+연결 예약)을 실행 전에 끝내 둔다."""
+        with self.prof.stage("prepare"):
+            self._prepare(reserve)
+
+    def _prepare(self, reserve):
+        rec = self._get_schedule_record()
+        # rec 전체(query CLOB 포함)가 아니라 필요한 필드만 남긴다
+        self.log.info(f"[{self.sid}] rec: name={rec.get('scheduler_name')} exec_time={rec.get('exec_time')} "
+                      f"status={rec.get('status')} format={rec.get('output_format')}")
+        self.exec_time = rec.get('exec_time')
+        self.sqltxt = self._extract_sql(rec)
+        self.log.info(f"[{self.sid}] sqltxt:{self.sqltxt}")
+        self.output_format = rec.get('output_format')
+        self.owner = rec.get('created_by')
+        self.name = rec['scheduler_name']
+        self.guard = self.guard.for_schedule(self.name)
+        self.base_path = self.output_file_path / f"{self.safe_filename(self.name)}_{self.sid}"
+        if reserve and self.conn is None:
+            self.conn = self.db.reserve_connection()
+        self.prepared = True
+
+    def _fetch_data(self, sqltxt, output_format, base_path):
+        """쿼리 결과를 sink 로 스트리밍 저장하고 (행 수, 파일 경로)를 돌려준다.
+        0 행은 정상 결과(빈 파일)이고, retry.empty_result: retry 일 때만 EMPTY 로 재시도한다."""
         if not sqltxt:
             self.log.info("SQL query is empty or invalid")
             raise ValueError("SQL query is empty or invalid")
-        res = self.db.fetch_query(sqltxt)
-        self.log.info(f"{self.sid} _fetch_data res:{res}")
-        cnt = 0
-        while True:
-            if not res:
-                time.sleep(1)
-                cnt = cnt + 1
-                res = self.db.fetch_query(sqltxt)
-                self.log.info(f"No schedule record found for SID {self.sid}. retry {cnt}")
-                if cnt > retry:
-                    self.log.error(f"No schedule record found for SID {self.sid}. retry {cnt}")
-                    return None
-            else:
-                return res
-
-
-    def _save_to_excel(self, rows, file_path):
+        res = self._export(sqltxt, output_format, base_path)
+        self.log.info(f"{self.sid} _fetch_data rows:{res}")
+        if res[0] == 0 and self.retry_policy.empty_retry:
+            raise RetryableError(EMPTY, f"[{self.sid}] empty result")
+        return res
+
+    def _export(self, sqltxt, output_format, base_path):
+        if self.flight is None:
+            return self._export_query(sqltxt, output_format, base_path)
+        res, shared = self.flight.do(self.flight_key(sqltxt, output_format),
+                                     lambda: self._export_query(sqltxt, output_format, base_path))
+        if res and shared:
+            # 다른 스케줄이 만든 결과 파일을 내 파일 이름으로 복사
+            count, src = res
+            dst = f"{base_path}.{output_format or 'xlsx'}"
+            if str(src) != dst:
+                shutil.copyfile(src, dst)
+            self.log.info(f"[{self.sid}] shared result of {src}")
+            return count, dst
+        return res
+
+    def _export_query(self, sqltxt, output_format, base_path):
+        sink = open_sink(output_format, base_path, self.threaded_sink)
+        timings = {}
         try:
-            wb = Workbook()
-            ws = wb.active
-            for r in rows:
-                ws.append(r)
-            wb.save(file_path)
+            count = self.db.export_query(sqltxt, sink, self.arraysize, self.conn, timings, raise_errors=True,
+                                         guard=self.guard)
         except Exception as e:
-            self.log.error(f"Failed to save Excel file:\n{traceback.format_exc()}")
-
-    def run(self, retry=3):
+            try:
+                sink.close()  # 쓰기 스레드, 파일 핸들 정리 (원래 예외를 그대로 던진다)
+                if isinstance(e, GuardTripped) and os.path.exists(sink.file_path):
+                    os.remove(sink.file_path)  # 한도에서 끊긴 결과는 남기지 않는다
+            except Exception:
+                pass
+            raise
+        started = time.perf_counter()
         try:
-            self.log.info(f"[{self.sid}] Task started.")
-            cnt = 0
-            while True:
-                rec = self._get_schedule_record()
-                self.log.info(f"[{self.sid}] rec:{rec}")
-                sqltxt = self._extract_sql(rec)
-                self.log.info(f"[{self.sid}] sqltxt:{sqltxt}")
-                rows = self._fetch_data(sqltxt)
-                self.log.info(f"[{self.sid}] rows:{rows}")
-                if rows:
-                    break
-                else:
-                    if cnt > retry:
-                        msg = f"[{self.sid}] select retry over ERROR"
-                        self.log.info(msg)
-                        self.db.insert_log(self.sid, "ERROR", msg)
-                        self.db.update_status(self.sid, "ERROR")
-                        return
-                    else:
-                        self.log.info(f"[{self.sid}] select retry:{cnt}")
-                        cnt = cnt + 1
-
-            safe_name = self.safe_filename(rec['scheduler_name'])
-            file_name = f"{safe_name}_{self.sid}.xlsx"
-            file_path = self.output_file_path / file_name
-
-            self._save_to_excel(rows, file_path)
+            sink.close()
+        except Exception as e:
+            self.log.error(f"Failed to save {output_format} file:\n{traceback.format_exc()}")
+            raise
+        timings['write'] = timings.get('write', 0.0) + time.perf_counter() - started
+        for stage, seconds in timings.items():
+            JOB_STAGE.labels(stage).observe(seconds)
+            self.prof.add(stage, seconds)
+        JOB_ROWS.observe(count)
+        return count, sink.file_path
+
+    def run(self):
+        """한 번 실행한다. 재시도할 오류면 retry_after(초)를 남기고 바로 끝낸다 (TaskManager 가 다시 넣는다)."""
+        result = "ERROR"
+        self.retry_after = None
+        try:
+            if not self.prepared:
+                self.prepare()
+            self.prof.start(self.name)  # 다음 실행 arm 은 스케줄 이름 단위 (실행마다 scheduler_id 가 다르다)
+            if self.exec_time:
+                self.start_offset = time.time() - self.exec_time.timestamp()
+                if not self.attempts:  # 재시도는 backoff 만큼 늦게 시작하므로 시작 지연에 넣지 않는다
+                    START_LAG.observe(self.start_offset)
+            self.log.info(f"[{self.sid}] Task started. start_offset:{self.start_offset}")
+            rows, file_path = self._fetch_data(self.sqltxt, self.output_format, self.base_path)
+
+            offset_ms = round(self.start_offset * 1000, 1) if self.start_offset is not None else None
             self.log.info(f"[{self.sid}] Task SUCCESS. Saved to {file_path}")
             self.db.update_status(self.sid, "SUCCESS")
-            self.db.insert_log(self.sid, "SUCCESS", f"Saved to {file_path}")
+            self.db.insert_log(self.sid, "SUCCESS", f"Saved to {file_path} (start_offset_ms={offset_ms})")
 
-            # Optional: File post actions
-            # self._post_file(file_path)
+            if self.delivery:
+                skipped = self.delivery.submit(self.sid, file_path, {'msg': str(file_path)})
+                if skipped:
+                    # 파일은 정상으로 만들었으므로 job 은 DONE 으로 끝내고, 보내지 못한 대상만 B 에 남긴다
+                    msg = f"delivery queue full, not sent to {', '.join(skipped)}: {file_path}"
+                    self.log.error(f"[{self.sid}] {msg}")
+                    self.db.insert_log(self.sid, "DELIVERY_FAIL", msg)
 
             self.log.info(f"[{self.sid}] Task done. File: {file_path}")
-            self.db.update_status(self.sid, "DONE")
             self.db.insert_log(self.sid, "DONE", f"[{self.sid}] Task done.")
+            self.db.update_status(self.sid, "DONE")  # 종료 상태 → 버퍼 동기 flush
+            JOBS.labels("DONE").inc()
+            result = "DONE"
         except Exception as e:
-            err_msg = f"[{self.sid}] Task failed: {e}"
-            self.log.error(f"{err_msg}\n{traceback.format_exc()}")
-            self.db.insert_log(self.sid, "ERROR", str(e))
-            self.db.update_status(self.sid, "ERROR")
+            kind = self.retry_policy.classify(e)
+            delay = self.retry_policy.next_delay(kind, self.attempts)
+            if delay is not None:
+                # 워커와 연결을 잡고 sleep 하지 않는다. 상태는 RUNNING 그대로라 lease 도 계속 연장된다
+                msg = f"[{self.sid}] {kind} error, retry {self.attempts[kind]} in {delay:.1f}s: {e}"
+                self.log.info(msg)
+                self.db.insert_log(self.sid, "RETRY", msg)
+                RETRIES.labels(kind).inc()
+                self.retry_after = delay
+                result = "RETRY"
+            elif kind == GUARD:
+                # 가드에 걸린 job 은 B 에 ERROR 와 구분해 GUARD 로 남긴다 (A 는 ERROR)
+                msg = f"[{self.sid}] {e}"
+                self.log.error(msg)
+                self.db.insert_log(self.sid, "GUARD", msg)
+                self.db.update_status(self.sid, "ERROR")
+                JOBS.labels("GUARD").inc()
+                result = "GUARD"
+            else:
+                err_msg = f"[{self.sid}] Task failed ({kind}, retries {dict(self.attempts)}): {e}"
+                self.log.error(f"{err_msg}\n{traceback.format_exc()}")
+                self.db.insert_log(self.sid, "ERROR", err_msg)
+                self.db.update_status(self.sid, "ERROR")
+                JOBS.labels("ERROR").inc()
         finally:
+            if self.conn is not None:
+                self.db.release_connection(self.conn)
+                self.conn = None
+            summary = self.prof.finish(result)
+            if summary:
+                self.log.info(f"[{self.sid}] profile {summary}")
+                self.db.insert_log(self.sid, "PROFILE", summary)
             self.log.close()
 
 
-    # Optional future enhancement
-    # def _post_file(self, file_path):
-    #     files = {'file': open(file_path, 'rb')}
-    #     requests.post(self.mm_url, files=files, data={'msg': str(file_path)})
-    #     requests.post(self.fs_url, files=files)
-
-
-
 '''
 if __name__ == "__main__":
     sid, env = int(sys.argv[1]), sys.argv[2]
@@ -1,23 +1,66 @@
-import os, yaml, psutil, time, threading, traceback
+import os, yaml, psutil, time, threading, traceback, socket
 import uvicorn
 import gc
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-from apscheduler.schedulers.background import BackgroundScheduler
-from concurrent.futures import ThreadPoolExecutor
-from typing import List
-from utils.db_handler_pool import DbHandlerPool
+from collections import deque, Counter
+from typing import List, Optional
+from utils.db_handler import create_db_handler, TERMINAL_STATUSES
 from utils.log_handler import LogHandler
-from threadapp.app import TaskRunner
+from shared.timing_wheel import TimingWheel
+from shared.sink import SINKS
+from utils.single_flight import SingleFlight
+from shared.delivery import DeliveryQueue
+from utils.bounded_executor import BoundedExecutor, HANDED_OFF
+from shared.metrics import REGISTRY, CONTENT_TYPE
+from shared.guard import QueryGuard
+from threadapp.app import TaskRunner, JOB_STAGE
 
 # 설정
 env = os.getenv("ENV", "dev")
 with open(f"config/{env}.yml", encoding="utf-8") as f:
     cfg = yaml.safe_load(f)
-db = DbHandlerPool(cfg['oracle'])
+wb_cfg = cfg.get('write_behind', {})
+cache_cfg = cfg.get('schedule_cache', {})
+db = create_db_handler(cfg, flush_size=wb_cfg.get('flush_size', 200),
+                       flush_interval=wb_cfg.get('flush_interval_sec', 0.5),
+                       max_pending_logs=wb_cfg.get('max_pending_logs', 50000),
+                       row_attempts=wb_cfg.get('row_attempts', 3),
+                       cache_ttl=cache_cfg.get('ttl_sec', 300), cache_size=cache_cfg.get('max_entries', 10000),
+                       reserve_size=cfg.get('prestage', {}).get('max_reserved', 100))
 log = LogHandler(cfg['log'])
 db.setlog(log)
+scan_cfg = cfg.get('scan', {})
+node_id = scan_cfg.get('node_id') or f"{socket.gethostname()}-{os.getpid()}"
+lease_sec = scan_cfg.get('lease_sec', 60)  # 스캔 주기보다 충분히 길게
+flight_cfg = cfg.get('single_flight', {})
+flight = SingleFlight(ttl=flight_cfg.get('ttl_sec', 0), max_entries=flight_cfg.get('max_entries', 256)) \
+    if flight_cfg.get('enabled', True) else None
+delivery_cfg = cfg.get('delivery', {})
+delivery = DeliveryQueue(
+    {"mm": {"url": cfg.get('mm_url')}, "fs": {"url": cfg.get('fs_url')}},
+    db,
+    workers=delivery_cfg.get('workers', 8),
+    per_target=delivery_cfg.get('per_target', 4),
+    max_retries=delivery_cfg.get('max_retries', 5),
+    backoff=delivery_cfg.get('backoff_sec', 1.0),
+    timeout=delivery_cfg.get('timeout_sec', 60),
+    queue_size=delivery_cfg.get('queue_size', 10000),
+    log=log,
+    upload_observer=JOB_STAGE.labels("upload")
+) if cfg.get('mm_url') or cfg.get('fs_url') else None
+
+GUARD = QueryGuard(cfg.get('guard'))
+
+# /metrics. job 단계별 히스토그램은 threadapp.app(TaskRunner) 이 채운다
+QUEUE_WAIT = REGISTRY.histogram("sched_queue_wait_seconds", "executor 큐에서 빈 워커를 기다린 시간")
+SCAN = REGISTRY.histogram("sched_scan_seconds", "스캔 시간 (claim: lease 연장 + claim_schedules)", ("scan",))
+OVERFLOW = REGISTRY.counter("sched_executor_overflow_total", "executor 큐가 넘쳐 미루거나(defer) 버린(reject) job 수",
+                            ("action",))
+POOL_CONNECTIONS = REGISTRY.gauge("sched_db_pool_connections", "DB 커넥션 풀 연결 수", ("pool", "state"))
+POOL_CONNECTIONS.labels("sync", "busy").set_function(lambda: db.pool.busy)
+POOL_CONNECTIONS.labels("sync", "idle").set_function(lambda: db.pool.opened - db.pool.busy)
 
 # FastAPI 앱
 app = FastAPI(
@@ -34,6 +77,8 @@ class ScheduleIn(BaseModel):
     created_by: str
     exec_time: datetime
     query: str
+    output_format: str = "xlsx"  # xlsx, csv, csv.gz, jsonl
+    priority: int = 0  # 같은 등록자의 job 이 밀려 있을 때 큰 값부터 실행
 
     class Config:
         json_schema_extra = {
@@ -41,79 +86,241 @@ class ScheduleIn(BaseModel):
                 "scheduler_name": "DailyReport",
                 "created_by": "admin",
                 "exec_time": "2025-06-26T15:00:00",
-                "query": "SELECT * FROM report_table"
+                "query": "SELECT * FROM report_table",
+                "output_format": "xlsx",
+                "priority": 0
             }
         }
 
 class TaskManager:
-    def __init__(self, max_workers=1000):
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
-        self.lock = threading.Lock()
-        self.active_tasks = set()
-        self.completed_tasks = 0
-        self.sched = None
+    """
+    스캐너가 claim 한 job 을 exec_time - lead_sec 에 미리 준비(pre-staging)시킨다.
+    준비(레코드/SQL/출력 경로, 연결 예약)를 마친 job 은 exec_time 별 barrier 에서 기다렸다가 한꺼번에 시작하고,
+    실제 시작 시각과 exec_time 의 차이(start offset)를 기록한다.
+    barrier 에서 워커를 잡고 기다리는 job 은 max_parked 개까지다. 나머지는 준비만 해 두고 워커를 놓았다가
+    barrier 가 열릴 때 다시 executor 에 들어간다 (기다리는 job 이 워커를 다 잡아 앞선 job 이 밀리지 않도록).
+    """
+
+    def __init__(self, exec_cfg=None, fair_cfg=None, stage_cfg=None):
+        exec_cfg = exec_cfg or {}
+        fair_cfg = fair_cfg or {}
+        stage_cfg = stage_cfg or {}
+        self.defer_sec = exec_cfg.get('defer_sec', 5)
+        self.lead_sec = stage_cfg.get('lead_sec', 3)  # exec_time 몇 초 전에 준비를 시작할지 (0 이면 pre-staging 안 함)
+        self.reserve = stage_cfg.get('reserve_connections', True)
+        self.barrier_grace = stage_cfg.get('barrier_grace_sec', 30)
+        self.barriers = {}  # exec_time -> threading.Event (exec_time 에 Timer 가 set)
+        self.late = {}  # Event -> [TaskRunner] (워커 없이 준비만 해 둔 job)
+        workers = exec_cfg.get('workers', 150)
+        self.park_slots = threading.BoundedSemaphore(stage_cfg.get('max_parked', max(1, workers // 2)))
+        self.barrier_lock = threading.Lock()
+        self.offsets = deque(maxlen=5000)  # 최근 job 의 start offset(초)
+        self.staged = 0
+        self.retry_counts = {}  # sid -> Counter(오류 종류 -> 재시도 수), 재시도 사이에 budget 을 센다
+        self.retry_lock = threading.Lock()
+        self.sched = TimingWheel(log=log)
+        self.sched.start()
+        # 동시 실행 수는 DB 커넥션 풀(최대 200) 안쪽으로 제한하고, 넘치는 job 은 큐에서 기다린다
+        self.executor = BoundedExecutor(
+            workers=workers,
+            queue_size=exec_cfg.get('queue_size', 2000),
+            policy=exec_cfg.get('policy', 'defer'),
+            defer=self._defer,
+            on_reject=self._reject,
+            log=log,
+            name="TaskRunner",
+            owner_cap=fair_cfg.get('owner_cap', 20),
+            weights=fair_cfg.get('weights'),
+            wait_observer=QUEUE_WAIT
+        )
         threading.Thread(target=self._monitor_threads, daemon=True).start()
         threading.Thread(target=self._schedule_scanner, daemon=True).start()
         #threading.Thread(target=self._process_logger, daemon=True).start()
 
-    def run_task(self, sid: int):
-        runner = TaskRunner(sid, env, db)
+    def run_task(self, sid: int, barrier=None):
+        with self.retry_lock:
+            attempts = self.retry_counts.get(sid)
+        runner = TaskRunner(sid, env, db, flight, delivery, cfg, attempts)
+        if barrier is not None:
+            try:
+                runner.prepare(reserve=self.reserve)
+            except Exception as e:
+                log.error(f"Task {sid} prepare failed: {traceback.format_exc()}")  # run() 에서 다시 시도
+            if self.park_slots.acquire(blocking=False):
+                try:
+                    if not barrier.wait(self.lead_sec + self.barrier_grace):
+                        log.error(f"Task {sid} barrier timeout")
+                finally:
+                    self.park_slots.release()
+            else:
+                with self.barrier_lock:
+                    if not barrier.is_set():
+                        self.late.setdefault(barrier, []).append(runner)
+                        return HANDED_OFF  # _release 가 다시 executor 에 넣는다
+        self.run_prepared(runner)
+
+    def run_prepared(self, runner):
+        if (db.get_schedule(runner.sid) or {}).get('status') == 'KILLED':  # 큐/barrier 에서 기다리는 동안 kill 된 job
+            log.info(f"Task {runner.sid} killed before start")
+            self._drop_runner(runner)
+            return
         try:
             runner.run()
         except Exception as e:
-            log.error(f"Task {sid} failed: {traceback.format_exc()}")
+            log.error(f"Task {runner.sid} failed: {traceback.format_exc()}")
         finally:
-            with self.lock:
-                self.completed_tasks += 1
-                self.active_tasks.discard(threading.current_thread())
+            if runner.start_offset is not None and not runner.attempts:
+                self.offsets.append(runner.start_offset)
+            with self.retry_lock:
+                if runner.retry_after is not None:
+                    self.retry_counts[runner.sid] = runner.attempts
+                else:
+                    self.retry_counts.pop(runner.sid, None)
+            if runner.retry_after is not None:
+                self._retry(runner.sid, runner.retry_after)
+
+    def kill(self, sids):
+        """KILLED 로 바뀐 job 을 타이밍 휠(scheduler_id 인덱스, O(k))과 재시도 대기에서 뺀다. 이미 실행 중인 job 은 끝까지 돈다."""
+        removed = self.sched.remove_by_key(sids)
+        with self.retry_lock:
+            for sid in sids:
+                self.retry_counts.pop(sid, None)
+        return removed
+
+    def _retry(self, sid, delay):
+        # 워커는 바로 놓고 delay 초 뒤에 타이밍 휠이 다시 executor 에 넣는다
+        self.sched.add_job(self._run_retry, run_date=datetime.now() + timedelta(seconds=delay), id=str(sid),
+                           args=[sid], key=sid)
+
+    def _run_retry(self, sid):
+        rec = db.get_schedule(sid) or {}
+        if rec.get('status') in TERMINAL_STATUSES:  # 기다리는 동안 KILLED 된 job
+            with self.retry_lock:
+                self.retry_counts.pop(sid, None)
+            log.info(f"retry of {sid} skipped, status {rec.get('status')}")
+            return
+        self.run_task_wrapper(sid)
 
     def run_task_wrapper(self, sid: int):
         try:
-            t = threading.Thread(target=self.run_task, args=(sid,))
-            with self.lock:
-                self.active_tasks.add(t)
-            t.start()
+            # 스캐너가 claim 하면서 캐시에 채워 두므로 보통 DB 조회 없이 등록자/priority 를 얻는다
+            rec = db.get_schedule(sid) or {}
+            barrier = self._barrier(rec.get('exec_time')) if self.lead_sec else None
+            if barrier is not None:
+                self.staged += 1
+            self.executor.submit(self.run_task, sid, barrier, owner=rec.get('created_by'),
+                                 priority=rec.get('priority') or 0)
         except Exception as e:
             log.error(f"run_task_wrapper Error {sid}: {traceback.format_exc()}")
 
+    def _barrier(self, exec_time):
+        """exec_time 에 열리는 barrier. 이미 지난 시각이면 None (바로 실행)."""
+        if exec_time is None:
+            return None
+        delay = exec_time.timestamp() - time.time()
+        if delay <= 0:
+            return None
+        with self.barrier_lock:
+            event = self.barriers.get(exec_time)
+            if event is None:
+                event = self.barriers[exec_time] = threading.Event()
+                timer = threading.Timer(delay, self._release, args=(exec_time,))
+                timer.daemon = True
+                timer.start()
+            return event
+
+    def _release(self, exec_time):
+        with self.barrier_lock:
+            event = self.barriers.pop(exec_time, None)
+            if event is None:
+                return
+            event.set()
+            late = self.late.pop(event, [])
+        for runner in late:
+            # 이미 준비가 끝난 job 이므로 같은 등록자의 대기 job 보다 먼저 나가도록 priority 를 올린다
+            self.executor.submit(self.run_prepared, runner, owner=runner.owner, priority=1 << 30)
+
+    def stage_stats(self):
+        offsets = sorted(self.offsets)
+
+        def pct(p):
+            return round(offsets[min(len(offsets) - 1, int(len(offsets) * p / 100))] * 1000, 1) if offsets else 0.0
+
+        with self.barrier_lock:
+            waiting = len(self.barriers)
+        return {"lead_sec": self.lead_sec, "staged": self.staged, "barriers_waiting": waiting,
+                "samples": len(offsets), "offset_p50_ms": pct(50), "offset_p99_ms": pct(99),
+                "offset_max_ms": round(offsets[-1] * 1000, 1) if offsets else 0.0}
+
+    def _defer(self, fn, args):
+        # 큐가 가득 찼으면 defer_sec 뒤에 다시 넣어 본다
+        sid = self._sid(args)
+        self._drop_runner(args[0])  # 준비된 job 이면 다시 준비하므로 예약 연결을 돌려준다
+        log.info(f"executor queue full, defer {sid} {self.defer_sec}s")
+        OVERFLOW.labels("defer").inc()
+        self.sched.add_job(self.run_task_wrapper, run_date=datetime.now() + timedelta(seconds=self.defer_sec),
+                           id=str(sid), args=[sid], key=sid)
+
+    def _reject(self, fn, args):
+        sid = self._sid(args)
+        self._drop_runner(args[0])
+        log.error(f"executor queue full, reject {sid}")
+        OVERFLOW.labels("reject").inc()
+        with self.retry_lock:
+            self.retry_counts.pop(sid, None)
+        db.insert_log(sid, "ERROR", f"[{sid}] rejected: executor queue full")
+        db.update_status(sid, "ERROR")
+
+    @staticmethod
+    def _sid(args):
+        return args[0].sid if isinstance(args[0], TaskRunner) else args[0]
+
+    @staticmethod
+    def _drop_runner(runner):
+        """실행하지 않을 TaskRunner 가 prepare 에서 예약한 연결(과 예약 슬롯)을 돌려준다."""
+        if isinstance(runner, TaskRunner) and runner.conn is not None:
+            db.release_connection(runner.conn)
+            runner.conn = None
+
     def _monitor_threads(self):
+        # 평소에는 /executor/stats, /metrics 로 본다. log.level 이 DEBUG 일 때만 2초마다 남긴다
         while True:
-            with self.lock:
-                job_count = 0
-                if self.sched:
-                    job_count = len(self.sched.get_jobs())
-                print(f"[{datetime.now()}]JobCount:{job_count} Active: {len(self.active_tasks)} | Completed: {self.completed_tasks}")
-                if len(self.active_tasks) == 0:
-                    self.completed_tasks = 0
+            st = self.executor.stats()
+            log.debug(f"JobCount:{len(self.sched)} Running: {st['running']} Queued: {st['queued']} "
+                      f"| Completed: {st['completed']} Rejected: {st['rejected']} Deferred: {st['deferred']}")
             time.sleep(2)
 
     def _schedule_scanner(self):
-        self.sched = BackgroundScheduler(job_defaults={"max_instances": 100, "misfire_grace_time": 60})
-        self.sched.start()
+        # 여러 노드가 같은 A 를 보더라도 claim_schedules(SKIP LOCKED) 로 job 은 한 노드만 가져간다
         while True:
+            started = time.perf_counter()
             try:
                 now = datetime.now()
-                near_future = now + timedelta(seconds=15)
-                jobs = db.get_schedules_between(
-                    now.strftime("%Y-%m-%d %H:%M:%S"),
-                    near_future.strftime("%Y-%m-%d %H:%M:%S")
+                db.renew_leases(node_id, lease_sec)
+                jobs = db.claim_schedules(
+                    node_id,
+                    now - timedelta(seconds=scan_cfg.get('lookback_sec', 60)),
+                    now + timedelta(seconds=scan_cfg.get('lookahead_sec', 15)),
+                    lease_sec=lease_sec,
+                    limit=scan_cfg.get('claim_limit', 1000)
                 )
-                for i, job in enumerate(jobs):
-                    job_id = str(job["SCHEDULER_ID"])
+                for i, job in enumerate(jobs or []):
+                    job_id = str(job["scheduler_id"])
                     if not self.sched.get_job(job_id):
+                        # exec_time - lead_sec 에 준비를 시작하고 exec_time 에 barrier 로 같이 출발한다
                         self.sched.add_job(
                             self.run_task_wrapper,
-                            trigger="date",
-                            run_date=job["EXEC_TIME"],
+                            run_date=job["exec_time"] - timedelta(seconds=self.lead_sec),
                             id=job_id,
-                            args=[job["SCHEDULER_ID"]]
+                            args=[job["scheduler_id"]],
+                            key=job["scheduler_id"]
                         )
-                        db.update_status(job_id, "RUNNING")
-                        db.insert_log(job_id, "RUNNING", f"RUNNING {job_id}")
-                        log.info(f"{i} - Scheduled job {job_id} at {job['EXEC_TIME']}")
+                        db.insert_log(job_id, "RUNNING", f"RUNNING {job_id} node:{node_id}")
+                        log.info(f"{i} - Scheduled job {job_id} at {job['exec_time']}")
             except Exception as e:
                 log.error(f"schedule_scanner error: {traceback.format_exc()}")
-            time.sleep(10)
+            SCAN.labels("claim").observe(time.perf_counter() - started)
+            time.sleep(scan_cfg.get('interval_sec', 10))
 
     def _process_logger(self):
         for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
@@ -128,7 +335,20 @@ class TaskManager:
                 continue
 
 # 싱글톤 인스턴스 생성
-task_manager = TaskManager()
+task_manager = TaskManager(cfg.get('executor', {}), cfg.get('fair_share', {}), cfg.get('prestage', {}))
+EXECUTOR_WORKERS = REGISTRY.gauge("sched_executor_workers", "job 실행 슬롯 (busy: 실행 중, idle: 빈 슬롯)", ("state",))
+EXECUTOR_WORKERS.labels("busy").set_function(lambda: task_manager.executor.running)
+EXECUTOR_WORKERS.labels("idle").set_function(lambda: task_manager.executor.workers - task_manager.executor.running)
+REGISTRY.gauge("sched_executor_queued", "빈 워커를 기다리는 job 수").set_function(
+    lambda: task_manager.executor.queue.qsize())
+REGISTRY.gauge("sched_dispatcher_jobs", "실행 시각을 기다리는 job 수 (타이밍 휠)").set_function(
+    lambda: len(task_manager.sched))
+
+@app.on_event("shutdown")
+def shutdown():
+    if delivery:
+        delivery.shutdown()
+    db.close()
 
 @app.get("/health")
 def health():
@@ -136,9 +356,55 @@ def health():
 
 @app.post("/schedule")
 def create(s: ScheduleIn):
+    if s.output_format not in SINKS:
+        raise HTTPException(status_code=400, detail=f"output_format must be one of {list(SINKS)}")
+    # 실행 계획 cost 가 guard.max_cost 를 넘으면 거부(reject)하거나 B 에 GUARD 로 표시(flag)해 둔다 (SQLite 는 cost 없음)
+    verdict = None
+    guard = GUARD.for_schedule(s.scheduler_name)
+    if guard.max_cost:
+        verdict = guard.check_cost(db.explain_cost(s.query))
+        if verdict and verdict[0] == 'reject':
+            log.info(f"Rejected schedule {s.scheduler_name}: {verdict[1]}")
+            raise HTTPException(status_code=400, detail=verdict[1])
     sid = db.insert_schedule(s)
     log.info(f"Inserted schedule {sid}")
-    return {"scheduler_id": sid}
+    if verdict and sid:
+        db.insert_log(sid, "GUARD", f"flag {verdict[1]}")
+    return {"scheduler_id": sid, "guard": verdict[1] if verdict else None}
+
+@app.get("/dispatcher/stats")
+def dispatcher_stats():
+    return task_manager.sched.stats()
+
+@app.get("/executor/stats")
+def executor_stats():
+    return task_manager.executor.stats()
+
+@app.get("/prestage/stats")
+def prestage_stats():
+    return task_manager.stage_stats()
+
+@app.get("/retry/stats")
+def retry_stats():
+    with task_manager.retry_lock:
+        return {"waiting": len(task_manager.retry_counts),
+                "by_kind": dict(sum(task_manager.retry_counts.values(), Counter()))}
+
+@app.get("/fair_share/stats")
+def fair_share_stats():
+    return task_manager.executor.queue.stats()
+
+@app.get("/write_behind/stats")
+def write_behind_stats():
+    return db.write_behind_stats()
+
+@app.get("/schedule_cache/stats")
+def schedule_cache_stats():
+    return db.cache_stats()
+
+@app.get("/single_flight/stats")
+def single_flight_stats():
+    return flight.stats() if flight else {}
 
 @app.get("/schedule/{sid}")
 def get_status(sid: int):
@@ -147,15 +413,44 @@ def get_status(sid: int):
         raise HTTPException(status_code=404, detail="Schedule not found")
     return rec
 
+class TimeRange(BaseModel):
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+
+class ScheduleKillRequest(BaseModel):
+    scheduler_ids: List[int] = []  # 수천 개도 한 문장
+    ranges: List[TimeRange] = []  # exec_time 구간 (scheduler_ids 와 AND, 구간끼리는 OR)
+
+def kill_schedules(sids, ranges=()):
+    killed = db.kill_schedules(sids, ranges, message="killed by API")
+    if killed is None:
+        raise HTTPException(status_code=500, detail="kill failed")
+    removed = task_manager.kill(killed)
+    log.info(f"Killed schedules {len(killed)} dispatcher_jobs:{len(removed)}")
+    return killed, removed
+
+@app.post("/schedule/kill")
+def kill_batch(req: ScheduleKillRequest):
+    ranges = [(r.start_time, r.end_time) for r in req.ranges if r.start_time or r.end_time]
+    if not req.scheduler_ids and not ranges:
+        raise HTTPException(status_code=400, detail="scheduler_ids or ranges is required")
+    killed, removed = kill_schedules(req.scheduler_ids, ranges)
+    return {"killed_count": len(killed), "killed_scheduler_ids": killed, "dispatcher_removed": len(removed)}
+
 @app.delete("/schedule/{sid}")
 def delete(sid: int):
-    db.update_status(sid, "KILLED")
-    log.info(f"Killed schedule {sid}")
+    killed, _ = kill_schedules([sid])
+    if not killed:
+        raise HTTPException(status_code=404, detail="Schedule not found or already finished")
     return {"status": "killed"}
 
 @app.get("/schedule", response_model=List[dict])
 def list_schedules():
     return db.list_schedules()
 
+@app.get("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     uvicorn.run("threadapp.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,118 @@
+import time
+import queue
+import threading
+import traceback
+from collections import deque
+from shared.fair_share import FairShareQueue
+
+HANDED_OFF = object()  # fn 이 돌려주면 job 이 끝난 게 아니라 나중에 다시 submit 된다는 뜻 (completed 로 세지 않는다)
+
+
+class BoundedExecutor:
+    """
+    고정 개수(workers) 스레드 + 길이 제한(queue_size) 큐로 job 을 실행하는 executor.
+    workers 는 DB 커넥션 풀 크기 이하로 잡아 스레드가 pool acquire 에서 줄지어 막히지 않게 한다.
+    큐가 가득 차면 policy 에 따라
+      - 'defer': defer(fn, args) 를 호출해 나중에 다시 넣도록 미룬다 (defer 가 없으면 reject 와 같다)
+      - 'reject': on_reject(fn, args) 를 호출하고 버린다
+    큐는 FairShareQueue 라서 owner 별 동시 실행 상한(owner_cap)과 가중치 라운드로빈, priority 가 적용된다.
+    stats() 로 큐 길이, 실행 중 수, 대기 시간, 거절/연기 수를 볼 수 있다.
+    fn 이 HANDED_OFF 를 돌려주면 completed 대신 handed_off 로 센다 (같은 job 이 다시 들어와 두 번 세지 않도록).
+    """
+
+    def __init__(self, workers=100, queue_size=1000, policy='defer', defer=None, on_reject=None, log=None,
+                 name="Executor", owner_cap=0, weights=None, wait_observer=None):
+        if policy not in ('defer', 'reject'):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.workers = workers
+        self.policy = policy
+        self.defer = defer
+        self.on_reject = on_reject
+        self.log = log
+        self.queue = FairShareQueue(owner_cap=owner_cap, weights=weights, maxsize=queue_size,
+                                    wait_observer=wait_observer)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.completed = 0
+        self.handed_off = 0
+        self.failed = 0
+        self.rejected = 0
+        self.deferred = 0
+        self.waits = deque(maxlen=1000)  # 최근 큐 대기 시간(초)
+        self.wait_max = 0.0
+        self._threads = [threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, fn, *args, owner=None, priority=0):
+        """큐에 넣으면 True, 넘쳐서 미루거나 거절했으면 False."""
+        try:
+            self.queue.put((time.monotonic(), fn, args), owner, priority)
+            return True
+        except queue.Full:
+            pass
+        if self.policy == 'defer' and self.defer:
+            with self.lock:
+                self.deferred += 1
+            self.defer(fn, args)
+        else:
+            with self.lock:
+                self.rejected += 1
+            if self.on_reject:
+                self.on_reject(fn, args)
+        return False
+
+    def shutdown(self, wait=True):
+        self.queue.close()
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    def stats(self):
+        with self.lock:
+            waits = sorted(self.waits)
+            return {
+                "workers": self.workers,
+                "queued": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "owner_cap": self.queue.owner_cap,
+                "running": self.running,
+                "completed": self.completed,
+                "handed_off": self.handed_off,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "deferred": self.deferred,
+                "wait_avg_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                "wait_p99_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000, 1) if waits else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 1),
+            }
+
+    def _work(self):
+        while True:
+            item, owner = self.queue.get()
+            if item is None:
+                break
+            queued_at, fn, args = item
+            waited = time.monotonic() - queued_at
+            with self.lock:
+                self.running += 1
+                self.waits.append(waited)
+                self.wait_max = max(self.wait_max, waited)
+            ok = True
+            res = None
+            try:
+                res = fn(*args)
+            except Exception:
+                ok = False
+                if self.log:
+                    self.log.error(f"executor task error:\n{traceback.format_exc()}")
+            finally:
+                self.queue.done(owner)
+                with self.lock:
+                    self.running -= 1
+                    if res is HANDED_OFF:
+                        self.handed_off += 1
+                    else:
+                        self.completed += 1
+                    if not ok:
+                        self.failed += 1
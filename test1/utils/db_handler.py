@@ -0,0 +1,395 @@
+import atexit
+import traceback
+import threading
+from datetime import datetime, timedelta
+from utils.schedule_cache import ScheduleCache
+from utils.retry_policy import RetryPolicy, TRANSIENT
+
+TERMINAL_STATUSES = ("DONE", "ERROR", "KILLED")
+STOPPED_STATUSES = ("KILLED", "CANCELED")  # 사용자가 멈춘 job. 실행 중인 runner 의 상태 변경으로 덮어쓰지 않는다
+SCHEDULE_COLUMNS = "SCHEDULER_ID, SCHEDULER_NAME, CREATED_BY, EXEC_TIME, QUERY, STATUS, OUTPUT_FORMAT, PRIORITY"
+MESSAGE_BYTES = 4000  # B.MESSAGE VARCHAR2(4000 BYTE)
+_classify = RetryPolicy().classify
+
+
+def truncate_bytes(text, limit=MESSAGE_BYTES):
+    """UTF-8 로 인코딩한 길이가 limit 바이트 안에 들도록 자른다 (글자 수로 자르면 한글 메시지는 4000 바이트를 넘는다)."""
+    if text is None:
+        return None
+    text = str(text)
+    if len(text) * 4 <= limit:  # UTF-8 한 글자는 4 바이트 이하
+        return text
+    data = text.encode('utf-8')
+    if len(data) <= limit:
+        return text
+    return data[:limit].decode('utf-8', 'ignore')  # 잘린 마지막 글자는 버린다
+
+
+class DbHandler:
+    """
+    스케줄 저장소(A: 스케줄, B: 실행 로그) 인터페이스. 백엔드는 config 의 storage.backend 로 고른다 (create_db_handler).
+      - oracle: utils.db_handler_pool.DbHandlerPool
+      - sqlite: utils.db_handler_sqlite.SqliteDbHandler (DB 서버 없는 단일 노드용)
+    write-behind 버퍼, ScheduleCache, 연결 예약은 여기서 공통으로 처리하고, 백엔드는 self.pool(acquire/release)과
+    insert_schedule, list_schedules, renew_leases, _select_schedule, _write, _claim, _stream, _kill 을 구현한다.
+
+    update_status / insert_log 는 write-behind 버퍼에 쌓였다가 flush_size 개 또는 flush_interval 초마다
+    한 트랜잭션에 기록된다. 종료 상태(DONE, ERROR, KILLED)는 바로 동기 flush 하고,
+    프로세스 종료(close, atexit) 시에도 남은 버퍼를 모두 기록한다.
+    로그 메시지는 message_bytes 바이트로 자르고, 버퍼의 로그는 max_pending_logs 개까지만 둔다 (넘으면 오래된 것부터 버린다).
+    상태는 sid 당 하나라 실행 중인 job 수 이상으로 늘지 않는다.
+    get_schedule 은 ScheduleCache 를 먼저 보고, 스캐너(claim_schedules)가 가져간 job 은 미리 캐시에 채운다.
+    """
+
+    def __init__(self, flush_size=200, flush_interval=0.5, cache_ttl=300, cache_size=10000, reserve_size=100,
+                 max_pending_logs=50000, row_attempts=3, message_bytes=MESSAGE_BYTES):
+        # self.pool 은 하위 클래스가 먼저 만들어 둔다
+        self.log = None
+        self.local = threading.local()  # 스레드별 데이터 저장소
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pending_status = {}  # sid -> 마지막 status (같은 sid 는 최종 상태만 기록)
+        self.pending_logs = []  # (sid, status, message)
+        self.buf_lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # flush 는 한 번에 하나, 동기 flush 는 진행 중인 flush 를 기다린다
+        self.max_pending_logs = max_pending_logs
+        self.max_row_attempts = row_attempts
+        self.message_bytes = message_bytes
+        self.row_attempts = {}  # 따로 써도 실패한 행 -> 실패 횟수 (flush_lock 아래에서만 쓴다)
+        self.flushes = 0
+        self.flush_errors = 0
+        self.dropped_rows = 0  # row_attempts 번 실패해 버린 행
+        self.dropped_logs = 0  # 버퍼가 넘쳐 버린 로그
+        self.cache = ScheduleCache(cache_ttl, cache_size)
+        self.reserve_slots = threading.BoundedSemaphore(reserve_size) if reserve_size else None
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name=f"{type(self).__name__}-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def setlog(self, log):
+        self.log = log
+
+    # 🔽 스레드별 aaaa 설정/조회 메서드 추가
+    def set_aaaa(self, value):
+        self.local.aaaa = value
+
+    def get_aaaa(self):
+        return getattr(self.local, 'aaaa', None)
+
+    # -- 백엔드가 구현 --
+    def insert_schedule(self, s):
+        """A 에 REGISTERED 로 넣고 scheduler_id 를 돌려준다 (실패 시 None)."""
+        raise NotImplementedError
+
+    def list_schedules(self):
+        raise NotImplementedError
+
+    def renew_leases(self, node_id, lease_sec=60):
+        raise NotImplementedError
+
+    def _select_schedule(self, sid):
+        """SCHEDULE_COLUMNS 한 행을 {소문자 컬럼: 값} 으로 (없으면 None)."""
+        raise NotImplementedError
+
+    def _write(self, statuses, logs):
+        """{sid: status} 와 [(sid, name, status, message)] 를 한 트랜잭션으로 기록한다."""
+        raise NotImplementedError
+
+    def _claim(self, node_id, start, end, now, lease_until, limit):
+        """claim 대상 행을 잠가 RUNNING/NODE_ID/LEASE_EXPIRES 로 바꾸고 commit 한 뒤 행 목록을 돌려준다."""
+        raise NotImplementedError
+
+    def _kill(self, sids, ranges):
+        """sids 중(없으면 전체) exec_time 이 ranges 중 하나에 드는 종료 전 행을 KILLED 로 바꾸고 commit 한 뒤
+        바뀐 scheduler_id 목록을 돌려준다. 한 문장(array DML 또는 id 배열 바인드) + RETURNING 으로 한다."""
+        raise NotImplementedError
+
+    def _stream(self, cur, sql, sink, arraysize, timings=None, budget=None):
+        """cur 로 sql 을 실행해 sink 에 흘려 쓰고 행 수를 돌려준다 (timings, budget: shared.sink.stream_to_sink 참고)."""
+        raise NotImplementedError
+
+    def explain_cost(self, sql):
+        """sql 의 실행 계획 cost (등록 시 guard.max_cost 검사용). 지원하지 않거나 실패하면 None."""
+        return None
+
+    # -- 공통 --
+    def get_schedule(self, sid, use_cache=True):
+        res = self.cache.get(sid) if use_cache else None
+        if res:
+            return res
+        try:
+            res = self._select_schedule(sid)
+            if res:
+                self.cache.put(sid, res)
+        except Exception as e:
+            self.log.error(f"get_schedule error:\n{traceback.format_exc()}")
+        return res
+
+    def update_status(self, sid, status):
+        """상태 변경을 버퍼에 넣는다. 종료 상태면 버퍼 전체를 동기 flush 한다."""
+        with self.buf_lock:
+            self.pending_status[str(sid)] = status
+            full = self._buffered() >= self.flush_size
+        if status in TERMINAL_STATUSES:
+            self.flush()
+            self.cache.invalidate(sid)
+            return
+        self.cache.set_status(sid, status, keep=STOPPED_STATUSES)  # 버퍼에 있는 상태도 캐시 조회에는 바로 보인다
+        if full:
+            self.flush()
+
+    def insert_log(self, sid, status, message):
+        self.insert_logs([(sid, status, message)])
+
+    def insert_logs(self, rows):
+        """(sid, status, message) 목록을 버퍼에 넣는다. 다음 flush 에 한 번에 B 에 기록된다."""
+        rows = [(str(sid), self.cache.name(sid), status, truncate_bytes(message, self.message_bytes))
+                for sid, status, message in rows]
+        with self.buf_lock:
+            self.pending_logs.extend(rows)
+            dropped = self._trim_logs()
+            full = self._buffered() >= self.flush_size
+        if dropped:
+            self._error(f"write-behind buffer full, dropped {dropped} oldest log rows")
+        if full:
+            self.flush()
+
+    def _buffered(self):
+        return len(self.pending_status) + len(self.pending_logs)
+
+    def _trim_logs(self):
+        # buf_lock 안에서 호출. DB 가 오래 안 되어도 버퍼가 끝없이 늘지 않게 오래된 로그부터 버린다
+        over = len(self.pending_logs) - self.max_pending_logs
+        if over <= 0:
+            return 0
+        del self.pending_logs[:over]
+        self.dropped_logs += over
+        return over
+
+    def _error(self, msg):
+        if self.log:
+            self.log.error(msg)
+
+    def flush(self):
+        """
+        버퍼의 상태 변경과 로그를 한 트랜잭션으로 기록한다. 실패하면
+          - 연결 끊김, 잠금 같은 일시 오류: 버퍼에 되돌려 다음 flush 에 다시 한다
+          - 그 밖의 오류(ORA-12899 처럼 어떤 행 하나의 문제): 한 행씩 따로 기록해 나머지 행은 살리고 실패한 행만 되돌린다.
+            같은 행이 row_attempts 번 실패하면 버리고 로그를 남긴다 (나쁜 행 하나가 이후 flush 를 모두 막지 않도록)
+        버퍼가 다 기록되었으면 True.
+        """
+        with self.flush_lock:
+            with self.buf_lock:
+                statuses, self.pending_status = self.pending_status, {}
+                logs, self.pending_logs = self.pending_logs, []
+            if not statuses and not logs:
+                return True
+            try:
+                self._write(statuses, logs)
+                self.flushes += 1
+                if self.row_attempts:
+                    self._forget(statuses, logs)
+                return True
+            except Exception as e:
+                self.flush_errors += 1
+                self._error(f"flush error:\n{traceback.format_exc()}")
+                if _classify(e) == TRANSIENT:
+                    self._requeue(statuses, logs)
+                    return False
+            rows = [(('status', sid, status), {sid: status}, []) for sid, status in statuses.items()]
+            rows += [(('log',) + row, {}, [row]) for row in logs]
+            failed = []
+            for key, st, lg in rows:
+                try:
+                    self._write(st, lg)
+                    self.row_attempts.pop(key, None)
+                except Exception as e:
+                    failed.append((key, st, lg, e))
+            # 여러 행이 하나도 안 들어갔으면 행 문제가 아니라 DB 문제로 보고 횟수를 세지 않는다
+            count = len(failed) < len(rows) or len(rows) == 1
+            keep_status, keep_logs = {}, []
+            for key, st, lg, e in failed:
+                if count and self._give_up(key, e):
+                    continue
+                keep_status.update(st)
+                keep_logs.extend(lg)
+            self._requeue(keep_status, keep_logs)
+            return not keep_status and not keep_logs
+
+    def _give_up(self, key, exc):
+        """따로 써도 실패한 행. row_attempts 번째 실패면 버리고(True), 아니면 횟수를 올린다(False)."""
+        if _classify(exc) == TRANSIENT:
+            return False
+        n = self.row_attempts.get(key, 0) + 1
+        if n < self.max_row_attempts:
+            self.row_attempts[key] = n
+            return False
+        self.row_attempts.pop(key, None)
+        self.dropped_rows += 1
+        self._error(f"write-behind row dropped after {n} attempts {key[:3]}: {exc}")
+        return True
+
+    def _forget(self, statuses, logs):
+        for sid, status in statuses.items():
+            self.row_attempts.pop(('status', sid, status), None)
+        for row in logs:
+            self.row_attempts.pop(('log',) + row, None)
+
+    def _requeue(self, statuses, logs):
+        with self.buf_lock:
+            # 그 사이 들어온 더 새로운 상태는 덮어쓰지 않는다
+            for sid, status in statuses.items():
+                self.pending_status.setdefault(sid, status)
+            self.pending_logs[:0] = logs
+            dropped = self._trim_logs()
+        if dropped:
+            self._error(f"write-behind buffer full, dropped {dropped} oldest log rows")
+
+    def close(self, retry=3):
+        """flush 스레드를 멈추고 남은 버퍼를 기록한다 (실패 시 retry 번 더 시도)."""
+        self._stop.set()
+        for _ in range(retry + 1):
+            if self.flush():
+                break
+
+    def kill_schedules(self, sids=(), ranges=(), message="killed"):
+        """
+        여러 job 을 한 번에 KILLED 로 바꾼다. sids 와 ranges([(start, end)], None 은 열린 끝) 는 AND,
+        ranges 끼리는 OR 이다. 이미 끝난(DONE, ERROR, KILLED) job 은 건드리지 않는다.
+        바뀐 scheduler_id 목록(실패 시 None)을 돌려주고, 캐시를 비우고 B 에 KILLED 로그를 남긴다.
+        """
+        res = None
+        # 버퍼에 남은 상태 변경이 나중에 flush 되며 KILLED 를 덮어쓰지 않도록 먼저 기록한다
+        self.flush()
+        try:
+            res = self._kill(list(dict.fromkeys(int(sid) for sid in sids)), list(ranges))
+            for sid in res:
+                self.cache.invalidate(sid)
+            self.insert_logs([(sid, "KILLED", message) for sid in res])
+        except Exception as e:
+            self.log.error(f"kill_schedules error:\n{traceback.format_exc()}")
+        return res
+
+    def invalidate(self, sid):
+        self.cache.invalidate(sid)
+
+    def cache_stats(self):
+        return self.cache.stats()
+
+    def write_behind_stats(self):
+        with self.buf_lock:
+            return {"pending_status": len(self.pending_status), "pending_logs": len(self.pending_logs),
+                    "flushes": self.flushes, "flush_errors": self.flush_errors,
+                    "dropped_rows": self.dropped_rows, "dropped_logs": self.dropped_logs}
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def fetch_query(self, sql):
+        res = None
+        try:
+            with self.pool.acquire() as conn:
+                if sql:
+                    cur = conn.cursor()
+                    cur.execute(sql)
+                    res = cur.fetchall()
+                    cur.close()
+        except Exception as e:
+            self.log.error(f"fetch_query error:\n{traceback.format_exc()}")
+        return res
+
+    def export_query(self, sql, sink, arraysize=5000, conn=None, timings=None, raise_errors=False, guard=None):
+        """fetchall 없이 결과를 sink 로 흘려 쓴다. 처리한 행 수(실패 시 None)를 돌려준다.
+        conn 을 주면(reserve_connection 으로 미리 잡아 둔 연결) pool acquire 없이 바로 실행한다.
+        timings(dict) 를 주면 'fetch', 'write' 초를 더해 둔다.
+        raise_errors 면 실패를 로그만 남기지 않고 예외로 다시 던진다 (재시도 분류용).
+        guard(shared.guard.QueryGuard) 를 주면 call timeout 과 행/크기/시간 한도를 걸고, 넘으면 GuardTripped 를 던진다."""
+        res = None
+        try:
+            if conn is not None and sql:
+                res = self._guarded_stream(conn, sql, sink, arraysize, timings, guard)
+                return res
+            with self.pool.acquire() as conn:
+                if sql:
+                    res = self._guarded_stream(conn, sql, sink, arraysize, timings, guard)
+        except Exception as e:
+            tripped = guard.tripped(e) if guard else None
+            if tripped:
+                self.log.error(f"export_query guard: {tripped}")
+                raise tripped
+            self.log.error(f"export_query error:\n{traceback.format_exc()}")
+            if raise_errors:
+                raise
+        return res
+
+    def _guarded_stream(self, conn, sql, sink, arraysize, timings, guard):
+        timeout = guard.call_timeout_ms if guard else 0
+        if timeout:
+            conn.call_timeout = timeout
+        try:
+            cur = conn.cursor()
+            res = self._stream(cur, sql, sink, arraysize, timings, guard.budget() if guard else None)
+            cur.close()
+            return res
+        finally:
+            if timeout:
+                try:
+                    conn.call_timeout = 0  # 풀 연결이라 다음 사용자에게 남기지 않는다
+                except Exception:
+                    pass  # call timeout 뒤 끊긴 연결
+
+    def reserve_connection(self):
+        """실행 직전 job 용 연결을 미리 잡아 둔다. 예약 한도(reserve_size)를 넘으면 None (실행 시점에 acquire)."""
+        if self.reserve_slots is None or not self.reserve_slots.acquire(blocking=False):
+            return None
+        try:
+            return self.pool.acquire()
+        except Exception:
+            self.reserve_slots.release()
+            self.log.error(f"reserve_connection error:\n{traceback.format_exc()}")
+            return None
+
+    def release_connection(self, conn):
+        try:
+            self.pool.release(conn)
+        except Exception:
+            self.log.error(f"release_connection error:\n{traceback.format_exc()}")
+        finally:
+            self.reserve_slots.release()
+
+    def claim_schedules(self, node_id, start, end, lease_sec=60, limit=1000):
+        """
+        실행할 job 을 이 노드 것으로 가져온다 (여러 노드가 같은 A 를 나눠 처리).
+          1) start <= EXEC_TIME < end 인 REGISTERED 행
+          2) lease 가 만료된 RUNNING 행 (죽은 노드가 가져갔던 job)
+        를 다른 노드와 겹치지 않게 잠그고, NODE_ID 와 LEASE_EXPIRES 를 기록해 commit 한다.
+        가져온 job 의 메타데이터는 캐시에 채워 실행 시점 조회를 없앤다. 실패하면 None.
+        """
+        reslist = None
+        # 버퍼에 남은 종료 상태가 반영되기 전에 lease 만료로 다시 가져가지 않도록 먼저 flush
+        self.flush()
+        try:
+            now = datetime.now()
+            reslist = self._claim(node_id, start, end, now, now + timedelta(seconds=lease_sec), limit)
+            for rec in reslist:
+                rec['status'] = 'RUNNING'
+                self.cache.put(rec['scheduler_id'], rec)
+        except Exception as e:
+            self.log.error(f"claim_schedules error:\n{traceback.format_exc()}")
+        return reslist
+
+
+def create_db_handler(cfg, **kwargs):
+    """config 의 storage.backend(oracle | sqlite, 기본 oracle) 에 맞는 DbHandler 를 만든다.
+    백엔드 모듈은 여기서 import 하므로 sqlite 만 쓰는 노드에는 oracledb 가 없어도 된다."""
+    storage = cfg.get('storage', {})
+    backend = storage.get('backend', 'oracle')
+    if backend == 'oracle':
+        from utils.db_handler_pool import DbHandlerPool
+        return DbHandlerPool(cfg['oracle'], **kwargs)
+    if backend == 'sqlite':
+        from utils.db_handler_sqlite import SqliteDbHandler
+        return SqliteDbHandler(storage, **kwargs)
+    raise ValueError(f"unknown storage backend: {backend}")
@@ -1,55 +1,74 @@
+import uuid
 import oracledb
 import traceback
-import threading
-
-class DbHandlerPool:
-    def __init__(self, cfg):
+from datetime import datetime, timedelta
+from shared.sink import stream_to_sink
+from utils.db_handler import DbHandler, SCHEDULE_COLUMNS
+
+# 실행 중에 KILLED/CANCELED 된 job 을 뒤늦은 DONE/SUCCESS/ERROR 가 덮어쓰지 않는다 (STOPPED_STATUSES)
+UPDATE_STATUS_SQL = "UPDATE A SET STATUS=:1 WHERE SCHEDULER_ID=:2 AND STATUS NOT IN ('KILLED', 'CANCELED')"
+# 캐시에 이름이 있으면 :2 로 바인드하고, 없을 때만 (COALESCE 단락 평가로) A 를 조회한다
+INSERT_LOG_SQL = """
+    INSERT INTO B(SCHEDULER_ID, SCHEDULER_NAME, STATUS, MESSAGE)
+    VALUES (:1,
+        COALESCE(:2, (SELECT SCHEDULER_NAME FROM A WHERE SCHEDULER_ID = :3)),
+        :4, :5)
+"""
+# (STATUS, EXEC_TIME), (STATUS, LEASE_EXPIRES) 인덱스 범위 스캔
+CLAIM_REGISTERED_SQL = f"""
+    SELECT {SCHEDULE_COLUMNS} FROM A
+    WHERE STATUS = 'REGISTERED' AND EXEC_TIME >= :start_time AND EXEC_TIME < :end_time
+    ORDER BY EXEC_TIME
+    FOR UPDATE SKIP LOCKED
+"""
+CLAIM_EXPIRED_SQL = f"""
+    SELECT {SCHEDULE_COLUMNS} FROM A
+    WHERE STATUS = 'RUNNING' AND LEASE_EXPIRES < :now
+    FOR UPDATE SKIP LOCKED
+"""
+# 일괄 kill. id 목록은 행마다 바인드하는 array DML(executemany) 로 PK 를 찾고, RETURNING 으로 바뀐 id 를 받는다
+KILL_BY_ID_SQL = """
+    UPDATE A SET STATUS = 'KILLED'
+    WHERE SCHEDULER_ID = :1 AND STATUS NOT IN ('DONE', 'ERROR', 'KILLED')
+      AND EXEC_TIME >= NVL(:2, EXEC_TIME) AND EXEC_TIME <= NVL(:3, EXEC_TIME)
+    RETURNING SCHEDULER_ID INTO :4
+"""
+KILL_BY_RANGE_SQL = """
+    UPDATE A SET STATUS = 'KILLED'
+    WHERE STATUS NOT IN ('DONE', 'ERROR', 'KILLED')
+      AND EXEC_TIME >= NVL(:1, EXEC_TIME) AND EXEC_TIME <= NVL(:2, EXEC_TIME)
+    RETURNING SCHEDULER_ID INTO :3
+"""
+
+
+class DbHandlerPool(DbHandler):
+    """
+    Oracle 백엔드 (oracledb 커넥션 풀). write-behind 버퍼는 executemany 로 한 트랜잭션에 기록하고,
+    claim 은 FOR UPDATE SKIP LOCKED 로 여러 노드가 같은 A 를 겹치지 않게 나눠 가져간다.
+    """
+
+    def __init__(self, cfg, **kwargs):
         self.pool = oracledb.create_pool(min=1, max=200, **cfg)
-        self.log = None
-        self.local = threading.local()  # 스레드별 데이터 저장소
-
-    def setlog(self, log):
-        self.log = log
-
-    # 🔽 스레드별 aaaa 설정/조회 메서드 추가
-    def set_aaaa(self, value):
-        self.local.aaaa = value
-
-    def get_aaaa(self):
-        return getattr(self.local, 'aaaa', None)
+        super().__init__(**kwargs)
 
     def insert_schedule(self, s):
         res = None
         try:
             with self.pool.acquire() as conn:
                 cur = conn.cursor()
+                id_var = cur.var(int)
                 cur.execute("""
-                    INSERT INTO A(SCHEDULER_NAME, CREATED_BY, EXEC_TIME, QUERY, STATUS)
-                    VALUES (:1, :2, :3, :4, 'REGISTERED')
-                    RETURNING scheduler_id INTO :id
-                """, [s.scheduler_name, s.created_by, s.exec_time, s.query], id=cur.var(int))
+                    INSERT INTO A(SCHEDULER_NAME, CREATED_BY, EXEC_TIME, QUERY, STATUS, OUTPUT_FORMAT, PRIORITY)
+                    VALUES (:1, :2, :3, :4, 'REGISTERED', :5, :6)
+                    RETURNING scheduler_id INTO :7
+                """, [s.scheduler_name, s.created_by, s.exec_time, s.query, s.output_format, s.priority, id_var])
                 conn.commit()
-                res = cur.getimplicitresults()[0] if hasattr(cur, 'getimplicitresults') else cur.fetchone()[0]
+                res = id_var.getvalue()[0]
                 cur.close()
         except Exception as e:
             self.log.error(f"insert_schedule error:\n{traceback.format_exc()}")
         return res
 
-    def get_schedule(self, sid):
-        res = None
-        try:
-            with self.pool.acquire() as conn:
-                cur = conn.cursor()
-                cur.execute(
-                    "SELECT SCHEDULER_ID, SCHEDULER_NAME, EXEC_TIME, QUERY, STATUS FROM A WHERE SCHEDULER_ID=:1", [sid])
-                row = cur.fetchone()
-                if row:
-                    res = dict(zip([d[0].lower() for d in cur.description], row))
-                cur.close()
-        except Exception as e:
-            self.log.error(f"get_schedule error:\n{traceback.format_exc()}")
-        return res
-
     def list_schedules(self):
         res = None
         try:
@@ -63,182 +82,99 @@ class DbHandlerPool:
             self.log.error(f"list_schedules error:\n{traceback.format_exc()}")
         return res
 
-    def update_status(self, sid, status):
-        try:
-            with self.pool.acquire() as conn:
-                cur = conn.cursor()
-                cur.execute("UPDATE A SET STATUS=:1 WHERE SCHEDULER_ID=:2", [status, sid])
-                conn.commit()
-                cur.close()
-        except Exception as e:
-            self.log.error(f"update_status error:\n{traceback.format_exc()}")
-
-    def insert_log(self, sid, status, message):
-        try:
-            with self.pool.acquire() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    INSERT INTO B(SCHEDULER_ID, SCHEDULER_NAME, STATUS, MESSAGE) 
-                    VALUES (:1,
-                        (SELECT SCHEDULER_NAME FROM A WHERE SCHEDULER_ID = :2),
-                        :3, :4)
-                """, [sid, sid, status, message])
-                conn.commit()
-                cur.close()
-        except Exception as e:
-            self.log.error(f"insert_log error:\n{traceback.format_exc()}")
-
-    def fetch_query(self, sql):
+    def _select_schedule(self, sid):
         res = None
-        try:
-            with self.pool.acquire() as conn:
-                if sql:
-                    cur = conn.cursor()
-                    cur.execute(sql)
-                    res = cur.fetchall()
-                    cur.close()
-        except Exception as e:
-            self.log.error(f"fetch_query error:\n{traceback.format_exc()}")
+        with self.pool.acquire() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT {SCHEDULE_COLUMNS} FROM A WHERE SCHEDULER_ID=:1", [sid], fetch_lobs=False)
+            row = cur.fetchone()
+            if row:
+                res = dict(zip([d[0].lower() for d in cur.description], row))
+            cur.close()
         return res
 
-    def get_schedules_between(self, start, end):
-        reslist = None
-        try:
-            sql = f"""
-                SELECT SCHEDULER_ID, EXEC_TIME FROM A
-                WHERE EXEC_TIME BETWEEN TO_TIMESTAMP('{start}', 'YYYY-MM-DD HH24:MI:SS.FF6')
-                                   AND TO_TIMESTAMP('{end}', 'YYYY-MM-DD HH24:MI:SS.FF6')
-                  AND status = 'REGISTERED'
-            """
-            with self.pool.acquire() as conn:
-                cur = conn.cursor()
-                cur.execute(sql)
-                rows = cur.fetchall()
-                columns = [col[0].lower() for col in cur.description]
-                reslist = [dict(zip(columns, row)) for row in rows]
-                cur.close()
-        except Exception as e:
-            self.log.error(f"get_schedules_between error:\n{traceback.format_exc()}")
-        return reslist
-import oracledb
-import traceback
-import threading
-
-class DbHandlerPool:
-    def __init__(self, cfg):
-        self.pool = oracledb.create_pool(min=1, max=200, **cfg)
-        self.log = None
-        self.local = threading.local()  # 스레드별 데이터 저장소
-
-    def setlog(self, log):
-        self.log = log
-
-    # 🔽 스레드별 aaaa 설정/조회 메서드 추가
-    def set_aaaa(self, value):
-        self.local.aaaa = value
-
-    def get_aaaa(self):
-        return getattr(self.local, 'aaaa', None)
-
-    def insert_schedule(self, s):
-        res = None
-        try:
-            with self.pool.acquire() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    INSERT INTO A(SCHEDULER_NAME, CREATED_BY, EXEC_TIME, QUERY, STATUS)
-                    VALUES (:1, :2, :3, :4, 'REGISTERED')
-                    RETURNING scheduler_id INTO :id
-                """, [s.scheduler_name, s.created_by, s.exec_time, s.query], id=cur.var(int))
-                conn.commit()
-                res = cur.getimplicitresults()[0] if hasattr(cur, 'getimplicitresults') else cur.fetchone()[0]
-                cur.close()
-        except Exception as e:
-            self.log.error(f"insert_schedule error:\n{traceback.format_exc()}")
+    def _write(self, statuses, logs):
+        with self.pool.acquire() as conn:
+            cur = conn.cursor()
+            if statuses:
+                cur.executemany(UPDATE_STATUS_SQL, [(status, sid) for sid, status in statuses.items()])
+            if logs:
+                cur.executemany(INSERT_LOG_SQL, [(sid, name, sid, status, message)
+                                                 for sid, name, status, message in logs])
+            conn.commit()
+            cur.close()
+
+    def _stream(self, cur, sql, sink, arraysize, timings=None, budget=None):
+        return stream_to_sink(cur, sql, sink, arraysize, timings, budget)
+
+    def _kill(self, sids, ranges):
+        with self.pool.acquire() as conn:
+            cur = conn.cursor()
+            if sids:
+                sql = KILL_BY_ID_SQL
+                rows = [[sid, start, end] for sid in sids for start, end in (ranges or [(None, None)])]
+                sizes = (int, datetime, datetime)
+            else:
+                sql = KILL_BY_RANGE_SQL
+                rows = [[start, end] for start, end in ranges]
+                sizes = (datetime, datetime)
+            id_var = cur.var(int, arraysize=len(rows))
+            cur.setinputsizes(*sizes, id_var)
+            cur.executemany(sql, rows)
+            # executemany + RETURNING 은 행마다 리스트로 돌려준다 (id 는 0~1 개, 구간은 여러 개)
+            res = list(dict.fromkeys(sid for i in range(len(rows)) for sid in id_var.getvalue(i)))
+            conn.commit()
+            cur.close()
         return res
 
-    def get_schedule(self, sid):
+    def explain_cost(self, sql):
+        stmt_id = uuid.uuid4().hex[:30]  # STATEMENT_ID 는 bind 가 안 되고 30자까지
         res = None
         try:
             with self.pool.acquire() as conn:
                 cur = conn.cursor()
-                cur.execute(
-                    "SELECT SCHEDULER_ID, SCHEDULER_NAME, EXEC_TIME, QUERY, STATUS FROM A WHERE SCHEDULER_ID=:1", [sid])
+                cur.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{stmt_id}' FOR {sql.strip().rstrip(';')}")
+                cur.execute("SELECT cost FROM PLAN_TABLE WHERE statement_id = :1 AND id = 0", [stmt_id])
                 row = cur.fetchone()
-                if row:
-                    res = dict(zip([d[0].lower() for d in cur.description], row))
+                res = row[0] if row else None
+                conn.rollback()  # PLAN_TABLE 에 행을 남기지 않는다
                 cur.close()
         except Exception as e:
-            self.log.error(f"get_schedule error:\n{traceback.format_exc()}")
-        return res
-
-    def list_schedules(self):
-        res = None
-        try:
-            with self.pool.acquire() as conn:
-                cur = conn.cursor()
-                cur.execute("SELECT SCHEDULER_ID, SCHEDULER_NAME, EXEC_TIME, STATUS FROM A")
-                cols = [d[0].lower() for d in cur.description]
-                res = [dict(zip(cols, row)) for row in cur]
-                cur.close()
-        except Exception as e:
-            self.log.error(f"list_schedules error:\n{traceback.format_exc()}")
+            self.log.error(f"explain_cost error:\n{traceback.format_exc()}")
         return res
 
-    def update_status(self, sid, status):
-        try:
-            with self.pool.acquire() as conn:
-                cur = conn.cursor()
-                cur.execute("UPDATE A SET STATUS=:1 WHERE SCHEDULER_ID=:2", [status, sid])
-                conn.commit()
-                cur.close()
-        except Exception as e:
-            self.log.error(f"update_status error:\n{traceback.format_exc()}")
+    def _claim(self, node_id, start, end, now, lease_until, limit):
+        reslist = []
+        with self.pool.acquire() as conn:
+            cur = conn.cursor()
+            cur.arraysize = min(limit, 1000)
+            for sql, params in (
+                    (CLAIM_REGISTERED_SQL, {"start_time": start, "end_time": end}),
+                    (CLAIM_EXPIRED_SQL, {"now": now})):
+                if len(reslist) >= limit:
+                    break
+                cur.execute(sql, params, fetch_lobs=False)
+                columns = [col[0].lower() for col in cur.description]
+                # FOR UPDATE 와 FETCH FIRST 는 같이 쓸 수 없으므로 fetchmany 로 자른다 (가져온 행만 잠긴다)
+                reslist.extend(dict(zip(columns, row)) for row in cur.fetchmany(limit - len(reslist)))
+            if reslist:
+                cur.executemany(
+                    "UPDATE A SET STATUS='RUNNING', NODE_ID=:1, LEASE_EXPIRES=:2 WHERE SCHEDULER_ID=:3",
+                    [(node_id, lease_until, rec['scheduler_id']) for rec in reslist])
+            conn.commit()
+            cur.close()
+        return reslist
 
-    def insert_log(self, sid, status, message):
+    def renew_leases(self, node_id, lease_sec=60):
+        """이 노드가 가져간 실행 중 job 의 lease 를 연장한다. 스캔 주기마다 호출."""
         try:
             with self.pool.acquire() as conn:
                 cur = conn.cursor()
                 cur.execute("""
-                    INSERT INTO B(SCHEDULER_ID, SCHEDULER_NAME, STATUS, MESSAGE) 
-                    VALUES (:1,
-                        (SELECT SCHEDULER_NAME FROM A WHERE SCHEDULER_ID = :2),
-                        :3, :4)
-                """, [sid, sid, status, message])
+                    UPDATE A SET LEASE_EXPIRES = :lease_until
+                    WHERE NODE_ID = :node_id AND STATUS IN ('RUNNING', 'SUCCESS')
+                """, {"lease_until": datetime.now() + timedelta(seconds=lease_sec), "node_id": node_id})
                 conn.commit()
                 cur.close()
         except Exception as e:
-            self.log.error(f"insert_log error:\n{traceback.format_exc()}")
-
-    def fetch_query(self, sql):
-        res = None
-        try:
-            with self.pool.acquire() as conn:
-                if sql:
-                    cur = conn.cursor()
-                    cur.execute(sql)
-                    res = cur.fetchall()
-                    cur.close()
-        except Exception as e:
-            self.log.error(f"fetch_query error:\n{traceback.format_exc()}")
-        return res
-
-    def get_schedules_between(self, start, end):
-        reslist = None
-        try:
-            sql = f"""
-                SELECT SCHEDULER_ID, EXEC_TIME FROM A
-                WHERE EXEC_TIME BETWEEN TO_TIMESTAMP('{start}', 'YYYY-MM-DD HH24:MI:SS.FF6')
-                                   AND TO_TIMESTAMP('{end}', 'YYYY-MM-DD HH24:MI:SS.FF6')
-                  AND status = 'REGISTERED'
-            """
-            with self.pool.acquire() as conn:
-                cur = conn.cursor()
-                cur.execute(sql)
-                rows = cur.fetchall()
-                columns = [col[0].lower() for col in cur.description]
-                reslist = [dict(zip(columns, row)) for row in rows]
-                cur.close()
-        except Exception as e:
-            self.log.error(f"get_schedules_between error:\n{traceback.format_exc()}")
-        return reslist
+            self.log.error(f"renew_leases error:\n{traceback.format_exc()}")
@@ -0,0 +1,317 @@
+import os
+import json
+import queue
+import sqlite3
+import time
+import traceback
+import threading
+from datetime import datetime, timedelta
+from shared.sink import drain_to_sink
+from utils.db_handler import DbHandler, SCHEDULE_COLUMNS
+
+# Oracle DDL(README) 과 같은 컬럼. 시각은 로컬 시각 'YYYY-MM-DD HH:MM:SS[.ffffff]' 문자열이라 문자열 비교가 곧 시각 비교다
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS A (
+    SCHEDULER_ID    INTEGER PRIMARY KEY AUTOINCREMENT,
+    SCHEDULER_NAME  TEXT NOT NULL,
+    CREATED_BY      TEXT NOT NULL,
+    EXEC_TIME       TIMESTAMP NOT NULL,
+    QUERY           TEXT NOT NULL,
+    STATUS          TEXT NOT NULL,
+    CREATED_AT      TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    RULE_ID         INTEGER,
+    OUTPUT_FORMAT   TEXT DEFAULT 'xlsx',
+    PRIORITY        INTEGER DEFAULT 0,
+    NODE_ID         TEXT,
+    LEASE_EXPIRES   TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS a_status_time_idx ON A (STATUS, EXEC_TIME);
+CREATE INDEX IF NOT EXISTS a_status_lease_idx ON A (STATUS, LEASE_EXPIRES);
+CREATE TABLE IF NOT EXISTS B (
+    LOG_TIME        TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    SCHEDULER_ID    INTEGER NOT NULL,
+    SCHEDULER_NAME  TEXT,
+    STATUS          TEXT,
+    MESSAGE         TEXT
+);
+CREATE INDEX IF NOT EXISTS b_sid_idx ON B (SCHEDULER_ID);
+CREATE VIEW IF NOT EXISTS DUAL AS SELECT 'X' AS DUMMY;
+"""
+
+INSERT_SCHEDULE_SQL = """
+    INSERT INTO A(SCHEDULER_NAME, CREATED_BY, EXEC_TIME, QUERY, STATUS, OUTPUT_FORMAT, PRIORITY)
+    VALUES (?, ?, ?, ?, 'REGISTERED', ?, ?)
+"""
+UPDATE_STATUS_SQL = "UPDATE A SET STATUS=? WHERE SCHEDULER_ID=? AND STATUS NOT IN ('KILLED', 'CANCELED')"
+INSERT_LOG_SQL = """
+    INSERT INTO B(SCHEDULER_ID, SCHEDULER_NAME, STATUS, MESSAGE)
+    VALUES (?, COALESCE(?, (SELECT SCHEDULER_NAME FROM A WHERE SCHEDULER_ID = ?)), ?, ?)
+"""
+# SQLite 는 FOR UPDATE 가 없다. BEGIN IMMEDIATE 로 쓰기 잠금을 먼저 잡고 읽으므로 다른 프로세스와 겹치지 않는다
+CLAIM_REGISTERED_SQL = f"""
+    SELECT {SCHEDULE_COLUMNS} FROM A
+    WHERE STATUS = 'REGISTERED' AND EXEC_TIME >= ? AND EXEC_TIME < ?
+    ORDER BY EXEC_TIME
+    LIMIT ?
+"""
+CLAIM_EXPIRED_SQL = f"""
+    SELECT {SCHEDULE_COLUMNS} FROM A
+    WHERE STATUS = 'RUNNING' AND LEASE_EXPIRES < ?
+    LIMIT ?
+"""
+CLAIM_UPDATE_SQL = "UPDATE A SET STATUS='RUNNING', NODE_ID=?, LEASE_EXPIRES=? WHERE SCHEDULER_ID=?"
+# 일괄 kill. id 목록은 JSON 배열 하나로 바인드해 json_each 와 조인한다 (문장 하나, id 수와 무관한 SQL)
+KILL_SQL = """
+    UPDATE A SET STATUS = 'KILLED'
+    WHERE STATUS NOT IN ('DONE', 'ERROR', 'KILLED') AND {where}
+    RETURNING SCHEDULER_ID
+"""
+KILL_RANGE = "(EXEC_TIME >= COALESCE(?, EXEC_TIME) AND EXEC_TIME <= COALESCE(?, EXEC_TIME))"
+
+
+def _adapt_datetime(d):
+    if d.tzinfo is not None:
+        d = d.astimezone().replace(tzinfo=None)  # 저장은 로컬 시각 (Oracle SYSDATE 와 같은 기준)
+    return d.isoformat(" ")
+
+
+def _convert_timestamp(b):
+    return datetime.fromisoformat(b.decode())
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter("TIMESTAMP", _convert_timestamp)
+
+
+class SqliteConnection:
+    """SqlitePool 이 빌려 주는 연결. with 블록을 나가거나 pool.release 하면 풀로 돌아간다."""
+
+    def __init__(self, pool, raw):
+        self.pool = pool
+        self.raw = raw
+        self._call_timeout = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.pool.release(self)
+
+    def cursor(self):
+        return self.raw.cursor()
+
+    def execute(self, sql, params=()):
+        return self.raw.execute(sql, params)
+
+    def commit(self):
+        self.raw.commit()
+
+    @property
+    def call_timeout(self):
+        return self._call_timeout
+
+    @call_timeout.setter
+    def call_timeout(self, ms):
+        """oracledb 의 connection.call_timeout 대신. 설정한 시점부터 ms 가 지나면 실행 중인 SQL 을 중단한다
+        (sqlite3.OperationalError: interrupted). 0 이면 끈다."""
+        self._call_timeout = ms
+        if not ms:
+            self.raw.set_progress_handler(None, 0)
+            return
+        deadline = time.monotonic() + ms / 1000
+        self.raw.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+
+    def rollback(self):
+        self.raw.rollback()
+
+
+class SqlitePool:
+    """
+    oracledb 풀과 같은 acquire()/release() 를 주는 sqlite3 연결 풀. max 개까지 만들어 두고 재사용한다.
+    WAL 모드라 읽기는 서로, 그리고 쓰기와도 막지 않는다. 쓰기는 파일 잠금 하나를 두고 차례로 한다.
+    연결마다 sqlite3 문장 캐시(statement_cache 개)가 있어 같은 SQL 은 다시 prepare 하지 않는다.
+    """
+
+    def __init__(self, path, max=32, busy_timeout=5.0, synchronous="NORMAL", statement_cache=256):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.synchronous = synchronous
+        self.statement_cache = statement_cache
+        self.slots = threading.BoundedSemaphore(max)
+        self.idle = queue.LifoQueue()
+        self.busy = 0  # 빌려 준 연결 수 (/metrics)
+        self.opened = 0  # 열려 있는 연결 수
+        self.count_lock = threading.Lock()
+        self.write_lock = threading.Lock()  # 프로세스 안의 쓰기는 여기서 줄 세운다 (SQLITE_BUSY 재시도 없이)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")  # DB 파일에 남으므로 한 번만
+        conn.executescript(SCHEMA)
+        self.idle.put(conn)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, detect_types=sqlite3.PARSE_DECLTYPES,
+                               isolation_level=None, check_same_thread=False,
+                               cached_statements=self.statement_cache)
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        with self.count_lock:
+            self.opened += 1
+        return conn
+
+    def acquire(self):
+        self.slots.acquire()
+        try:
+            try:
+                raw = self.idle.get_nowait()
+            except queue.Empty:
+                raw = self._connect()
+        except Exception:
+            self.slots.release()
+            raise
+        with self.count_lock:
+            self.busy += 1
+        return SqliteConnection(self, raw)
+
+    def release(self, conn):
+        raw, conn.raw = conn.raw, None
+        if raw is None:
+            return
+        if raw.in_transaction:
+            raw.rollback()
+        raw.set_progress_handler(None, 0)
+        with self.count_lock:
+            self.busy -= 1
+        self.idle.put(raw)
+        self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+                with self.count_lock:
+                    self.opened -= 1
+            except queue.Empty:
+                break
+
+
+class SqliteDbHandler(DbHandler):
+    """
+    내장 SQLite 백엔드. DB 서버 없이 한 노드에서 돌릴 때 쓴다 (config: storage.backend: sqlite).
+    A, B 스키마는 처음 열 때 만든다. 쓰기(write-behind flush, claim, lease 연장)는 write_lock 아래
+    BEGIN IMMEDIATE 트랜잭션 하나로 하고, 여러 행은 executemany 로 묶는다.
+    job 쿼리(export_query)도 이 DB 에서 실행한다 (Oracle 호환용 DUAL 뷰가 있다).
+    """
+
+    def __init__(self, storage, **kwargs):
+        self.pool = SqlitePool(storage.get('path', 'data/scheduler.db'),
+                               max=storage.get('pool_max', 32),
+                               busy_timeout=storage.get('busy_timeout_sec', 5.0),
+                               synchronous=storage.get('synchronous', 'NORMAL'),
+                               statement_cache=storage.get('statement_cache', 256))
+        # 예약 연결이 풀을 다 잡으면 flush/claim 이 막히므로 풀의 절반까지만 예약한다
+        kwargs['reserve_size'] = min(kwargs.get('reserve_size', 100), storage.get('pool_max', 32) // 2)
+        super().__init__(**kwargs)
+
+    def insert_schedule(self, s):
+        res = None
+        try:
+            with self.pool.write_lock, self.pool.acquire() as conn:
+                cur = conn.cursor()
+                cur.execute(INSERT_SCHEDULE_SQL, (s.scheduler_name, s.created_by, s.exec_time, s.query,
+                                                  s.output_format, s.priority))
+                res = cur.lastrowid
+                cur.close()
+        except Exception as e:
+            self.log.error(f"insert_schedule error:\n{traceback.format_exc()}")
+        return res
+
+    def list_schedules(self):
+        res = None
+        try:
+            with self.pool.acquire() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT SCHEDULER_ID, SCHEDULER_NAME, EXEC_TIME, STATUS FROM A")
+                cols = [d[0].lower() for d in cur.description]
+                res = [dict(zip(cols, row)) for row in cur]
+                cur.close()
+        except Exception as e:
+            self.log.error(f"list_schedules error:\n{traceback.format_exc()}")
+        return res
+
+    def _select_schedule(self, sid):
+        res = None
+        with self.pool.acquire() as conn:
+            cur = conn.cursor()
+            cur.execute(f"SELECT {SCHEDULE_COLUMNS} FROM A WHERE SCHEDULER_ID=?", (int(sid),))
+            row = cur.fetchone()
+            if row:
+                res = dict(zip([d[0].lower() for d in cur.description], row))
+            cur.close()
+        return res
+
+    def _write(self, statuses, logs):
+        with self.pool.write_lock, self.pool.acquire() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.cursor()
+            if statuses:
+                cur.executemany(UPDATE_STATUS_SQL, [(status, int(sid)) for sid, status in statuses.items()])
+            if logs:
+                cur.executemany(INSERT_LOG_SQL, [(int(sid), name, int(sid), status, message)
+                                                 for sid, name, status, message in logs])
+            conn.commit()
+            cur.close()
+
+    def _stream(self, cur, sql, sink, arraysize, timings=None, budget=None):
+        cur.arraysize = arraysize
+        started = time.perf_counter()
+        cur.execute(sql)
+        if timings is not None:
+            timings['fetch'] = timings.get('fetch', 0.0) + time.perf_counter() - started
+        return drain_to_sink(cur, sink, arraysize, timings, budget)
+
+    def _claim(self, node_id, start, end, now, lease_until, limit):
+        reslist = []
+        with self.pool.write_lock, self.pool.acquire() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.cursor()
+            for sql, params in (
+                    (CLAIM_REGISTERED_SQL, (start, end)),
+                    (CLAIM_EXPIRED_SQL, (now,))):
+                if len(reslist) >= limit:
+                    break
+                cur.execute(sql, params + (limit - len(reslist),))
+                columns = [col[0].lower() for col in cur.description]
+                reslist.extend(dict(zip(columns, row)) for row in cur.fetchall())
+            if reslist:
+                cur.executemany(CLAIM_UPDATE_SQL, [(node_id, lease_until, rec['scheduler_id']) for rec in reslist])
+            conn.commit()
+            cur.close()
+        return reslist
+
+    def _kill(self, sids, ranges):
+        where, params = [], []
+        if sids:
+            where.append("SCHEDULER_ID IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(sids))
+        if ranges:
+            where.append("(" + " OR ".join([KILL_RANGE] * len(ranges)) + ")")
+            params.extend(t for r in ranges for t in r)
+        with self.pool.write_lock, self.pool.acquire() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            res = [row[0] for row in conn.execute(KILL_SQL.format(where=" AND ".join(where)), params).fetchall()]
+            conn.commit()
+        return res
+
+    def renew_leases(self, node_id, lease_sec=60):
+        """이 노드가 가져간 실행 중 job 의 lease 를 연장한다. 스캔 주기마다 호출."""
+        try:
+            with self.pool.write_lock, self.pool.acquire() as conn:
+                conn.execute("UPDATE A SET LEASE_EXPIRES = ? WHERE NODE_ID = ? AND STATUS IN ('RUNNING', 'SUCCESS')",
+                             (datetime.now() + timedelta(seconds=lease_sec), node_id))
+        except Exception as e:
+            self.log.error(f"renew_leases error:\n{traceback.format_exc()}")
+
+    def close(self, retry=3):
+        super().close(retry)
+        self.pool.close()
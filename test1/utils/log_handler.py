@@ -1,44 +1,49 @@
-from datetime import datetime
-import logging
-from logging.handlers import TimedRotatingFileHandler
 import os
+import logging
+import threading
+from shared.async_log import AsyncLogPipeline, DailyFileHandler, with_sid
+from shared.metrics import REGISTRY
+
+LOG_DROPPED = REGISTRY.counter("sched_log_dropped_total", "로그 큐가 넘쳐 버린 로그 수")
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline(cfg):
+    """프로세스에 하나인 비동기 로그 파이프라인. sink 는 log_dir/app_YYYYMMDD.log 하나를 모든 job 이 같이 쓴다."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            fh = DailyFileHandler(os.path.join(cfg['log_dir'], 'app_'))
+            fh.setFormatter(logging.Formatter(with_sid(cfg['log_format'])))
+            _pipeline = AsyncLogPipeline([fh],
+                                         queue_size=cfg.get('queue_size', 10000),
+                                         max_chars=cfg.get('max_message_chars', 4000),
+                                         on_drop=LOG_DROPPED.inc)
+            _pipeline.attach(logging.getLogger('test1'), cfg.get('level', 'INFO'))
+        return _pipeline
+
 
 class LogHandler:
+    """
+    main / job(sid) 로그. 예전에는 sid 마다 logger 와 파일 handler 를 새로 만들었는데,
+    지금은 공유 logger 하나에 sid 를 레코드 필드로 붙이고 파일 쓰기는 listener 스레드가 한다 (shared.async_log).
+    """
+
     def __init__(self, cfg, sid=None):
-        self.log_dir = cfg['log_dir']
-        self.log_formatter = cfg['log_format']
-        os.makedirs(self.log_dir, exist_ok=True)
-        self.logger = logging.getLogger('TaskLogger')  if sid is None else \
-            logging.getLogger(f'AppLogger-{sid}')
-        self.logger.setLevel(logging.INFO)
-        self.log_file_name = f'main_{datetime.now().strftime("%Y%m%d")}.log' if sid is None else \
-            f'app_{sid}_{datetime.now().strftime("%Y%m%d")}.log'
-
-        fmt = logging.Formatter(self.log_formatter)
-
-        self.fh = TimedRotatingFileHandler(
-            os.path.join(self.log_dir, self.log_file_name),
-            when='midnight',
-            backupCount=7,
-            encoding='utf-8'
-        )
-        self.fh.setFormatter(fmt)
-        self.logger.addHandler(self.fh)
-        '''
-        ch = logging.StreamHandler()
-        ch.setFormatter(fmt)
-        self.logger.addHandler(ch)
-        '''
+        self.pipeline = get_pipeline(cfg)
+        self.logger = logging.getLogger('test1')
+        self.extra = {'sid': '-' if sid is None else sid}
+
+    def debug(self, msg):
+        self.logger.debug(msg, extra=self.extra, stacklevel=2)
 
     def info(self, msg):
-        self.logger.info(msg)
+        self.logger.info(msg, extra=self.extra, stacklevel=2)
 
     def error(self, msg):
-        self.logger.error(msg)
+        self.logger.error(msg, extra=self.extra, stacklevel=2)
 
     def close(self):
-        self.fh.close()
-        self.logger.removeHandler(self.fh)
-        del self.fh
-
-
+        pass  # 공유 sink 라 job 마다 닫을 handler 가 없다 (프로세스 종료 시 파이프라인이 남은 로그를 쓴다)
@@ -0,0 +1,88 @@
+import re
+import random
+import sqlite3
+from shared.guard import GuardTripped
+
+# 오류 종류
+TRANSIENT = "transient"  # 연결 끊김, 리스너/인스턴스 일시 불가, 잠금 대기 → 잠시 뒤 다시 하면 된다
+SQL = "sql"  # SQL 자체의 오류 (테이블 없음, 문법, 권한 ...) → 다시 해도 같다
+MISSING = "missing"  # 스케줄 레코드가 아직 안 보임 (캐시/복제 지연)
+EMPTY = "empty"  # 결과가 0 행 (empty_result: retry 일 때만 오류로 본다)
+ERROR = "error"  # 그 밖의 오류
+GUARD = "guard"  # 가드 한도(call timeout, 행/크기/시간)에 걸림 → 다시 해도 같다
+
+# 재시도할 ORA / DPY(python-oracledb) 오류 코드
+TRANSIENT_CODES = {
+    "ORA-00054", "ORA-00060", "ORA-01012", "ORA-01033", "ORA-01034", "ORA-01089", "ORA-02396",
+    "ORA-03113", "ORA-03114", "ORA-03135", "ORA-12170", "ORA-12514", "ORA-12516", "ORA-12519",
+    "ORA-12520", "ORA-12528", "ORA-12537", "ORA-12541", "ORA-12571", "ORA-25408", "ORA-30006",
+    "DPY-1001", "DPY-4011", "DPY-6005",
+}
+_CODE = re.compile(r"\b(ORA-\d{5}|DPY-\d{4})\b")
+
+DEFAULT_CLASSES = {
+    TRANSIENT: {"max_attempts": 5},
+    MISSING: {"max_attempts": 3},
+    EMPTY: {"max_attempts": 3},
+    SQL: {"max_attempts": 0},
+    GUARD: {"max_attempts": 0},
+    ERROR: {"max_attempts": 1},
+}
+
+
+class RetryableError(Exception):
+    """TaskRunner 가 직접 분류해서 던지는 오류 (MISSING, EMPTY)."""
+
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+
+class RetryPolicy:
+    """
+    config 의 retry 섹션. 실패한 job 을 몇 초 뒤에 다시 넣을지 정한다 (None 이면 재시도하지 않는다).
+      - classes: 오류 종류별 max_attempts, backoff_sec (없으면 전체 backoff_sec)
+      - budget: 스케줄 하나가 종류와 상관없이 쓸 수 있는 재시도 총 횟수
+      - backoff_sec, max_backoff_sec: 지수 backoff, 0.5 ~ 1.5 배 jitter
+      - empty_result: success(0 행도 정상, 빈 파일) | retry(0 행이면 EMPTY 로 재시도)
+    대기는 워커에서 sleep 하지 않고 TaskManager 가 타이밍 휠에 다시 넣는다.
+    """
+
+    def __init__(self, conf=None):
+        conf = conf or {}
+        self.budget = conf.get('budget', 5)
+        self.backoff = conf.get('backoff_sec', 1.0)
+        self.max_backoff = conf.get('max_backoff_sec', 60)
+        self.empty_retry = conf.get('empty_result', 'success') == 'retry'
+        self.classes = {k: dict(v) for k, v in DEFAULT_CLASSES.items()}
+        for kind, c in (conf.get('classes') or {}).items():
+            self.classes.setdefault(kind, {}).update(c)
+        self.transient_codes = TRANSIENT_CODES | set(conf.get('transient_codes', []))
+
+    def classify(self, exc):
+        if isinstance(exc, RetryableError):
+            return exc.kind
+        if isinstance(exc, GuardTripped):
+            return GUARD
+        if isinstance(exc, sqlite3.OperationalError):
+            msg = str(exc)
+            return TRANSIENT if "locked" in msg or "busy" in msg else SQL
+        if isinstance(exc, sqlite3.DatabaseError):
+            return SQL
+        codes = _CODE.findall(str(exc))
+        if codes:
+            return TRANSIENT if any(c in self.transient_codes for c in codes) else SQL
+        if isinstance(exc, (ConnectionError, TimeoutError)):
+            return TRANSIENT
+        return ERROR
+
+    def next_delay(self, kind, attempts):
+        """attempts(종류 -> 지금까지 재시도 수, Counter) 를 보고 다음 재시도까지 초를 돌려준다.
+        재시도하면 attempts 를 올린다. 종류별 한도나 budget 을 넘었으면 None."""
+        c = self.classes.get(kind, self.classes[ERROR])
+        n = attempts[kind]
+        if n >= c.get('max_attempts', 0) or sum(attempts.values()) >= self.budget:
+            return None
+        attempts[kind] += 1
+        delay = c.get('backoff_sec', self.backoff) * (2 ** n) * (0.5 + random.random())
+        return min(delay, self.max_backoff)
@@ -0,0 +1,64 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class ScheduleCache:
+    """
+    스케줄 메타데이터(scheduler_name, created_by, query, status ...) LRU 캐시.
+    항목은 ttl 초 뒤 만료되고, max_entries 개를 넘으면 오래 쓰지 않은 것부터 버린다.
+    get 은 사본을 돌려주므로 호출자가 고쳐도 캐시에는 영향이 없다.
+    """
+
+    def __init__(self, ttl=300, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # sid -> (expires, rec)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, sid):
+        sid = str(sid)
+        with self.lock:
+            hit = self.entries.get(sid)
+            if hit and hit[0] > time.monotonic():
+                self.entries.move_to_end(sid)
+                self.hits += 1
+                return dict(hit[1])
+            if hit:
+                del self.entries[sid]
+            self.misses += 1
+            return None
+
+    def put(self, sid, rec):
+        sid = str(sid)
+        with self.lock:
+            self.entries[sid] = (time.monotonic() + self.ttl, dict(rec))
+            self.entries.move_to_end(sid)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_status(self, sid, status, keep=()):
+        """캐시에 있는 항목의 status 만 바꾼다 (없거나 지금 status 가 keep 에 있으면 아무것도 하지 않는다)."""
+        with self.lock:
+            hit = self.entries.get(str(sid))
+            if hit and hit[1].get('status') not in keep:
+                hit[1]['status'] = status
+
+    def name(self, sid):
+        """insert_log 용 scheduler_name. 통계에는 넣지 않는다."""
+        with self.lock:
+            hit = self.entries.get(str(sid))
+            return hit[1].get('scheduler_name') if hit else None
+
+    def invalidate(self, sid):
+        with self.lock:
+            self.entries.pop(str(sid), None)
+
+    def stats(self):
+        with self.lock:
+            return {"size": len(self.entries), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
@@ -0,0 +1,74 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    같은 key 로 동시에 들어온 호출은 처음 한 번만 실행하고 나머지는 그 결과를 기다려 공유한다.
+    ttl > 0 이면 성공한 결과를 ttl 초 동안 캐시해 거의 동시에 들어온 호출도 공유한다.
+    캐시는 max_entries 개를 넘으면 오래 쓰지 않은 것부터 버린다.
+    """
+
+    def __init__(self, ttl=0, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.calls = {}  # key -> _Call (실행 중)
+        self.cache = OrderedDict()  # key -> (expires, result)
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """(결과, 공유 여부) 를 돌려준다. fn 의 예외는 같이 기다린 호출에도 그대로 전달된다."""
+        with self.lock:
+            hit = self.cache.get(key)
+            if hit:
+                if hit[0] > time.monotonic():
+                    self.cache.move_to_end(key)
+                    self.shared += 1
+                    return hit[1], True
+                del self.cache[key]
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            with self.lock:
+                self.shared += 1
+            if call.error:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self.lock:
+                del self.calls[key]
+                self.executed += 1
+                if self.ttl > 0 and call.error is None and call.result:
+                    self.cache[key] = (time.monotonic() + self.ttl, call.result)
+                    while len(self.cache) > self.max_entries:
+                        self.cache.popitem(last=False)
+            call.event.set()
+        if call.error:
+            raise call.error
+        return call.result, False
+
+    def stats(self):
+        with self.lock:
+            return {"inflight": len(self.calls), "cached": len(self.cache),
+                    "executed": self.executed, "shared": self.shared}
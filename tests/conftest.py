@@ -0,0 +1,379 @@
+import os
+import re
+import sqlite3
+import threading
+import importlib
+from datetime import datetime
+import yaml
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Oracle DDL(README) 의 A, A_RULE, B 를 SQLite 로 옮긴 것. 시각은 'YYYY-MM-DD HH:MM:SS[.ffffff]' 문자열이라 문자열 비교가 곧 시각 비교다
+SCHEMA = """
+CREATE TABLE A (
+    SCHEDULER_ID    INTEGER PRIMARY KEY AUTOINCREMENT,
+    SCHEDULER_NAME  TEXT NOT NULL,
+    CREATED_BY      TEXT NOT NULL,
+    EXEC_TIME       TIMESTAMP NOT NULL,
+    QUERY           TEXT NOT NULL,
+    STATUS          TEXT NOT NULL,
+    CREATED_AT      TIMESTAMP,
+    RULE_ID         INTEGER,
+    PRIORITY        INTEGER DEFAULT 0,
+    NODE_ID         TEXT,
+    LEASE_EXPIRES   TIMESTAMP,
+    OUTPUT_FORMAT   TEXT DEFAULT 'xlsx'
+);
+CREATE TABLE A_RULE (
+    RULE_ID         INTEGER PRIMARY KEY AUTOINCREMENT,
+    SCHEDULER_NAME  TEXT NOT NULL,
+    CREATED_BY      TEXT NOT NULL,
+    CRON_EXPR       TEXT NOT NULL,
+    QUERY           TEXT NOT NULL,
+    WATERMARK       TIMESTAMP NOT NULL,
+    STATUS          TEXT NOT NULL,
+    CREATED_AT      TIMESTAMP,
+    OUTPUT_FORMAT   TEXT DEFAULT 'xlsx',
+    PRIORITY        INTEGER DEFAULT 0
+);
+CREATE TABLE B (
+    LOG_TIME        TIMESTAMP,
+    SCHEDULER_ID    INTEGER NOT NULL,
+    SCHEDULER_NAME  TEXT,
+    STATUS          TEXT,
+    MESSAGE         TEXT
+);
+"""
+
+# 앱이 보내는 Oracle SQL 을 SQLite 가 읽을 수 있게 바꾼다
+_REWRITES = [
+    (re.compile(r"(?<!\w):(\d+)"), r"?\1"),
+    (re.compile(r"FETCH FIRST (:\w+|\d+) ROWS ONLY", re.I), r"LIMIT \1"),
+    (re.compile(r"FOR UPDATE( SKIP LOCKED)?", re.I), ""),
+    (re.compile(r"\bNVL\(", re.I), "COALESCE("),
+    (re.compile(r"\b(SYSDATE|SYSTIMESTAMP)\b", re.I), "sysdate()"),
+    (re.compile(r"(RETURNING \w+) INTO [:?]\w+", re.I), r"\1"),
+]
+
+
+def to_sqlite(sql):
+    for pattern, repl in _REWRITES:
+        sql = pattern.sub(repl, sql)
+    return sql
+
+
+class FakeVar:
+    """cursor.var(int, arraysize=n). DML RETURNING 결과를 행마다 리스트로 받는다."""
+
+    def __init__(self, arraysize=1):
+        self.values = [[] for _ in range(arraysize)]
+
+    def getvalue(self, i=0):
+        return self.values[i]
+
+
+class FakeCursor:
+    """oracledb cursor 흉내. SQL 은 to_sqlite 로 바꿔 공유 SQLite 연결에서 실행한다."""
+
+    def __init__(self, db):
+        self.db = db
+        self.arraysize = 100
+        self.description = None
+        self.rowcount = 0
+        self.rows = []
+        self.out_var = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        while self.rows:
+            yield self.rows.pop(0)
+
+    def var(self, typ, arraysize=1):
+        return FakeVar(arraysize)
+
+    def setinputsizes(self, *sizes):
+        self.out_var = next((s for s in sizes if isinstance(s, FakeVar)), None)
+
+    def _split_var(self, params):
+        # RETURNING INTO 의 변수는 바인드 목록에 들어오거나 setinputsizes 로 들어온다
+        if isinstance(params, dict):
+            out = next((v for v in params.values() if isinstance(v, FakeVar)), None)
+            return {k: v for k, v in params.items() if not isinstance(v, FakeVar)}, out
+        params = list(params or [])
+        out = next((v for v in params if isinstance(v, FakeVar)), None)
+        return [v for v in params if not isinstance(v, FakeVar)], out
+
+    def _run(self, sql, params, out_row=0):
+        params, out = self._split_var(params)
+        out = out or self.out_var
+        cur = self.db.conn.execute(to_sqlite(sql), params)
+        self.description = cur.description
+        self.rows = cur.fetchall()
+        self.rowcount = cur.rowcount if cur.description is None else len(self.rows)
+        if out is not None:
+            out.values[out_row] = [r[0] for r in self.rows]
+            self.rowcount = len(self.rows)
+            self.rows = []
+
+    def execute(self, sql, params=None, **kwargs):
+        with self.db.lock:
+            self.db.statements.append(sql)
+            self._run(sql, params)
+
+    def executemany(self, sql, rows, **kwargs):
+        with self.db.lock:
+            self.db.statements.append(sql)
+            total = 0
+            for i, params in enumerate(rows):
+                self._run(sql, params, i)
+                total += self.rowcount
+            self.rowcount = total
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        out, self.rows = self.rows[:size], self.rows[size:]
+        return out
+
+    def fetchall(self):
+        out, self.rows = self.rows, []
+        return out
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self.call_timeout = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass  # autocommit
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    busy = 0
+    opened = 1
+
+    def __init__(self, db):
+        self.db = db
+
+    def acquire(self):
+        return FakeConnection(self.db)
+
+    def release(self, conn):
+        pass
+
+    def close(self):
+        pass
+
+
+class _AsyncCursor(FakeCursor):
+    async def execute(self, sql, params=None, **kwargs):
+        FakeCursor.execute(self, sql, params)
+
+    async def executemany(self, sql, rows, **kwargs):
+        FakeCursor.executemany(self, sql, rows)
+
+    async def fetchone(self):
+        return FakeCursor.fetchone(self)
+
+    async def fetchmany(self, size=None):
+        return FakeCursor.fetchmany(self, size)
+
+    async def fetchall(self):
+        return FakeCursor.fetchall(self)
+
+
+class _AsyncConnection(FakeConnection):
+    async def __aenter__(self):
+        self.db.async_busy += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.db.async_busy -= 1
+
+    def cursor(self):
+        return _AsyncCursor(self.db)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class FakeAsyncPool(FakePool):
+    def acquire(self):
+        return _AsyncConnection(self.db)
+
+
+class FakeOracle:
+    """
+    oracledb 풀 대신 쓰는 메모리 SQLite. sync/async 풀이 연결 하나를 같이 쓰고 autocommit 이다.
+    실행한 SQL 은 statements 에 남는다.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None,
+                                    detect_types=sqlite3.PARSE_DECLTYPES)
+        self.conn.create_function("sysdate", 0, lambda: datetime.now().isoformat(" "))
+        # scheduler 가 쓰는 TO_CHAR(exec_time, 'YYYY-MM-DD HH24:MI:SS') 만 흉내낸다
+        self.conn.create_function("to_char", 2, lambda value, fmt: None if value is None else str(value)[:19])
+        self.conn.executescript(SCHEMA)
+        self.statements = []
+        self.async_busy = 0  # async 풀에서 빌려 간 연결 수
+
+    def pool(self, **kwargs):
+        return FakePool(self)
+
+    def async_pool(self, **kwargs):
+        return FakeAsyncPool(self)
+
+    def insert(self, **row):
+        row.setdefault("scheduler_name", "job")
+        row.setdefault("created_by", "tester")
+        row.setdefault("query", "SELECT 1 FROM DUAL")
+        row.setdefault("status", "REGISTERED")
+        cols = ", ".join(row)
+        with self.lock:
+            cur = self.conn.execute(f"INSERT INTO A ({cols}) VALUES ({', '.join('?' * len(row))})", list(row.values()))
+        return cur.lastrowid
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def status(self, sid):
+        return self.query("SELECT STATUS FROM A WHERE SCHEDULER_ID = ?", [sid])[0][0]
+
+
+@pytest.fixture
+def oracle():
+    return FakeOracle()
+
+
+def _relocate(conf, base):
+    # conf.yml 의 상대 경로(logs/...)를 임시 디렉토리 아래로 옮긴다
+    for key, value in conf.items():
+        if isinstance(value, dict):
+            _relocate(value, base)
+        elif isinstance(value, str) and value.startswith("logs/"):
+            conf[key] = os.path.join(base, value)
+
+
+@pytest.fixture(scope="session")
+def schedule_manager(tmp_path_factory):
+    """scheduler/conf.yml 을 임시 디렉토리로 옮겨(로그 경로, worker.size: 0) apps.schedule_manager 를 import 한다.
+    DB 풀은 테스트마다 oracle fixture 로 바꿔 끼운다 (use_oracle)."""
+    base = str(tmp_path_factory.mktemp("scheduler"))
+    with open(os.path.join(ROOT, "scheduler", "conf.yml"), encoding="utf-8") as f:
+        conf = yaml.safe_load(f)
+    _relocate(conf, base)
+    os.makedirs(os.path.join(base, "logs"), exist_ok=True)
+    conf['worker']['size'] = 0
+    with open(os.path.join(base, "conf.yml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(conf, f, allow_unicode=True)
+    cwd = os.getcwd()
+    os.chdir(base)
+    try:
+        sm = importlib.import_module("apps.schedule_manager")
+    finally:
+        os.chdir(cwd)
+    yield sm
+    sm.dispatcher.shutdown()
+    sm.scheduler.shutdown(wait=False)
+    sm.registry.shutdown()
+
+
+@pytest.fixture
+def use_oracle(schedule_manager, oracle, monkeypatch):
+    monkeypatch.setattr(schedule_manager.db, "get_pool", lambda: oracle.pool())
+    monkeypatch.setattr(schedule_manager.db, "get_async_pool", lambda: oracle.async_pool())
+    return oracle
+
+
+class FailLog:
+    """log.error 가 불리면 테스트를 실패시킨다 (DbHandler 는 오류를 로그로만 남기고 삼킨다)."""
+
+    def info(self, msg):
+        pass
+
+    def error(self, msg):
+        raise AssertionError(msg)
+
+
+@pytest.fixture
+def fail_log():
+    return FailLog()
+
+
+@pytest.fixture
+def db_pool(oracle, fail_log, monkeypatch):
+    """FakeOracle 위의 test1 DbHandlerPool. flush 는 테스트가 직접 부른다."""
+    import oracledb
+    from utils.db_handler_pool import DbHandlerPool
+    monkeypatch.setattr(oracledb, "create_pool", lambda **kwargs: oracle.pool())
+    handler = DbHandlerPool({}, flush_size=1000, flush_interval=3600)
+    handler.setlog(fail_log)
+    yield handler
+    handler.close()
+
+
+@pytest.fixture(scope="session")
+def task_main(tmp_path_factory):
+    """임시 config/test.yml 과 FakeOracle 로 test1 의 threadapp.main 을 import 한다 (TaskManager 싱글톤이 뜬다).
+    FakeOracle 은 main.db.pool.db 로 꺼낸다."""
+    import oracledb
+    base = tmp_path_factory.mktemp("test1")
+    os.makedirs(base / "config")
+    conf = {
+        "oracle": {"user": "u", "password": "p", "dsn": "fake"},
+        "log": {"log_dir": str(base / "logs"), "log_format": "%(asctime)s|%(message)s"},
+        "scan": {"interval_sec": 3600},
+        "executor": {"workers": 2},
+    }
+    with open(base / "config" / "test.yml", "w", encoding="utf-8") as f:
+        yaml.safe_dump(conf, f)
+    fake = FakeOracle()
+    create_pool = oracledb.create_pool
+    oracledb.create_pool = lambda **kwargs: fake.pool()
+    env, cwd = os.environ.get("ENV"), os.getcwd()
+    os.environ["ENV"] = "test"
+    os.chdir(base)
+    try:
+        main = importlib.import_module("threadapp.main")
+    finally:
+        os.chdir(cwd)
+        oracledb.create_pool = create_pool
+        if env is None:
+            os.environ.pop("ENV")
+        else:
+            os.environ["ENV"] = env
+    yield main
+    main.db.close()
@@ -0,0 +1,71 @@
+import time
+import threading
+import pytest
+from utils.bounded_executor import BoundedExecutor, HANDED_OFF
+
+
+def wait_for(cond, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def fill(ex):
+    """워커 하나를 막고 큐 한 칸을 채운다. 풀어 줄 Event 를 돌려준다."""
+    gate = threading.Event()
+    assert ex.submit(gate.wait)
+    wait_for(lambda: ex.stats()["running"] == 1)
+    assert ex.submit(gate.wait)
+    return gate
+
+
+def test_defer_on_overflow():
+    deferred = []
+    ex = BoundedExecutor(workers=1, queue_size=1, policy='defer', defer=lambda fn, args: deferred.append(args))
+    gate = fill(ex)
+    assert ex.submit(print, "late") is False
+    assert deferred == [("late",)]
+    gate.set()
+    wait_for(lambda: ex.stats()["completed"] == 2)
+    ex.shutdown()
+    stats = ex.stats()
+    assert (stats["deferred"], stats["rejected"], stats["completed"]) == (1, 0, 2)
+
+
+def test_reject_on_overflow():
+    rejected = []
+    ex = BoundedExecutor(workers=1, queue_size=1, policy='reject', on_reject=lambda fn, args: rejected.append(args))
+    gate = fill(ex)
+    assert ex.submit(print, "x") is False
+    assert rejected == [("x",)]
+    gate.set()
+    ex.shutdown()
+    assert (ex.stats()["rejected"], ex.stats()["deferred"]) == (1, 0)
+
+
+def test_defer_without_callback_rejects():
+    ex = BoundedExecutor(workers=1, queue_size=1, policy='defer')
+    gate = fill(ex)
+    assert ex.submit(print) is False
+    gate.set()
+    ex.shutdown()
+    assert ex.stats()["rejected"] == 1
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        BoundedExecutor(workers=0, policy='drop')
+
+
+def test_handed_off_and_failed_counts():
+    ex = BoundedExecutor(workers=2, queue_size=10)
+    ex.submit(lambda: HANDED_OFF)
+    ex.submit(lambda: None)
+    ex.submit(lambda: 1 / 0)
+    wait_for(lambda: ex.stats()["completed"] + ex.stats()["handed_off"] == 3)
+    ex.shutdown()
+    stats = ex.stats()
+    assert (stats["handed_off"], stats["completed"], stats["failed"]) == (1, 2, 1)
+    assert stats["running"] == 0 and stats["queued"] == 0
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+
+BASE = datetime(2026, 1, 1, 9, 0, 0)
+
+
+def noop():
+    pass
+
+
+@pytest.fixture
+def jobs(schedule_manager, use_oracle):
+    """REGISTERED 두 개, DONE 한 개. REGISTERED job 은 dispatcher 에도 scheduler_id 를 key 로 올린다."""
+    sids = [use_oracle.insert(scheduler_name=f"job{i}", exec_time=BASE + timedelta(hours=i)) for i in range(2)]
+    sids.append(use_oracle.insert(scheduler_name="done", exec_time=BASE, status="DONE"))
+    run_date = datetime.now() + timedelta(hours=1)
+    for sid in sids[:2]:
+        schedule_manager.dispatcher.add_job(noop, run_date=run_date, id=f"job-{sid}", key=sid)
+    yield sids
+    schedule_manager.dispatcher.remove_by_key(sids)
+
+
+def cancel(sm, **kwargs):
+    return asyncio.run(sm.cancel_schedules(sm.ScheduleDeleteRequest(user="tester", **kwargs)))
+
+
+def test_cancel_by_ids_skips_finished_jobs(schedule_manager, use_oracle, jobs):
+    first, second, done = jobs
+    resp = cancel(schedule_manager, scheduler_ids=[first, done, first])
+    assert resp == {"canceled_count": 1, "canceled_scheduler_ids": [first], "dispatcher_removed": 1}
+    assert [use_oracle.status(sid) for sid in jobs] == ["CANCELED", "REGISTERED", "DONE"]
+    assert use_oracle.query("SELECT SCHEDULER_ID, SCHEDULER_NAME, STATUS, MESSAGE FROM B") == \
+        [(first, "job0", "CANCELED", "Canceled by user tester")]
+    # 다른 job 은 dispatcher 에 남아 있다
+    assert schedule_manager.dispatcher.remove_by_key([second]) == [f"job-{second}"]
+
+
+def test_cancel_by_ranges(schedule_manager, use_oracle, jobs):
+    first, second, _ = jobs
+    resp = cancel(schedule_manager, ranges=[{"start_time": "2026-01-01 08:00:00", "end_time": "2026-01-01 09:30:00"},
+                                            {"start_time": "2026-01-01 09:30:00", "end_time": None}])
+    assert sorted(resp["canceled_scheduler_ids"]) == [first, second]
+    assert resp["dispatcher_removed"] == 2
+
+
+def test_delete_without_match_is_404(schedule_manager, use_oracle, jobs):
+    req = schedule_manager.ScheduleDeleteRequest(scheduler_ids=[jobs[2]])
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(schedule_manager.delete_schedules(req))
+    assert e.value.status_code == 404
+    assert use_oracle.status(jobs[2]) == "DONE"
+
+
+def test_bulk_remove_needs_ids_or_range(schedule_manager, use_oracle):
+    with pytest.raises(HTTPException) as e:
+        cancel(schedule_manager)
+    assert e.value.status_code == 400
+
+
+def test_dispatcher_removal_waits_for_window_lock(schedule_manager, use_oracle, jobs):
+    # materialize_rules 가 휠에 올리는 중(window_lock)이면 그게 끝난 뒤에 뺀다
+    result = []
+    with schedule_manager.window_lock:
+        t = threading.Thread(target=lambda: result.append(cancel(schedule_manager, scheduler_ids=[jobs[0]])))
+        t.start()
+        t.join(0.3)
+        assert t.is_alive()
+    t.join(5)
+    assert result[0]["dispatcher_removed"] == 1
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+import pytest
+from utils.db_handler_sqlite import SqliteDbHandler
+
+
+@pytest.fixture(params=["oracle", "sqlite"])
+def handler(request, tmp_path):
+    """두 백엔드에 같은 claim/lease 동작을 확인한다."""
+    if request.param == "oracle":
+        yield request.getfixturevalue("db_pool")
+        return
+    h = SqliteDbHandler({"path": str(tmp_path / "t.db")}, flush_size=1000, flush_interval=3600)
+    h.setlog(request.getfixturevalue("fail_log"))
+    yield h
+    h.close()
+
+
+def run(handler, sql, params=()):
+    # ? 바인드는 SQLite 와 FakeOracle 둘 다 읽는다
+    with handler.pool.acquire() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+        conn.commit()
+    return rows
+
+
+def add(handler, exec_time, status="REGISTERED"):
+    run(handler, "INSERT INTO A (SCHEDULER_NAME, CREATED_BY, EXEC_TIME, QUERY, STATUS) VALUES (?, ?, ?, ?, ?)",
+        ["job", "tester", exec_time, "SELECT 1 FROM DUAL", status])
+    return run(handler, "SELECT MAX(SCHEDULER_ID) FROM A")[0][0]
+
+
+def owner(handler, sid):
+    return run(handler, "SELECT STATUS, NODE_ID FROM A WHERE SCHEDULER_ID = ?", [sid])[0]
+
+
+def claim(handler, node, lease_sec=60, limit=1000):
+    now = datetime.now()
+    jobs = handler.claim_schedules(node, now - timedelta(seconds=60), now + timedelta(seconds=15), lease_sec, limit)
+    return [job["scheduler_id"] for job in jobs]
+
+
+def test_claims_registered_rows_in_window(handler):
+    now = datetime.now()
+    due = add(handler, now + timedelta(seconds=5))
+    add(handler, now + timedelta(minutes=10))  # lookahead 밖
+    add(handler, now, status="DONE")
+    assert claim(handler, "n1") == [due]
+    assert owner(handler, due) == ("RUNNING", "n1")
+    assert handler.get_schedule(due)["status"] == "RUNNING"  # claim 이 캐시를 채운다
+    assert claim(handler, "n2") == []  # lease 가 살아 있으면 다른 노드가 못 가져간다
+
+
+def test_claim_limit(handler):
+    sids = [add(handler, datetime.now() + timedelta(seconds=i)) for i in range(3)]
+    assert claim(handler, "n1", limit=2) == sids[:2]
+    assert claim(handler, "n1") == sids[2:]
+
+
+def test_expired_lease_is_reclaimed(handler):
+    sid = add(handler, datetime.now())
+    assert claim(handler, "dead", lease_sec=0) == [sid]
+    assert claim(handler, "n2") == [sid]
+    assert owner(handler, sid) == ("RUNNING", "n2")
+
+
+def test_renewed_lease_is_kept(handler):
+    sid = add(handler, datetime.now())
+    assert claim(handler, "n1", lease_sec=0) == [sid]
+    handler.renew_leases("n1", lease_sec=60)
+    assert claim(handler, "n2") == []
+    assert owner(handler, sid) == ("RUNNING", "n1")
+
+
+def test_finished_job_is_not_reclaimed(handler):
+    sid = add(handler, datetime.now())
+    assert claim(handler, "n1", lease_sec=0) == [sid]
+    handler.update_status(sid, "DONE")
+    assert claim(handler, "n2") == []
+
+
+def test_finish_does_not_overwrite_killed(handler):
+    sid = add(handler, datetime.now())
+    assert claim(handler, "n1") == [sid]
+    assert handler.kill_schedules([sid]) == [sid]
+    # kill 전에 시작한 runner 가 끝나면서 보내는 상태 변경
+    handler.update_status(sid, "SUCCESS")
+    assert handler.get_schedule(sid)["status"] == "KILLED"
+    handler.update_status(sid, "DONE")
+    assert owner(handler, sid) == ("KILLED", "n1")
+    assert handler.get_schedule(sid)["status"] == "KILLED"
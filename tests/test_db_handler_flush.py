@@ -0,0 +1,113 @@
+import sqlite3
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from utils.db_handler import truncate_bytes
+from utils.db_handler_sqlite import SqliteDbHandler
+
+
+class FlakyDbHandler(SqliteDbHandler):
+    """message 가 'BAD' 인 로그 행은 ORA-12899 처럼 실패하고, locked 면 모든 쓰기가 일시 오류로 실패한다."""
+
+    def __init__(self, *args, **kwargs):
+        self.locked = False
+        self.bad = "BAD"
+        super().__init__(*args, **kwargs)
+
+    def _write(self, statuses, logs):
+        if self.locked:
+            raise sqlite3.OperationalError("database is locked")
+        if any(message == self.bad for _, _, _, message in logs):
+            raise Exception('ORA-12899: value too large for column "B"."MESSAGE"')
+        super()._write(statuses, logs)
+
+
+@pytest.fixture
+def db(tmp_path):
+    handler = FlakyDbHandler({'path': str(tmp_path / "t.db")}, flush_size=1000, flush_interval=3600,
+                             max_pending_logs=5, row_attempts=3)
+    yield handler
+    handler.locked = False
+    handler.bad = None
+    handler.close()
+    handler.pool.close()
+
+
+def add_schedule(db):
+    return db.insert_schedule(SimpleNamespace(scheduler_name="s", created_by="u", exec_time=datetime.now(),
+                                              query="SELECT 1 FROM DUAL", output_format="csv", priority=0))
+
+
+def query(db, sql):
+    with db.pool.acquire() as conn:
+        return conn.execute(sql).fetchall()
+
+
+def test_bad_row_does_not_block_other_rows(db):
+    sid = add_schedule(db)
+    db.insert_log(sid, "RETRY", "BAD")
+    db.insert_log(sid, "SUCCESS", "ok")
+    db.update_status(sid, "DONE")  # 종료 상태는 동기 flush
+    assert query(db, f"SELECT STATUS FROM A WHERE SCHEDULER_ID = {sid}") == [("DONE",)]
+    assert query(db, "SELECT STATUS, MESSAGE FROM B") == [("SUCCESS", "ok")]
+    assert db.write_behind_stats()["pending_logs"] == 1  # 나쁜 행만 남는다
+
+    db.insert_log(sid, "INFO", "next")
+    assert not db.flush()
+    assert db.flush()  # 세 번째 실패에서 버린다
+    stats = db.write_behind_stats()
+    assert stats["dropped_rows"] == 1 and stats["pending_logs"] == 0
+    assert sorted(m for (m,) in query(db, "SELECT MESSAGE FROM B")) == ["next", "ok"]
+    assert db.row_attempts == {}
+
+
+def test_transient_error_keeps_rows_without_counting(db):
+    sid = add_schedule(db)
+    db.locked = True
+    db.insert_log(sid, "INFO", "a")
+    db.update_status(sid, "RUNNING")
+    for _ in range(5):
+        assert not db.flush()
+    stats = db.write_behind_stats()
+    assert stats["pending_logs"] == 1 and stats["pending_status"] == 1 and stats["dropped_rows"] == 0
+    db.locked = False
+    assert db.flush()
+    assert query(db, "SELECT MESSAGE FROM B") == [("a",)]
+    assert query(db, f"SELECT STATUS FROM A WHERE SCHEDULER_ID = {sid}") == [("RUNNING",)]
+
+
+def test_rows_are_not_dropped_when_every_row_fails(db):
+    sid = add_schedule(db)
+    db.bad = "x"
+    db.insert_logs([(sid, "INFO", "x"), (sid, "INFO", "x")])
+    for _ in range(5):
+        assert not db.flush()
+    assert db.write_behind_stats()["dropped_rows"] == 0
+    assert db.write_behind_stats()["pending_logs"] == 2
+
+
+def test_pending_logs_are_bounded(db):
+    sid = add_schedule(db)
+    db.locked = True
+    db.insert_logs([(sid, "INFO", str(i)) for i in range(8)])
+    db.flush()
+    stats = db.write_behind_stats()
+    assert stats["pending_logs"] == 5 and stats["dropped_logs"] == 3
+    assert [row[3] for row in db.pending_logs] == ["3", "4", "5", "6", "7"]  # 오래된 것부터 버린다
+
+
+def test_log_message_is_truncated_by_bytes(db):
+    sid = add_schedule(db)
+    db.insert_log(sid, "ERROR", "가" * 3000)  # 3000 글자, 9000 바이트
+    assert db.flush()
+    (message,), = query(db, "SELECT MESSAGE FROM B")
+    assert len(message.encode("utf-8")) <= 4000
+    assert message == "가" * 1333
+
+
+def test_truncate_bytes():
+    assert truncate_bytes(None) is None
+    assert truncate_bytes("abc") == "abc"
+    assert truncate_bytes("a" * 5000) == "a" * 4000
+    assert truncate_bytes("a가", limit=3) == "a"  # 잘린 글자는 버린다
+    assert truncate_bytes(12345, limit=3) == "123"
@@ -0,0 +1,53 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+from shared.delivery import DeliveryQueue
+
+
+class FakeDb:
+    def __init__(self):
+        self.rows = []
+
+    def insert_logs(self, rows):
+        self.rows.extend(rows)
+
+
+@pytest.fixture
+def server():
+    bodies = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            bodies.append(self.rfile.read(int(self.headers['Content-Length'])))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}/hook", bodies
+    httpd.shutdown()
+
+
+def test_submit_returns_targets_that_did_not_fit(tmp_path):
+    f = tmp_path / "r.csv"
+    f.write_text("a\n")
+    q = DeliveryQueue({"mm": {"url": "http://127.0.0.1:9/x"}, "fs": {"url": "http://127.0.0.1:9/y"}}, FakeDb(),
+                      workers=0, queue_size=1)
+    assert q.submit(1, f) == ["fs"]  # mm 은 들어갔고 fs 는 큐가 차서 못 넣었다
+    assert q.stats()["pending"] == 1
+
+
+def test_delivers_file_and_records_result(tmp_path, server):
+    url, bodies = server
+    f = tmp_path / "r.csv"
+    f.write_text("col\n1\n")
+    db = FakeDb()
+    q = DeliveryQueue({"mm": {"url": url, "field": "files"}}, db, workers=1)
+    assert q.submit(7, f, {"text": "done"}) == []
+    q.shutdown(timeout=10)
+    assert db.rows and db.rows[0][:2] == (7, "DELIVERED")
+    assert b'name="text"\r\n\r\ndone' in bodies[0]
+    assert b'name="files"; filename="r.csv"' in bodies[0] and b"col\n1\n" in bodies[0]
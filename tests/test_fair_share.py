@@ -0,0 +1,108 @@
+import queue
+import threading
+import pytest
+from shared.fair_share import FairShareQueue
+
+
+def drain(q, n):
+    # 꺼내자마자 done 을 불러 상한에 걸리지 않게 한다
+    out = []
+    for _ in range(n):
+        item, owner = q.get(timeout=0)
+        out.append(item)
+        q.done(owner)
+    return out
+
+
+def test_round_robin_across_owners():
+    q = FairShareQueue()
+    for i in range(5):
+        q.put(f"a{i}", owner="a")
+    q.put("b0", owner="b")
+    q.put("b1", owner="b")
+    assert drain(q, 7) == ["a0", "b0", "a1", "b1", "a2", "a3", "a4"]
+
+
+def test_weights():
+    q = FairShareQueue(weights={"a": 2})
+    for i in range(4):
+        q.put(f"a{i}", owner="a")
+        q.put(f"b{i}", owner="b")
+    assert [x[0] for x in drain(q, 6)] == ["a", "b", "a", "a", "b", "a"]
+
+
+def test_priority_then_fifo_within_owner():
+    q = FairShareQueue()
+    q.put("low", owner="a")
+    q.put("high", owner="a", priority=5)
+    q.put("low2", owner="a")
+    assert drain(q, 3) == ["high", "low", "low2"]
+
+
+def test_owner_cap_skips_busy_owner():
+    q = FairShareQueue(owner_cap=1)
+    q.put("a0", owner="a")
+    q.put("a1", owner="a")
+    q.put("b0", owner="b")
+    assert q.get(timeout=0) == ("a0", "a")
+    assert q.get(timeout=0) == ("b0", "b")
+    assert q.get(timeout=0) == (None, None)  # a 는 상한, b 는 비었다
+    q.done("a")
+    assert q.get(timeout=0) == ("a1", "a")
+
+
+def test_global_cap_and_done_wakes_waiter():
+    q = FairShareQueue(global_cap=1)
+    q.put("a0", owner="a")
+    q.put("b0", owner="b")
+    assert q.get(timeout=0) == ("a0", "a")
+    assert q.get(timeout=0) == (None, None)
+    threading.Timer(0.05, q.done, ["a"]).start()
+    assert q.get(timeout=5) == ("b0", "b")
+
+
+def test_maxsize_raises_full():
+    q = FairShareQueue(maxsize=1)
+    q.put("a0", owner="a")
+    with pytest.raises(queue.Full):
+        q.put("b0", owner="b")
+
+
+def test_close_releases_waiters_and_stats():
+    q = FairShareQueue()
+    q.put("a0", owner="a")
+    item, owner = q.get(timeout=0)
+    stats = q.stats()
+    assert stats["running"] == 1 and stats["owners"]["a"]["dispatched"] == 1
+    q.done(owner)
+    assert q.stats()["owners"]["a"]["dispatched"] == 1  # 할 일이 없어도 통계는 남는다
+    threading.Timer(0.05, q.close).start()
+    assert q.get(timeout=5) == (None, None)
+
+
+def test_idle_owner_keeps_round_robin_credit():
+    q = FairShareQueue()
+    q.put("a0", owner="a")
+    q.put("b0", owner="b")
+    q.put("b1", owner="b")
+    assert drain(q, 1) == ["a0"]
+    credit = q.owners["a"].current
+    assert credit < 0  # 방금 나간 a 는 b 에게 진 빚이 있다
+    q.put("a1", owner="a")  # 비었다가 다시 들어와도 0 부터 시작하지 않는다
+    assert q.owners["a"].current == credit
+    assert drain(q, 3) == ["b0", "a1", "b1"]
+
+
+def test_idle_owners_are_evicted_by_count_and_age(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("shared.fair_share.time.monotonic", lambda: now[0])
+    q = FairShareQueue(max_idle_owners=2, idle_ttl=60)
+    for name in "abc":
+        q.put(name, owner=name)
+        drain(q, 1)
+    assert set(q.stats()["owners"]) == {"b", "c"}  # 가장 오래 쉰 a 부터
+    q.put("b1", owner="b")  # 다시 일이 생긴 owner 는 지우지 않는다
+    now[0] += 61
+    q.put("d", owner="d")
+    drain(q, 2)
+    assert set(q.stats()["owners"]) == {"b", "d"}
@@ -0,0 +1,66 @@
+import sqlite3
+import pytest
+from shared.guard import QueryGuard, GuardTripped, ROWS, BYTES, TIMEOUT, estimate_bytes
+from shared.sink import CsvSink, drain_to_sink
+
+
+def test_row_cap_trips_after_max_rows():
+    budget = QueryGuard({"max_rows": 5}).budget()
+    budget.add([(i,) for i in range(5)])
+    with pytest.raises(GuardTripped) as e:
+        budget.add([(5,)])
+    assert e.value.kind == ROWS
+
+
+def test_byte_cap_trips_on_estimated_size():
+    budget = QueryGuard({"max_mb": 1}).budget()
+    budget.add([("x" * 1000,)] * 1000)  # 약 1,000,000 바이트
+    with pytest.raises(GuardTripped) as e:
+        budget.add([("x" * 1000,)] * 100)
+    assert e.value.kind == BYTES
+    assert budget.bytes > 1024 * 1024
+
+
+def test_estimate_bytes_samples_rows():
+    assert estimate_bytes([]) == 0
+    assert estimate_bytes([("ab", None, 1)] * 100) == 300
+
+
+def test_zero_limits_never_trip():
+    budget = QueryGuard().budget()
+    budget.add([("x" * 1000,)] * 10000)
+    assert budget.rows == 10000 and budget.bytes == 0  # max_mb 가 없으면 크기를 재지도 않는다
+
+
+def test_schedule_override():
+    guard = QueryGuard({"max_rows": 10, "max_cost": 100, "schedules": {"big": {"max_rows": 1000}}})
+    assert guard.for_schedule("daily") is guard
+    big = guard.for_schedule("big")
+    assert (big.max_rows, big.max_cost) == (1000, 100)
+
+
+def test_call_timeout_error_is_tripped():
+    guard = QueryGuard({"call_timeout_sec": 2})
+    assert guard.call_timeout_ms == 2000
+    assert guard.tripped(Exception("DPY-4024: call timeout of 2000 ms exceeded")).kind == TIMEOUT
+    assert guard.tripped(Exception("ORA-00942: table or view does not exist")) is None
+    assert QueryGuard().tripped(Exception("DPY-4024")) is None  # call_timeout 을 안 켰으면 그냥 오류
+
+
+def test_cost_check():
+    guard = QueryGuard({"max_cost": 100, "cost_action": "reject"})
+    assert guard.check_cost(100) is None
+    assert guard.check_cost(None) is None  # SQLite 는 cost 를 모른다
+    action, message = guard.check_cost(101)
+    assert action == "reject" and "101" in message
+
+
+def test_drain_stops_before_writing_over_budget_batch(tmp_path):
+    conn = sqlite3.connect(":memory:")
+    cur = conn.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 10) SELECT i FROM n")
+    sink = CsvSink(str(tmp_path / "out.csv"))
+    with pytest.raises(GuardTripped):
+        drain_to_sink(cur, sink, arraysize=4, budget=QueryGuard({"max_rows": 6}).budget())
+    sink.close()
+    with open(sink.file_path, encoding="utf-8-sig") as f:
+        assert f.read().split() == ["i", "1", "2", "3", "4"]  # 두 번째 batch 는 쓰지 않았다
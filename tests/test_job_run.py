@@ -0,0 +1,36 @@
+from datetime import datetime
+import importlib
+import os
+import pytest
+
+EXEC_TIME = "2026-01-01 09:00:00"
+
+
+@pytest.fixture
+def app(schedule_manager):
+    return importlib.import_module("apps.app")
+
+
+def run(app, oracle, sid):
+    with oracle.pool().acquire() as conn:
+        return app.run(sid, EXEC_TIME, conn)
+
+
+def test_skips_job_that_is_no_longer_registered(app, oracle):
+    sid = oracle.insert(exec_time=datetime(2026, 1, 1, 9, 0, 0), status="CANCELED")
+    assert run(app, oracle, sid)["result"] == "SKIPPED"
+    assert oracle.status(sid) == "CANCELED"
+    assert oracle.query("SELECT COUNT(*) FROM B") == [(0,)]
+
+
+def test_registered_job_runs_once(app, oracle, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("logs")
+    sid = oracle.insert(exec_time=datetime(2026, 1, 1, 9, 0, 0), query="SELECT 1 AS N", output_format="csv")
+    stages = run(app, oracle, sid)
+    assert (stages["result"], stages["rows"]) == ("DONE", 1)
+    assert os.path.exists(stages["delivery"]["file_path"])
+    assert oracle.status(sid) == "DONE"
+    # 같은 job 이 한 번 더 불려도(중복 fire) 다시 실행하지 않는다
+    assert run(app, oracle, sid)["result"] == "SKIPPED"
+    assert oracle.query("SELECT STATUS FROM B") == [("DONE",)]
@@ -0,0 +1,80 @@
+import time
+import threading
+from datetime import datetime, timedelta
+import pytest
+
+
+def wait_for(cond, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def runner(task_main, monkeypatch):
+    """TaskRunner 대신 준비/실행 시각만 runs 에 (sid, 준비 시각, 시작 시각) 으로 기록하는 runner 를 끼운다."""
+    lock = threading.Lock()
+
+    class FakeRunner:
+        exec_time = None
+        runs = []
+
+        def __init__(self, sid, *args):
+            self.sid = sid
+            self.owner = "tester"
+            self.conn = None
+            self.attempts = None
+            self.retry_after = None
+            self.start_offset = None
+            self.prepared_at = None
+
+        def prepare(self, reserve=False):
+            self.prepared_at = time.time()
+
+        def run(self):
+            started = time.time()
+            self.start_offset = started - FakeRunner.exec_time.timestamp()
+            with lock:
+                FakeRunner.runs.append((self.sid, self.prepared_at, started))
+
+    monkeypatch.setattr(task_main, "TaskRunner", FakeRunner)
+    return FakeRunner
+
+
+def stage(task_main, runner, n, delay=0.5, **stage_cfg):
+    """n 개 job 을 delay 초 뒤 exec_time 의 barrier 에 걸어 executor 에 넣는다."""
+    tm = task_main.TaskManager({"workers": 2}, {}, dict({"lead_sec": 1}, **stage_cfg))
+    exec_time = datetime.now() + timedelta(seconds=delay)
+    runner.exec_time = exec_time
+    barrier = tm._barrier(exec_time)
+    for sid in range(1, n + 1):
+        assert tm.executor.submit(tm.run_task, sid, barrier, owner="tester")
+    return tm, exec_time, barrier
+
+
+def test_prepared_jobs_start_together_at_exec_time(task_main, runner):
+    tm, exec_time, _ = stage(task_main, runner, 2)
+    runs = runner.runs
+    wait_for(lambda: len(runs) == 2)
+    for sid, prepared_at, started in runs:
+        assert prepared_at < exec_time.timestamp() <= started
+    assert abs(runs[0][2] - runs[1][2]) < 0.2
+    assert tm.stage_stats()["samples"] == 2
+    tm.executor.shutdown()
+
+
+def test_parks_at_most_max_parked_jobs(task_main, runner):
+    tm, exec_time, barrier = stage(task_main, runner, 3, max_parked=1)
+    runs = runner.runs
+    # 하나는 워커를 잡고 barrier 에서 기다리고, 나머지는 준비만 해 두고 워커를 놓는다
+    wait_for(lambda: len(tm.late.get(barrier, [])) == 2)
+    wait_for(lambda: tm.executor.stats()["running"] == 1)
+    wait_for(lambda: len(runs) == 3)
+    assert all(started >= exec_time.timestamp() for _, _, started in runs)
+    assert tm.late == {}
+    wait_for(lambda: tm.executor.stats()["completed"] == 3)
+    stats = tm.executor.stats()
+    assert (stats["completed"], stats["handed_off"]) == (3, 2)  # 다시 들어간 job 을 두 번 세지 않는다
+    tm.executor.shutdown()
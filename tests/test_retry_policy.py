@@ -0,0 +1,64 @@
+import sqlite3
+import pytest
+from collections import Counter
+from shared.guard import GuardTripped
+from utils.retry_policy import RetryPolicy, RetryableError, TRANSIENT, SQL, MISSING, EMPTY, ERROR, GUARD
+
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    # jitter (0.5 + random) 를 1 배로 고정
+    monkeypatch.setattr("utils.retry_policy.random.random", lambda: 0.5)
+
+
+@pytest.mark.parametrize("exc, kind", [
+    (Exception("ORA-03113: end-of-file on communication channel"), TRANSIENT),
+    (Exception("DPY-4011: the database or network closed the connection"), TRANSIENT),
+    (Exception("ORA-00942: table or view does not exist"), SQL),
+    (sqlite3.OperationalError("database is locked"), TRANSIENT),
+    (sqlite3.OperationalError("no such table: X"), SQL),
+    (sqlite3.IntegrityError("UNIQUE constraint failed"), SQL),
+    (ConnectionResetError(), TRANSIENT),
+    (RetryableError(MISSING, "not visible yet"), MISSING),
+    (GuardTripped("ROWS", "max_rows"), GUARD),
+    (ValueError("boom"), ERROR),
+])
+def test_classify(exc, kind):
+    assert RetryPolicy().classify(exc) == kind
+
+
+def test_extra_transient_codes():
+    assert RetryPolicy({"transient_codes": ["ORA-00942"]}).classify(Exception("ORA-00942")) == TRANSIENT
+
+
+def test_next_delay_exponential_backoff_capped(no_jitter):
+    policy = RetryPolicy({"backoff_sec": 2, "max_backoff_sec": 5, "budget": 10})
+    attempts = Counter()
+    assert [policy.next_delay(TRANSIENT, attempts) for _ in range(6)] == [2, 4, 5, 5, 5, None]
+    assert attempts[TRANSIENT] == 5
+
+
+def test_next_delay_class_backoff_and_limits(no_jitter):
+    policy = RetryPolicy({"classes": {MISSING: {"backoff_sec": 0.5, "max_attempts": 2}}})
+    attempts = Counter()
+    assert policy.next_delay(MISSING, attempts) == 0.5
+    assert policy.next_delay(MISSING, attempts) == 1.0
+    assert policy.next_delay(MISSING, attempts) is None
+    assert policy.next_delay(SQL, attempts) is None  # 다시 해도 같은 오류
+    assert policy.next_delay(GUARD, attempts) is None
+
+
+def test_next_delay_budget_across_kinds(no_jitter):
+    policy = RetryPolicy({"budget": 3})
+    attempts = Counter()
+    assert policy.next_delay(TRANSIENT, attempts) is not None
+    assert policy.next_delay(EMPTY, attempts) is not None
+    assert policy.next_delay(MISSING, attempts) is not None
+    assert policy.next_delay(TRANSIENT, attempts) is None
+    assert sum(attempts.values()) == 3
+
+
+def test_jitter_range():
+    policy = RetryPolicy({"backoff_sec": 1})
+    for _ in range(50):
+        assert 0.5 <= policy.next_delay(TRANSIENT, Counter()) <= 1.5
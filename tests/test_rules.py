@@ -0,0 +1,30 @@
+import asyncio
+import pytest
+
+
+def register(sm, **kwargs):
+    req = sm.ScheduleInput(scheduler_name="hourly", created_by="tester", cron_expr="*/10 * * * *",
+                           query="SELECT 1 FROM DUAL", recurring=True, **kwargs)
+    return asyncio.run(sm.register_schedule(req))
+
+
+@pytest.fixture
+def loaded(schedule_manager, use_oracle):
+    yield
+    sids = [row[0] for row in use_oracle.query("SELECT SCHEDULER_ID FROM A")]
+    schedule_manager.dispatcher.remove_by_key(sids)
+
+
+def test_recurring_register_releases_connection_before_materialize(schedule_manager, use_oracle, monkeypatch):
+    busy = []
+    monkeypatch.setattr(schedule_manager, "materialize_rules", lambda: busy.append(use_oracle.async_busy))
+    resp = register(schedule_manager)
+    assert busy == [0]  # 규칙 INSERT 의 연결은 이미 풀에 돌아갔다
+    assert use_oracle.query("SELECT STATUS FROM A_RULE WHERE RULE_ID = ?", [resp["rule_id"]]) == [("ACTIVE",)]
+
+
+def test_recurring_register_expands_first_window(schedule_manager, use_oracle, loaded):
+    resp = register(schedule_manager)
+    rows = use_oracle.query("SELECT RULE_ID, STATUS FROM A")
+    assert len(rows) == schedule_manager.HORIZON.total_seconds() // 600
+    assert set(rows) == {(resp["rule_id"], "REGISTERED")}
@@ -0,0 +1,78 @@
+from datetime import datetime
+import pytest
+from utils.schedule_cache import ScheduleCache
+
+
+def selects(oracle):
+    return sum(1 for sql in oracle.statements if sql.lstrip().upper().startswith("SELECT"))
+
+
+@pytest.fixture
+def sid(oracle):
+    return oracle.insert(scheduler_name="daily", exec_time=datetime(2026, 1, 1, 9, 0, 0))
+
+
+def test_get_schedule_reads_once(db_pool, oracle, sid):
+    rec = db_pool.get_schedule(sid)
+    assert rec["scheduler_name"] == "daily" and rec["status"] == "REGISTERED"
+    rec["status"] = "changed"  # 돌려받은 사본을 고쳐도 캐시는 그대로
+    assert db_pool.get_schedule(sid)["status"] == "REGISTERED"
+    assert selects(oracle) == 1
+    assert db_pool.cache_stats()["hits"] == 1
+
+
+def test_missing_schedule_is_not_cached(db_pool, oracle):
+    assert db_pool.get_schedule(999) is None
+    assert db_pool.get_schedule(999) is None
+    assert selects(oracle) == 2
+
+
+def test_running_status_writes_through(db_pool, oracle, sid):
+    db_pool.get_schedule(sid)
+    db_pool.update_status(sid, "RUNNING")
+    assert db_pool.get_schedule(sid)["status"] == "RUNNING"  # 아직 버퍼에 있어도 캐시로 보인다
+    assert oracle.status(sid) == "REGISTERED"
+    db_pool.flush()
+    assert oracle.status(sid) == "RUNNING"
+    assert selects(oracle) == 1
+
+
+@pytest.mark.parametrize("status", ["DONE", "ERROR", "KILLED"])
+def test_terminal_status_flushes_and_invalidates(db_pool, oracle, sid, status):
+    db_pool.get_schedule(sid)
+    db_pool.update_status(sid, status)
+    assert oracle.status(sid) == status
+    assert db_pool.cache_stats()["size"] == 0
+    assert db_pool.get_schedule(sid)["status"] == status
+    assert selects(oracle) == 2
+
+
+def test_kill_invalidates_and_logs(db_pool, oracle, sid):
+    done = oracle.insert(exec_time=datetime(2026, 1, 1, 9, 0, 0), status="DONE")
+    db_pool.get_schedule(sid)
+    assert db_pool.kill_schedules([sid, done], message="killed by test") == [sid]
+    assert db_pool.cache_stats()["size"] == 0
+    assert (oracle.status(sid), oracle.status(done)) == ("KILLED", "DONE")
+    db_pool.flush()
+    assert oracle.query("SELECT SCHEDULER_NAME, STATUS, MESSAGE FROM B") == [("daily", "KILLED", "killed by test")]
+
+
+def test_log_rows_use_cached_name(db_pool, oracle, sid):
+    db_pool.get_schedule(sid)
+    db_pool.insert_log(sid, "RUNNING", "start")
+    db_pool.flush()
+    assert oracle.query("SELECT SCHEDULER_ID, SCHEDULER_NAME, STATUS FROM B") == [(sid, "daily", "RUNNING")]
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("utils.schedule_cache.time.monotonic", lambda: now[0])
+    cache = ScheduleCache(ttl=10, max_entries=2)
+    cache.put(1, {"status": "REGISTERED"})
+    cache.put(2, {"status": "REGISTERED"})
+    assert cache.get(1)  # 1 을 최근에 쓴 것으로
+    cache.put(3, {"status": "REGISTERED"})
+    assert cache.get(2) is None and cache.get(1) and cache.get(3)
+    now[0] += 11
+    assert cache.get(1) is None
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,72 @@
+import json
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+
+BASE = datetime(2026, 1, 1, 9, 0, 0)
+
+
+def search(sm, **kwargs):
+    params = dict(created_by=None, start_time=None, end_time=None, status=None, fields=None, limit=100,
+                  cursor=None, format="json")
+    params.update(kwargs)
+    return asyncio.run(sm.search_schedule(**params))
+
+
+@pytest.fixture
+def rows(use_oracle):
+    # 같은 exec_time 에 여러 행이 있어야 (exec_time, scheduler_id) keyset 의 두 번째 키가 쓰인다
+    sids = []
+    for i in range(7):
+        sids.append(use_oracle.insert(exec_time=BASE + timedelta(minutes=i // 3), created_by="a" if i % 2 else "b",
+                                      query=f"SELECT {i} FROM DUAL"))
+    return sids
+
+
+def test_cursor_round_trip(schedule_manager):
+    token = schedule_manager.encode_cursor(BASE, 42)
+    assert schedule_manager.decode_cursor(token) == (BASE, 42)
+
+
+def test_invalid_cursor_is_400(schedule_manager):
+    with pytest.raises(HTTPException) as e:
+        schedule_manager.decode_cursor("not-a-cursor")
+    assert e.value.status_code == 400
+
+
+def test_pages_follow_keyset_without_gaps(schedule_manager, rows):
+    seen, cursor = [], None
+    while True:
+        page = search(schedule_manager, limit=3, cursor=cursor)
+        seen.extend(item["scheduler_id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        assert len(page["items"]) == 3
+    assert seen == rows
+
+
+def test_filter_and_projection(schedule_manager, rows):
+    page = search(schedule_manager, created_by="a", fields="scheduler_name")
+    assert [item["scheduler_id"] for item in page["items"]] == rows[1::2]
+    # keyset 키(scheduler_id, exec_time)는 요청하지 않아도 들어간다
+    assert set(page["items"][0]) == {"scheduler_id", "scheduler_name", "exec_time"}
+    assert "query" not in search(schedule_manager, limit=1)["items"][0]  # CLOB 은 요청할 때만
+
+
+def test_unknown_field_is_400(schedule_manager):
+    with pytest.raises(HTTPException):
+        schedule_manager.search_fields("scheduler_id,password")
+
+
+def test_ndjson_streams_rows_after_cursor(schedule_manager, rows):
+    first = search(schedule_manager, limit=2)
+    resp = search(schedule_manager, format="ndjson", cursor=first["next_cursor"], fields="query")
+
+    async def collect():
+        return "".join([chunk async for chunk in resp.body_iterator])
+
+    lines = [json.loads(line) for line in asyncio.run(collect()).splitlines()]
+    assert [line["scheduler_id"] for line in lines] == rows[2:]
+    assert lines[0]["query"] == "SELECT 2 FROM DUAL"
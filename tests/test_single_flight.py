@@ -0,0 +1,87 @@
+import time
+import threading
+import pytest
+from utils.single_flight import SingleFlight
+
+
+def run_concurrently(sf, key, fn, n):
+    """leader 가 fn 안에서 막혀 있는 동안 n 개 호출을 더 띄운다. [(결과 또는 예외, 공유 여부)]"""
+    gate = threading.Event()
+    entered = threading.Event()
+    out = []
+
+    def leader_fn():
+        entered.set()
+        gate.wait(5)
+        return fn()
+
+    def call(f):
+        try:
+            out.append(sf.do(key, f))
+        except Exception as e:
+            out.append((e, True))
+
+    leader = threading.Thread(target=call, args=(leader_fn,))
+    leader.start()
+    assert entered.wait(5)
+    followers = [threading.Thread(target=call, args=(fn,)) for _ in range(n)]
+    for t in followers:
+        t.start()
+    time.sleep(0.1)  # follower 가 event.wait 에 들어갈 시간
+    gate.set()
+    for t in [leader] + followers:
+        t.join(5)
+    return out
+
+
+def test_concurrent_calls_share_one_execution():
+    sf = SingleFlight()
+    out = run_concurrently(sf, "q", lambda: [1, 2], 4)
+    assert [r for r, _ in out] == [[1, 2]] * 5
+    assert sorted(shared for _, shared in out) == [False, True, True, True, True]
+    assert sf.stats() == {"inflight": 0, "cached": 0, "executed": 1, "shared": 4}
+
+
+def test_error_is_raised_to_every_waiter():
+    sf = SingleFlight()
+
+    def fail():
+        raise ValueError("ORA-00942")
+
+    out = run_concurrently(sf, "q", fail, 2)
+    assert len(out) == 3 and all(isinstance(r, ValueError) for r, _ in out)
+    assert sf.stats()["executed"] == 1
+    with pytest.raises(ValueError):
+        sf.do("q", fail)  # 실패는 캐시하지 않고 다시 실행한다
+    assert sf.stats()["executed"] == 2
+
+
+def test_without_ttl_sequential_calls_run_again():
+    sf = SingleFlight()
+    assert sf.do("q", lambda: 1) == (1, False)
+    assert sf.do("q", lambda: 2) == (2, False)
+
+
+def test_ttl_cache_and_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("utils.single_flight.time.monotonic", lambda: now[0])
+    sf = SingleFlight(ttl=10)
+    assert sf.do("q", lambda: "a") == ("a", False)
+    assert sf.do("q", lambda: "b") == ("a", True)
+    now[0] += 11
+    assert sf.do("q", lambda: "c") == ("c", False)
+
+
+def test_empty_result_not_cached():
+    sf = SingleFlight(ttl=60)
+    assert sf.do("q", lambda: []) == ([], False)
+    assert sf.do("q", lambda: [1]) == ([1], False)
+
+
+def test_cache_evicts_least_recently_used():
+    sf = SingleFlight(ttl=60, max_entries=2)
+    sf.do("a", lambda: 1)
+    sf.do("b", lambda: 2)
+    sf.do("a", lambda: 0)  # a 를 최근에 쓴 것으로
+    sf.do("c", lambda: 3)
+    assert list(sf.cache) == ["a", "c"]
@@ -0,0 +1,33 @@
+import csv
+import pytest
+from shared.sink import CsvSink, ThreadedSink, open_sink
+
+
+def test_threaded_sink_writes_rows(tmp_path):
+    sink = open_sink('csv', str(tmp_path / "out"), threaded=True)
+    sink.write_header(["A", "B"])
+    sink.write_rows([(1, "x"), (2, "y")])
+    sink.close()
+    with open(sink.file_path, encoding='utf-8-sig', newline='') as f:
+        assert list(csv.reader(f)) == [["A", "B"], ["1", "x"], ["2", "y"]]
+
+
+def test_threaded_sink_closes_inner_file_when_writer_failed(tmp_path):
+    inner = CsvSink(str(tmp_path / "out.csv"))
+    sink = ThreadedSink(inner)
+    sink.write_rows([1])  # 행이 iterable 이 아니라 쓰기 스레드에서 csv.Error
+    with pytest.raises(csv.Error):
+        sink.close()
+    assert inner.f.closed
+
+
+def test_threaded_sink_raises_writer_error_over_close_error(tmp_path):
+    class Broken(CsvSink):
+        def close(self):
+            super().close()
+            raise OSError("close failed")
+
+    sink = ThreadedSink(Broken(str(tmp_path / "out.csv")))
+    sink.write_rows([1])
+    with pytest.raises(csv.Error):
+        sink.close()
@@ -0,0 +1,64 @@
+import threading
+import pytest
+from datetime import datetime, timedelta
+from shared.timing_wheel import TimingWheel, JobLookupError
+
+
+@pytest.fixture
+def wheel():
+    w = TimingWheel()
+    yield w
+    w.shutdown()
+
+
+def test_fires_due_job_with_args(wheel):
+    fired = threading.Event()
+    got = []
+
+    def job(a, b):
+        got.append((a, b))
+        fired.set()
+
+    wheel.start()
+    wheel.add_job(job, datetime.now() + timedelta(milliseconds=100), "j1", args=[1, 2])
+    assert fired.wait(5)
+    assert got == [(1, 2)]
+    assert len(wheel) == 0
+    assert wheel.stats()["fired"] == 1
+
+
+def test_past_job_fires_on_next_tick(wheel):
+    fired = threading.Event()
+    wheel.start()
+    wheel.add_job(fired.set, datetime.now() - timedelta(hours=1), "late")
+    assert fired.wait(5)
+
+
+def test_remove_job(wheel):
+    run_date = datetime.now() + timedelta(hours=2)
+    wheel.add_job(print, run_date, "j1")
+    assert wheel.get_job("j1").run_date == run_date
+    wheel.remove_job("j1")
+    assert wheel.get_job("j1") is None
+    assert len(wheel) == 0
+    with pytest.raises(JobLookupError):
+        wheel.remove_job("j1")
+
+
+def test_add_job_with_same_id_replaces(wheel):
+    wheel.add_job(print, datetime.now() + timedelta(minutes=5), "j1", key=1)
+    wheel.add_job(print, datetime.now() + timedelta(days=2), "j1", key=2)  # overflow 로 옮겨간다
+    assert len(wheel) == 1
+    assert wheel.remove_by_key([1]) == []
+    assert wheel.remove_by_key([2]) == ["j1"]
+    assert len(wheel) == 0
+
+
+def test_remove_by_key_skips_unknown_keys(wheel):
+    now = datetime.now()
+    for i, delta in enumerate([timedelta(seconds=30), timedelta(minutes=30), timedelta(hours=5), timedelta(days=3)]):
+        wheel.add_job(print, now + delta, f"{i}_a", key=i)
+        wheel.add_job(print, now + delta, f"{i}_b", key=i)
+    removed = wheel.remove_by_key([0, 3, 99])
+    assert sorted(removed) == ["0_a", "0_b", "3_a", "3_b"]
+    assert sorted(j.id for j in wheel.get_jobs()) == ["1_a", "1_b", "2_a", "2_b"]